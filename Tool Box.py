@@ -1,36 +1,46 @@
 
 import tkinter as tk
-from tkinter import filedialog, messagebox
-import shutil, os, re, sys, tempfile, configparser, subprocess
-from datetime import datetime
+from tkinter import filedialog, messagebox, ttk
+import os, re, sys, subprocess, time
 
-# --- Константи ---
-LOG_FOLDER = os.path.join(tempfile.gettempdir(), "Tool box", "files")
-HISTORY_FILE = os.path.join(LOG_FOLDER, "history.txt")
-PROFILES_FILE = os.path.join(LOG_FOLDER, "profiles.ini")
-NUM_PROFILES = 8
+from toolbox import engine, index, search
+from toolbox.engine import NUM_PROFILES
+from toolbox.worker import StreamWorker, TransferWorker, format_progress
+from toolbox.widgets import VirtualListbox
+from toolbox.listing import ListingCache
 
 # --- Глобальні змінні ---
 found_files = []
 copied_files = []
+staging_seconds = 0.0  # скільки тривала підготовка файлів списку (для метрик операції)
 current_folder = ""
 current_dest_folder = ""
+extra_dests = []  # додаткові папки призначення (роздача: файли читаються один раз для всіх)
 selected_operation = None  # операція вибрана з історії для збереження у профіль
 profiles = {}  # зчитані профілі 
+history_entries = []  # записи, показані у listbox_history
+transfer = None  # активна фонова передача (TransferWorker)
+listings = {"source": None, "dest": None}  # фонове читання папки панелі (StreamWorker), поки триває
+listing_cache = ListingCache()  # спільний для обох панелей, оновлюється за подіями ФС
+pending_changes = []  # зміни папки, що надійшли, поки панель ще дочитує її
+source_is_search = False  # ліва панель показує результати пошуку, а не вміст current_folder
+search_window = None
+index_worker = None  # фонове оновлення індексу імен (StreamWorker), поки триває
+index_status_text = ""  # розмір і свіжість індексу для вікна пошуку
+index_timer = None  # наступна планова перевірка індексу (root.after)
+
+LISTING_POLL_MS = 50
+LIVE_POLL_MS = 300
+INDEX_POLL_MS = 500
+SORT_MODES = [  # (текст кнопки, ключ для елемента (ім'я, is_dir), у зворотному порядку)
+    ("ім'я", lambda item: (not item[1], item[0].lower()), False),
+    ("ім'я Я-А", lambda item: (item[1], item[0].lower()), True),
+    ("тип", lambda item: (not item[1], os.path.splitext(item[0])[1].lower(), item[0].lower()), False),
+]
+sort_mode = 0
 
 # ====================== ФУНКЦІЇ ======================
 
-
-
-def ensure_log_folder():
-    os.makedirs(LOG_FOLDER, exist_ok=True)
-
-def get_temp_folder():
-    date_str = datetime.now().strftime("%Y-%m-%d")
-    temp_folder = os.path.join(LOG_FOLDER, date_str)
-    os.makedirs(temp_folder, exist_ok=True)
-    return temp_folder
-
 def center_window(win, width=None, height=None, parent=None):
     """
     Центрує вікно win на екрані або відносно parent (якщо вказаний).
@@ -62,111 +72,52 @@ def center_window(win, width=None, height=None, parent=None):
     win.geometry(f"{width}x{height}+{x}+{y}")
 
 
-def get_next_available_name(folder, filename):
-    name, ext = os.path.splitext(filename)
-    pattern = re.compile(rf"^{re.escape(name)}_(\d+){re.escape(ext)}$")
-    max_counter = 0
-    for f in os.listdir(folder):
-        match = pattern.match(f)
-        if match:
-            num = int(match.group(1))
-            if num > max_counter:
-                max_counter = num
-    return f"{name}_{max_counter + 1}{ext}"
-
 # ----------------- Історія -----------------
 
-def add_to_history(files, src_folder, dest_folder):
-    ensure_log_folder()
-    date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    files_paths = ";".join(files)
-    record = f"{date_str} | src={src_folder} | files={files_paths} | dest={dest_folder}\n"
-    with open(HISTORY_FILE, "a", encoding="utf-8") as f:
-        f.write(record)
-    refresh_history_listbox()
-
-def parse_history_line(line):
-    line = line.strip()
-    m = re.match(r'^(.*?)\s*\|\s*src=(.*?)\s*\|\s*files=(.*?)\s*\|\s*dest=(.*)$', line)
-    if m:
-        timestamp = m.group(1).strip()
-        src = m.group(2).strip()
-        files_str = m.group(3).strip()
-        dest = m.group(4).strip()
-        files = [p for p in files_str.split(";") if p]
-        return {"timestamp": timestamp, "src": src, "files": files, "dest": dest}
-    m2 = re.match(r'^(.*?):\s*(.*?)\s*->\s*(.*)$', line)
-    if m2:
-        timestamp = m2.group(1).strip()
-        names = [n.strip() for n in m2.group(2).split(",") if n.strip()]
-        dest = m2.group(3).strip()
-        return {"timestamp": timestamp, "src": None, "files": names, "dest": dest}
-    return {"timestamp": "", "src": None, "files": [], "dest": "", "raw": line}
-
 def refresh_history_listbox():
+    """Останні записи історії (з урахуванням тексту в полі пошуку)."""
+    global history_entries
     listbox_history.delete(0, tk.END)
-    if not os.path.exists(HISTORY_FILE):
+    history_entries = engine.read_history(search=history_search_entry.get().strip())
+    for parsed in history_entries:
+        listbox_history.insert(tk.END, engine.format_history_entry(parsed))
+
+def load_older_history():
+    """Додає зверху наступну сторінку старіших записів."""
+    global history_entries
+    if not history_entries:
         return
-    with open(HISTORY_FILE, "r", encoding="utf-8") as f:
-        lines = f.readlines()
-    for line in lines[-50:]:
-        parsed = parse_history_line(line)
-        if parsed.get("raw"):
-            display = parsed["raw"]
-        else:
-            timestamp = parsed.get("timestamp", "")
-            files = parsed.get("files", [])
-            dest = parsed.get("dest", "")
-            short_names = ", ".join(os.path.basename(p) for p in files[:3])
-            if len(files) > 3:
-                short_names += f" +{len(files)-3}"
-            display = f"{timestamp}: {short_names} -> {dest}"
-        listbox_history.insert(tk.END, display)
+    older = engine.read_history(before_id=history_entries[0]["id"], search=history_search_entry.get().strip())
+    if not older:
+        messagebox.showinfo("Історія", "Старіших записів немає")
+        return
+    for i, parsed in enumerate(older):
+        listbox_history.insert(i, engine.format_history_entry(parsed))
+    history_entries = older + history_entries
+    listbox_history.see(len(older) - 1)
 
 # ----------------- Профілі -----------------
 
 def load_profiles():
     global profiles
-    ensure_log_folder()
-    profiles = {}
-    config = configparser.ConfigParser()
-    if os.path.exists(PROFILES_FILE):
-        config.read(PROFILES_FILE, encoding='utf-8')
-        for i in range(NUM_PROFILES):
-            section = f"Profile{i+1}"
-            if section in config:
-                src = config[section].get('src', '')
-                dest = config[section].get('dest', '')
-                files = config[section].get('files', '')
-                files_list = [p for p in files.split(';') if p]
-                profiles[i] = {'src': src, 'dest': dest, 'files': files_list}
-            else:
-                profiles[i] = None
-    else:
-        for i in range(NUM_PROFILES):
-            profiles[i] = None
+    profiles = engine.load_profiles()
 
 def save_profiles_to_file():
-    config = configparser.ConfigParser()
-    for i in range(NUM_PROFILES):
-        section = f"Profile{i+1}"
-        config[section] = {}
-        p = profiles.get(i)
-        if p:
-            config[section]['src'] = p.get('src','')
-            config[section]['dest'] = p.get('dest','')
-            config[section]['files'] = ";".join(p.get('files',[]))
-    with open(PROFILES_FILE, 'w', encoding='utf-8') as f:
-        config.write(f)
+    engine.save_profiles(profiles)
 
 def save_profile_at_index(idx):
     global selected_operation
     if not selected_operation:
         messagebox.showwarning("Помилка", "Спочатку виберіть операцію в історії (подвійний клік).")
         return
+    dests = dict.fromkeys([selected_operation.get('dest')] + extra_dests)
     profiles[idx] = {'src': selected_operation.get('src'),
-                     'dest': selected_operation.get('dest'),
-                     'files': selected_operation.get('files')}
+                     'dest': ";".join(d for d in dests if d),
+                     'files': selected_operation.get('files'),
+                     'sync': sync_var.get(),
+                     'compare': "hash" if compare_hash_var.get() else "mtime",
+                     'move': move_var.get(), 'verify': verify_var.get(),
+                     'limit_mbps': limit_mbps(), 'priority': "idle" if low_priority_var.get() else ""}
     save_profiles_to_file()
     update_profile_buttons()
     messagebox.showinfo("Успіх", f"Операцію збережено в профіль #{idx+1}")
@@ -174,43 +125,45 @@ def save_profile_at_index(idx):
     selected_operation = None
 
 def load_profile_at_index(idx):
-    p = profiles.get(idx)
-    if not p:
-        messagebox.showinfo("Пусто", f"Профіль #{idx+1} порожній.")
+    try:
+        p = engine.check_profile(profiles, idx)
+    except engine.ProfileError as e:
+        messagebox.showinfo("Пусто", str(e))
         return
-    src = p.get('src')
-    files = p.get('files', [])
-    dest = p.get('dest')
-    if not src or not files or not dest:
-        messagebox.showerror("Помилка", "Профіль містить неповні дані.")
+    if transfer_busy():
         return
+    src = p.get('src')
+    dest, *others = engine.profile_dests(p)
+    extra_dests[:] = others
+    update_fanout_label()
+    sync_var.set(p.get('sync', False))
+    compare_hash_var.set(p.get('compare') == "hash")
+    move_var.set(p.get('move', False))
+    verify_var.set(p.get('verify', False) or engine.load_settings().getboolean("verify", "enabled"))
+    if p.get('limit_mbps'):
+        limit_var.set(f"{p['limit_mbps']:g}")
+    if p.get('priority'):
+        low_priority_var.set(p['priority'] != "normal")
     refresh_file_list(src)
-    temp_folder = get_temp_folder()
-    global copied_files
+    found, missing = engine.resolve_profile_files(p)
+    for name in missing:
+        messagebox.showerror("Помилка", f"Не знайдено файл: {name}\nПапка {src} відкрита, знайдіть самі.")
     copied_files.clear()
-    for fp in files:
-        if os.path.exists(fp) and os.path.isfile(fp):
-            filename = os.path.basename(fp)
-            temp_path = os.path.join(temp_folder, filename)
-            # видаляємо перевірку і get_next_available_name()
-            shutil.copy(fp, temp_path)
-            copied_files.append(temp_path)
-        else:
-            candidate = os.path.join(src, os.path.basename(fp))
-            if os.path.exists(candidate) and os.path.isfile(candidate):
-                filename = os.path.basename(candidate)
-                temp_path = os.path.join(temp_folder, filename)
-                if os.path.exists(temp_path):
-                    temp_path = os.path.join(temp_folder, get_next_available_name(temp_folder, filename))
-                shutil.copy(candidate, temp_path)
-                copied_files.append(temp_path)
-            else:
-                messagebox.showerror("Помилка", f"Не знайдено файл: {os.path.basename(fp)}\nПапка {src} відкрита, знайдіть самі.")
-    listbox_temp_files.delete(0, tk.END)
-    for f in copied_files:
-        listbox_temp_files.insert(tk.END, os.path.basename(f))
-    refresh_dest_list(dest)
-    messagebox.showinfo("Готово", f"Профіль #{idx+1} завантажено. Залишилося натиснути 'Запуск операції'.")
+    refresh_temp_listbox()
+    started = time.monotonic()
+
+    def on_done(kind, data):
+        global staging_seconds
+        if kind != "done":
+            report_transfer_end(kind, data)
+            return
+        staging_seconds = time.monotonic() - started
+        copied_files.extend(data)
+        refresh_temp_listbox()
+        refresh_dest_list(dest)
+        messagebox.showinfo("Готово", f"Профіль #{idx+1} завантажено. Залишилося натиснути 'Запуск операції'.")
+
+    start_transfer(TransferWorker(engine.stage_files, found), on_done)
 
 # ----------------- GUI: кнопки профілів -----------------
 
@@ -236,33 +189,104 @@ def update_profile_buttons():
 
 # ====================== Основні функції ======================
 
+def entry_label(item):
+    name, is_dir = item
+    return f"📁 {name}" if is_dir else f"📄 {name}"
+
+def start_listing(pane, folder, on_chunk, on_end):
+    """
+    Показує папку в панелі pane ("source" / "dest"): з кешу одразу, інакше читає у фоні порціями
+    в on_chunk; попереднє читання цієї панелі скасовується.
+    on_end(kind, data) — ("done", кількість порцій) або ("error", виняток).
+    """
+    if listings[pane] is not None:
+        listings[pane].cancel()
+        listings[pane] = None
+    listing_cache.set_live([current_folder, current_dest_folder])
+    cached = listing_cache.get(folder)
+    if cached is not None:
+        on_chunk(cached)
+        on_end("done", 1)
+        return
+    worker = StreamWorker(listing_cache.scan, folder)
+    listings[pane] = worker
+    worker.start()
+    poll_listing(pane, worker, on_chunk, on_end)
+
+def poll_listing(pane, worker, on_chunk, on_end):
+    for kind, data in worker.poll(limit=8):  # решту — наступного разу, щоб вікно не підвисало
+        if kind == "chunk":
+            on_chunk(data)
+        else:
+            listings[pane] = None
+            on_end(kind, data)
+            return
+    if not worker.cancelled:
+        root.after(LISTING_POLL_MS, poll_listing, pane, worker, on_chunk, on_end)
+
+def same_folder(a, b):
+    return bool(a) and bool(b) and os.path.abspath(a) == os.path.abspath(b)
+
+def apply_listing_changes():
+    """Живе оновлення: зміни показаних папок з кешу (inotify або перевірка mtime)."""
+    global pending_changes
+    changes, pending_changes = pending_changes + listing_cache.poll_changes(), []
+    for folder, added, removed in changes:
+        panes = [(pane, current, listbox) for pane, current, listbox in
+                 (("source", current_folder, listbox_main), ("dest", current_dest_folder, listbox_dest))
+                 if same_folder(folder, current) and not (pane == "source" and source_is_search)]
+        if any(listings[pane] is not None for pane, _, _ in panes):  # ще дочитується — застосуємо після
+            pending_changes.append((folder, added, removed))
+            continue
+        for pane, current, listbox in panes:
+            if added is None:  # змін забагато — перечитати
+                (refresh_file_list if pane == "source" else refresh_dest_list)(current)
+            else:
+                listbox.remove_where(lambda item: item[0] in removed)
+                if pane == "source":
+                    found_files.extend(os.path.join(current, name) for name, _ in added)
+                    listbox.extend(added)
+                else:
+                    listbox.extend([item for item in added if item[1]])
+    root.after(LIVE_POLL_MS, apply_listing_changes)
+
 def refresh_file_list(folder):
-    global found_files, current_folder
+    global current_folder, source_is_search
+    source_is_search = False
     found_files.clear()
-    listbox_main.delete(0, tk.END)
+    listbox_main.clear()
     current_folder = folder
-    try:
-        items = os.listdir(folder)
-        folders = [i for i in items if os.path.isdir(os.path.join(folder, i))]
-        files = [i for i in items if os.path.isfile(os.path.join(folder, i))]
-        folders.sort(key=str.lower)
-        files.sort(key=str.lower)
-        for item in folders + files:
-            full_path = os.path.join(folder, item)
-            found_files.append(full_path)
-            display_name = f"📁 {item}" if os.path.isdir(full_path) else f"📄 {item}"
-            listbox_main.insert(tk.END, display_name)
-    except Exception as e:
-        messagebox.showerror("Помилка", str(e))
     path_entry.delete(0, tk.END)
     path_entry.insert(0, folder)
-    path_label.config(text=f"Папка пошуку: {folder}")
+    path_label.config(text=f"Папка пошуку: {folder} (читання...)")
+
+    def on_chunk(chunk):
+        found_files.extend(os.path.join(folder, name) for name, _ in chunk)
+        listbox_main.extend(chunk)
+
+    def on_end(kind, data):
+        if kind == "error":
+            messagebox.showerror("Помилка", str(data))
+        path_label.config(text=f"Папка пошуку: {folder} ({listbox_main.size()})")
+
+    start_listing("source", folder, on_chunk, on_end)
+
+def apply_source_filter(event=None):
+    text = filter_entry.get().strip().lower()
+    listbox_main.filter((lambda item: text in item[0].lower()) if text else None)
+
+def cycle_sort_mode():
+    global sort_mode
+    sort_mode = (sort_mode + 1) % len(SORT_MODES)
+    title, key, reverse = SORT_MODES[sort_mode]
+    listbox_main.sort(key, reverse)
+    btn_sort.config(text=f"Сортування: {title}")
 
 def on_item_double_click(event):
     try:
         index = listbox_main.curselection()[0]
         path = found_files[index]
-        if os.path.isdir(path):
+        if listbox_main.item(index)[1]:
             refresh_file_list(path)
         else:
             copy_file_from_list()
@@ -277,13 +301,164 @@ def open_path_from_entry():
     refresh_file_list(path)
 
 def open_search_window():
-    folder = filedialog.askdirectory(title="Оберіть папку для пошуку")
-    if folder:
-        refresh_file_list(folder)
+    """Вікно рекурсивного пошуку: результати з'являються в лівому списку по мірі знаходження."""
+    global search_window
+    if search_window is not None and search_window.winfo_exists():
+        search_window.lift()
+        return
+    dialog = search_window = tk.Toplevel(root)
+    dialog.title("Пошук файлів")
+    dialog.resizable(False, False)
+    center_window(dialog, 380, 390, parent=root)
+
+    fields = {}
+    for key, text in (("folder", "Де шукати"), ("pattern", "Ім'я (* ? або частина)"),
+                      ("extensions", "Розширення (pdf, docx)"), ("min_mb", "Розмір від, МБ"),
+                      ("max_mb", "Розмір до, МБ"), ("days", "Змінені за днів")):
+        frame = tk.Frame(dialog)
+        frame.pack(fill=tk.X, padx=10, pady=2)
+        tk.Label(frame, text=text, width=20, anchor="w").pack(side=tk.LEFT)
+        fields[key] = tk.Entry(frame, width=22)
+        fields[key].pack(side=tk.LEFT)
+    fields["folder"].insert(0, current_folder)
+    regex_var = tk.BooleanVar(value=False)
+    tk.Checkbutton(dialog, text="Ім'я — регулярний вираз", variable=regex_var).pack(anchor="w", padx=10)
+    use_index_var = tk.BooleanVar(value=True)
+    tk.Checkbutton(dialog, text="Шукати в індексі (якщо папка проіндексована)",
+                   variable=use_index_var).pack(anchor="w", padx=10)
+    label_index = tk.Label(dialog, text=f"Індекс: {index_status_text}", wraplength=360, justify=tk.LEFT)
+    label_index.pack(anchor="w", padx=10)
+
+    def show_index_status():
+        if dialog.winfo_exists():
+            label_index.config(text=f"Індекс: {index_status_text}")
+            dialog.after(INDEX_POLL_MS, show_index_status)
+
+    def choose_folder():
+        folder = filedialog.askdirectory(title="Оберіть папку для пошуку", parent=dialog)
+        if folder:
+            fields["folder"].delete(0, tk.END)
+            fields["folder"].insert(0, folder)
+
+    def number(key, scale=1):
+        text = fields[key].get().strip().replace(",", ".")
+        return float(text) * scale if text else None
+
+    def start():
+        folder = fields["folder"].get().strip()
+        if not folder or not os.path.isdir(folder):
+            messagebox.showerror("Помилка", "Вкажіть існуючу папку для пошуку!", parent=dialog)
+            return
+        try:
+            filters = dict(
+                pattern=fields["pattern"].get().strip(), regex=regex_var.get(),
+                extensions=fields["extensions"].get().replace(";", ",").split(","),
+                min_size=number("min_mb", 1024 * 1024), max_size=number("max_mb", 1024 * 1024),
+                modified_within_days=number("days"))
+            matcher = search.make_matcher(**filters)
+        except (ValueError, re.error) as e:
+            messagebox.showerror("Помилка", f"Неправильний фільтр: {e}", parent=dialog)
+            return
+        if use_index_var.get() and index.covers(folder):
+            start_search(folder, "індекс", index.search, **filters)
+        else:
+            start_search(folder, "обхід папок", search.search, matcher)
+
+    frame_buttons = tk.Frame(dialog)
+    frame_buttons.pack(pady=10)
+    tk.Button(frame_buttons, text="Папка...", command=choose_folder, width=10).pack(side=tk.LEFT, padx=3)
+    tk.Button(frame_buttons, text="Шукати", command=start, width=10).pack(side=tk.LEFT, padx=3)
+    tk.Button(frame_buttons, text="Зупинити", command=stop_search, width=10).pack(side=tk.LEFT, padx=3)
+    tk.Button(dialog, text="Оновити індекс", command=lambda: start_index_update(force=True),
+              width=16).pack(pady=(0, 5))
+    show_index_status()
+
+def start_search(folder, source, func, *args, **kwargs):
+    """
+    Показує в лівому списку результати func(folder, *args, **kwargs) — search.search або index.search
+    (порціями, у фоні); source — звідки результати, для рядка стану.
+    """
+    global current_folder, source_is_search
+    if listings["source"] is not None:
+        listings["source"].cancel()
+    source_is_search = True
+    current_folder = folder
+    found_files.clear()
+    listbox_main.clear()
+    path_entry.delete(0, tk.END)
+    path_entry.insert(0, folder)
+    path_label.config(text=f"Пошук у {folder}...")
+    started = time.monotonic()
+
+    def on_chunk(chunk):
+        found_files.extend(os.path.join(folder, rel) for rel, _ in chunk)
+        listbox_main.extend(chunk)
+        path_label.config(text=f"Пошук у {folder}: знайдено {listbox_main.size()}...")
+
+    def on_end(kind, data):
+        if kind == "error":
+            messagebox.showerror("Помилка", str(data))
+        path_label.config(text=f"Знайдено {listbox_main.size()} файл(ів) у {folder} "
+                               f"за {time.monotonic() - started:.2f} с ({source})")
+
+    worker = StreamWorker(func, folder, *args, **kwargs)
+    listings["source"] = worker
+    listing_cache.set_live([current_dest_folder])
+    worker.start()
+    poll_listing("source", worker, on_chunk, on_end)
+
+def stop_search():
+    worker = listings["source"]
+    if source_is_search and worker is not None:
+        worker.cancel()
+        listings["source"] = None
+        path_label.config(text=f"Пошук зупинено: знайдено {listbox_main.size()} файл(ів) у {current_folder}")
+
+def start_index_update(force=False):
+    """
+    Фонове оновлення індексу імен, якщо він старший за [index] refresh_minutes (force — завжди);
+    повторюється з тим самим інтервалом.
+    """
+    global index_worker, index_status_text
+    if index_worker is not None:
+        return
+    minutes = engine.load_settings().getint("index", "refresh_minutes")
+    report = index.status()
+    index_status_text = index.format_status(report)
+    roots = index.configured_roots()
+    stale = [path for path, updated in report["roots"] if updated is None or time.time() - updated > minutes * 60]
+    if roots and (force or stale or set(roots) != {path for path, _ in report["roots"]}):
+        index_worker = StreamWorker(index.update, roots)
+        index_worker.start()
+        poll_index_update()
+    else:
+        schedule_index_update(minutes)
+
+def schedule_index_update(minutes):
+    global index_timer
+    if index_timer is not None:
+        root.after_cancel(index_timer)
+    index_timer = root.after(minutes * 60 * 1000, start_index_update)
+
+def poll_index_update():
+    global index_worker, index_status_text
+    for kind, data in index_worker.poll():
+        if kind == "chunk":
+            index_status_text = f"оновлення {data['root']}: перевірено папок {data['dirs']}..."
+        else:
+            index_worker = None
+            index_status_text = (f"помилка оновлення: {data}" if kind == "error"
+                                 else index.format_status(index.status()))
+            schedule_index_update(engine.load_settings().getint("index", "refresh_minutes"))
+            return
+    root.after(INDEX_POLL_MS, poll_index_update)
 
 def go_back_folder():
     global current_folder
     if not current_folder: return
+    if source_is_search:  # з результатів пошуку — назад до самої папки
+        refresh_file_list(current_folder)
+        return
     parent = os.path.dirname(current_folder)
     if parent == current_folder or parent == "":
         messagebox.showinfo("Інформація", "Ви вже у кореневій папці.")
@@ -296,19 +471,27 @@ def copy_file_from_list():
     if not indices:
         messagebox.showwarning("Помилка", "Оберіть файл(и) зі списку!")
         return
-    temp_folder = get_temp_folder()
-    files_to_copy = [found_files[i] for i in indices if os.path.isfile(found_files[i])]
-    for file_path in files_to_copy:
-        filename = os.path.basename(file_path)
-        temp_path = os.path.join(temp_folder, filename)
-        # ТУТ БІЛЬШЕ НЕ РОБИМО get_next_available_name()
-        shutil.copy(file_path, temp_path)
-        copied_files.append(temp_path)
+    if transfer_busy():
+        return
+    started = time.monotonic()
+
+    def on_done(kind, data):
+        global staging_seconds
+        if kind != "done":
+            report_transfer_end(kind, data)
+            return
+        staging_seconds += time.monotonic() - started
+        copied_files.extend(data)
+        refresh_temp_listbox()
+        names = "\n".join(os.path.basename(f) for f in copied_files)
+        messagebox.showinfo("Успіх", f"Файли додано до списку для вставки:\n{names}")
+
+    start_transfer(TransferWorker(engine.stage_files, [found_files[i] for i in indices]), on_done)
+
+def refresh_temp_listbox():
     listbox_temp_files.delete(0, tk.END)
     for f in copied_files:
         listbox_temp_files.insert(tk.END, os.path.basename(f))
-    names = "\n".join(os.path.basename(f) for f in copied_files)
-    messagebox.showinfo("Успіх", f"Файли скопійовано у тимчасову папку:\n{names}")
 
 
 def on_temp_file_double_click(event):
@@ -328,12 +511,13 @@ def on_temp_file_double_click(event):
         messagebox.showerror("Помилка", str(e))
         
 def clear_temp_files_list():
-    global copied_files
+    global copied_files, staging_seconds
     if not copied_files:
         messagebox.showinfo("Інформація", "Список тимчасових файлів порожній.")
         return
     if messagebox.askyesno("Підтвердження", "Ви впевнені, що хочете очистити список скопійованих файлів?"):
         copied_files.clear()
+        staging_seconds = 0.0
         listbox_temp_files.delete(0, tk.END)
 
 def remove_selected_temp_files():
@@ -352,17 +536,17 @@ def remove_selected_temp_files():
 def refresh_dest_list(folder):
     global current_dest_folder
     current_dest_folder = folder
-    listbox_dest.delete(0, tk.END)
-    try:
-        items = [i for i in os.listdir(folder) if os.path.isdir(os.path.join(folder, i))]
-        items.sort(key=str.lower)
-        for i in items:
-            listbox_dest.insert(tk.END, f"📁 {i}")
-    except Exception as e:
-        messagebox.showerror("Помилка", str(e))
+    listbox_dest.clear()
     dest_entry.delete(0, tk.END)
     dest_entry.insert(0, folder)
 
+    def on_end(kind, data):
+        if kind == "error":
+            messagebox.showerror("Помилка", str(data))
+
+    start_listing("dest", folder, lambda chunk: listbox_dest.extend([item for item in chunk if item[1]]), on_end)
+    update_fanout_label()
+
 def refresh_dest_path():
     folder = dest_entry.get().strip()
     if not folder or not os.path.isdir(folder):
@@ -384,53 +568,87 @@ def dest_go_back():
         return
     refresh_dest_list(parent)
 
+def add_extra_dest():
+    """Запам'ятовує поточну папку призначення як ще одну; далі можна обрати наступну."""
+    if not current_dest_folder:
+        messagebox.showwarning("Помилка", "Спочатку оберіть папку для вставлення!")
+        return
+    if current_dest_folder not in extra_dests:
+        extra_dests.append(current_dest_folder)
+    update_fanout_label()
+
+def clear_extra_dests():
+    extra_dests.clear()
+    update_fanout_label()
+
+def update_fanout_label():
+    others = [d for d in extra_dests if d != current_dest_folder]
+    label_fanout.config(text=f"Також у: {'; '.join(others)}" if others else "")
+
+def target_dests():
+    """Папка або список папок для engine.run_operation."""
+    dests = list(dict.fromkeys(extra_dests + [current_dest_folder]))
+    return dests if len(dests) > 1 else current_dest_folder
+
 def on_dest_double_click(event):
     try:
         index = listbox_dest.curselection()[0]
-        folder = os.path.join(current_dest_folder, listbox_dest.get(index)[2:])
+        folder = os.path.join(current_dest_folder, listbox_dest.item(index)[0])
         refresh_dest_list(folder)
     except Exception:
         pass
     
-def ask_replace_or_rename(filename, multiple=False):
+CHOICE_LABELS = {"rename": "Перейменувати", "replace": "Замінити", "cancel": "Пропустити"}
+
+def ask_conflicts(names):
     """
-    Повертає кортеж (choice, apply_to_all)
-    choice: "replace", "rename", "cancel"
-    apply_to_all: True/False
+    Одне вікно для всіх конфліктів операції. Повертає список рішень ("replace", "rename", "cancel")
+    у тому ж порядку, що names, або None — операцію скасовано.
     """
-    result = {"choice": "cancel", "apply_to_all": False}
+    rows = [[name, "rename"] for name in names]
+    result = {"choices": None}
+
+    def set_choice(choice, only_selected):
+        indices = conflict_list.curselection() if only_selected else range(len(rows))
+        if only_selected and not indices:
+            messagebox.showwarning("Помилка", "Виділіть файл(и) у списку.", parent=dialog)
+            return
+        for i in indices:
+            rows[i][1] = choice
+        conflict_list.refresh()
 
     def on_confirm():
-        selected = var.get()
-        result["choice"] = "replace" if selected == 1 else "rename"
-        result["apply_to_all"] = chk_var.get()
+        result["choices"] = [choice for _, choice in rows]
         dialog.destroy()
 
     dialog = tk.Toplevel(root)
-    dialog.title("Файл існує")
+    dialog.title("Файли вже існують")
     dialog.resizable(False, False)
-    center_window(dialog, 320, 200, parent=root)  # центр відносно головного вікна
+    center_window(dialog, 460, 460, parent=root)  # центр відносно головного вікна
     dialog.grab_set()
 
-    lbl = tk.Label(dialog, text=f"Файл '{filename}' вже існує у цільовій папці.\nЩо робимо?", wraplength=380)
+    lbl = tk.Label(dialog, text=f"У цільовій папці вже є {len(names)} файл(ів) з такими іменами.\n"
+                                f"Оберіть дію для виділених або для всіх:", wraplength=420)
     lbl.pack(pady=10)
-
-    var = tk.IntVar(value=1)
-    rb1 = tk.Radiobutton(dialog, text="Замінити", variable=var, value=1)
-    rb2 = tk.Radiobutton(dialog, text="Перейменувати", variable=var, value=2)
-    rb1.pack(anchor="w", padx=20)
-    rb2.pack(anchor="w", padx=20)
-
-    chk_var = tk.BooleanVar(value=False)
-    if multiple:
-        chk = tk.Checkbutton(dialog, text="Підтвердити для всіх файлів", variable=chk_var)
-        chk.pack(pady=10)
-
-    btn = tk.Button(dialog, text="Підтвердити", command=on_confirm, width=15)
-    btn.pack(pady=10)
+    conflict_list = VirtualListbox(dialog, label=lambda row: f"{CHOICE_LABELS[row[1]]}: {row[0]}",
+                                   width=60, height=12, selectmode=tk.EXTENDED)
+    conflict_list.extend(rows)
+    conflict_list.pack(padx=10)
+    for text, only_selected in (("Виділені", True), ("Усі", False)):
+        frame = tk.Frame(dialog)
+        frame.pack(pady=3)
+        tk.Label(frame, text=f"{text}:", width=9, anchor="e").pack(side=tk.LEFT)
+        for choice in ("replace", "rename", "cancel"):
+            tk.Button(frame, text=CHOICE_LABELS[choice], width=13,
+                      command=lambda c=choice, o=only_selected: set_choice(c, o)).pack(side=tk.LEFT, padx=2)
+
+    frame_confirm = tk.Frame(dialog)
+    frame_confirm.pack(pady=10)
+    tk.Button(frame_confirm, text="Почати вставку", command=on_confirm, width=15).pack(side=tk.LEFT, padx=5)
+    tk.Button(frame_confirm, text="Скасувати операцію", command=dialog.destroy, width=18).pack(side=tk.LEFT, padx=5)
 
     dialog.wait_window()  # чекаємо поки користувач закриє вікно
-    return result["choice"], result["apply_to_all"]
+    return result["choices"]
 
 def run_operation():
     global copied_files, current_dest_folder
@@ -441,51 +659,124 @@ def run_operation():
         messagebox.showwarning("Помилка", "Вкажіть куди вставляти!")
         return
 
-    apply_to_all = False
-    last_choice = None
-    for temp_file_path in copied_files:
-        filename = os.path.basename(temp_file_path)
-        dest_file = os.path.join(current_dest_folder, filename)
+    if transfer_busy():
+        return
 
-        if os.path.exists(dest_file):
-            if apply_to_all and last_choice:
-                choice = last_choice
-            else:
-                choice, apply_all = ask_replace_or_rename(filename, multiple=len(copied_files) > 1)
-                if apply_all:
-                    apply_to_all = True
-                    last_choice = choice
-
-            if choice == "replace":
-                shutil.copy(temp_file_path, dest_file)
-            elif choice == "rename":
-                new_name = get_next_available_name(current_dest_folder, filename)
-                dest_file = os.path.join(current_dest_folder, new_name)
-                shutil.copy(temp_file_path, dest_file)
-            else:  # cancel
-                continue
+    def on_done(kind, result):
+        global staging_seconds
+        if kind != "done":
+            report_transfer_end(kind, result)
+            return
+        staging_seconds = 0.0
+        for path, err in result["errors"]:
+            messagebox.showerror("Помилка", f"{os.path.basename(path)}: {err}")
+        verb = "Переміщено" if result["move"] else "Вставлено"
+        summary = f"{verb} {result['files']} файл(ів) у {result['dest']}"
+        for dest_result in result.get("destinations", []):
+            summary += (f"\n{dest_result['dest']}: {dest_result['files']} вставлено, "
+                        f"{len(dest_result['skipped']) + len(dest_result['unchanged'])} пропущено, "
+                        f"{len(dest_result['errors'])} помилок")
+        if result["unchanged"]:
+            summary += (f"\nБез змін (пропущено): {len(result['unchanged'])} файл(ів), "
+                        f"{result['unchanged_bytes'] / (1024 * 1024):.1f} МБ")
+        if result["delta_saved"]:
+            summary += f"\nДельта: не переписано {result['delta_saved'] / (1024 * 1024):.1f} МБ"
+        if result["verified"]:
+            summary += f"\nПеревірено контрольними сумами ({result['verified']}): {len(result['manifest'])} файл(ів)"
+        if result["cancelled"]:
+            messagebox.showinfo("Скасовано", f"Операцію скасовано. {summary}")
+        else:
+            messagebox.showinfo("Готово", summary)
+        refresh_history_listbox()
+        refresh_file_list(result.get("destinations", [result])[0]["dest"])
+        # Після скасування у списку лишаються ще не вставлені файли
+        done = {src for src, _ in result["copied"]} - {f["src"] for f in result["folders"] if f["cancelled"]}
+        copied_files[:] = [f for f in copied_files if f not in done] if result["cancelled"] else []
+        refresh_temp_listbox()
+
+    start_transfer(TransferWorker(engine.run_operation, list(copied_files), target_dests(),
+                                  src_folder=current_folder, ask_conflicts=True, sync=sync_var.get(),
+                                  compare="hash" if compare_hash_var.get() else "mtime",
+                                  move=move_var.get(), verify=verify_var.get(), limit_mbps=limit_mbps(),
+                                  priority="idle" if low_priority_var.get() else "normal",
+                                  staging_seconds=staging_seconds), on_done)
+
+# --- Фонова передача ---
+
+def limit_mbps():
+    """Ліміт швидкості з поля, МБ/с; порожнє чи неправильне значення — без ліміту."""
+    try:
+        return max(0.0, float(limit_var.get().replace(",", ".")))
+    except ValueError:
+        return 0.0
+
+def on_limit_changed(*args):
+    # Новий ліміт діє одразу, і на передачу, що вже йде
+    if transfer is not None:
+        transfer.control.set_limit(int(limit_mbps() * 1024 * 1024))
+
+def transfer_busy():
+    if transfer is not None:
+        messagebox.showwarning("Зачекайте", "Попередня операція ще виконується.")
+        return True
+    return False
+
+def start_transfer(worker, on_done):
+    """Запускає worker у фоні; on_done(kind, data) викликається в потоці GUI після завершення."""
+    global transfer
+    transfer = worker
+    progress_bar.config(value=0)
+    status_label.config(text="Підготовка...")
+    btn_pause.config(state=tk.NORMAL, text="Пауза")
+    btn_cancel.config(state=tk.NORMAL)
+    worker.start()
+    root.after(100, poll_transfer, on_done)
+
+def poll_transfer(on_done):
+    global transfer
+    for kind, data in transfer.poll():
+        if kind == "progress":
+            progress_bar.config(value=100 * data["done"] / data["total"] if data["total"] else 100)
+            status_label.config(text=format_progress(data))
+        elif kind == "conflicts":
+            transfer.answer_conflicts(ask_conflicts(data))
         else:
-            shutil.copy(temp_file_path, dest_file)
+            transfer = None
+            btn_pause.config(state=tk.DISABLED, text="Пауза")
+            btn_cancel.config(state=tk.DISABLED)
+            status_label.config(text="")
+            progress_bar.config(value=0)
+            on_done(kind, data)
+            return
+    root.after(100, poll_transfer, on_done)
+
+def report_transfer_end(kind, data):
+    if kind == "cancelled":
+        messagebox.showinfo("Скасовано", "Операцію скасовано.")
+    else:
+        messagebox.showerror("Помилка", str(data))
+
+def toggle_pause():
+    if transfer is None:
+        return
+    if transfer.control.paused:
+        transfer.resume()
+        btn_pause.config(text="Пауза")
+    else:
+        transfer.pause()
+        btn_pause.config(text="Продовжити")
+
+def cancel_transfer():
+    if transfer is not None:
+        transfer.cancel()
+        status_label.config(text="Скасування...")
 
-    messagebox.showinfo("Готово", f"Вставлено {len(copied_files)} файл(ів) у {current_dest_folder}")
-    original_files = [os.path.join(current_folder, os.path.basename(f)) for f in copied_files]
-    add_to_history(original_files, current_folder, current_dest_folder)
-    refresh_file_list(current_dest_folder)
-    listbox_temp_files.delete(0, tk.END)
-    copied_files.clear()
-    
 # --- Історія: подвійний клік ---
 def on_history_double_click(event):
     global selected_operation
     try:
         index = listbox_history.curselection()[0]
-        with open(HISTORY_FILE, 'r', encoding='utf-8') as f:
-            lines = f.readlines()
-        if not lines:
-            return
-        lines_to_show = lines[-50:]
-        line = lines_to_show[index]
-        parsed = parse_history_line(line)
+        parsed = history_entries[index]
         selected_operation = parsed
         messagebox.showinfo("Операція вибрана", f"Вибрано операцію:\n{os.path.basename(parsed.get('dest',''))} з {len(parsed.get('files',[]))} файлів.\nТепер натисніть кнопку профілю щоб зберегти.")
     except Exception as e:
@@ -494,7 +785,7 @@ def on_history_double_click(event):
 # ====================== GUI ======================
 root = tk.Tk()
 root.title("Tools Box")
-center_window(root, 1100, 560)
+center_window(root, 1100, 680)
 root.resizable(False, False)
 root.config(bg="#2c1a47")
 root.iconbitmap('icon.ico')
@@ -528,8 +819,17 @@ label_search = tk.Label(frame_left, text="Пошук файлів", font=("Arial
 label_search.pack(pady=5)
 label_found = tk.Label(frame_left, text="Список знайдених файлів", bg="#2c1a47", fg="#cda4ff")
 label_found.pack(pady=5)
-listbox_main = tk.Listbox(frame_left, width=40, height=20, bg="#3a1f5c", fg="white",
-                          selectbackground="#6a0dad", selectmode=tk.EXTENDED)
+frame_filter = tk.Frame(frame_left, bg="#2c1a47")
+frame_filter.pack()
+filter_entry = tk.Entry(frame_filter, width=20, bg="#3a1f5c", fg="white", insertbackground="white")
+filter_entry.pack(side=tk.LEFT, padx=5)
+filter_entry.bind("<KeyRelease>", apply_source_filter)
+btn_sort = tk.Button(frame_filter, text=f"Сортування: {SORT_MODES[0][0]}", command=cycle_sort_mode,
+                     bg="#6a0dad", fg="white")
+btn_sort.pack(side=tk.LEFT)
+listbox_main = VirtualListbox(frame_left, label=entry_label, width=40, height=18, bg="#3a1f5c", fg="white",
+                              selectbackground="#6a0dad", selectmode=tk.EXTENDED)
+listbox_main.sort(SORT_MODES[0][1], SORT_MODES[0][2])
 listbox_main.pack(pady=5)
 listbox_main.bind("<Double-1>", on_item_double_click)
 frame_entry = tk.Frame(frame_left, bg="#2c1a47")
@@ -560,7 +860,9 @@ label_insert = tk.Label(frame_right, text="Вставка файлів", font=("
 label_insert.pack(pady=5)
 label_dest = tk.Label(frame_right, text="Список куди вставити (тільки папки)", bg="#2c1a47", fg="#cda4ff")
 label_dest.pack(pady=5)
-listbox_dest = tk.Listbox(frame_right, width=40, height=20, bg="#3a1f5c", fg="white", selectbackground="#6a0dad")
+listbox_dest = VirtualListbox(frame_right, label=entry_label, width=40, height=20, bg="#3a1f5c", fg="white",
+                              selectbackground="#6a0dad")
+listbox_dest.sort(SORT_MODES[0][1])
 listbox_dest.pack(pady=5)
 listbox_dest.bind("<Double-1>", on_dest_double_click)
 # Поле шляху та кнопки під списком
@@ -579,16 +881,77 @@ btn_select_dest.pack(side=tk.LEFT, padx=5)
 btn_dest_back = tk.Button(frame_dest_buttons, text="Назад вставки", width=15, command=dest_go_back,
                           bg="#6a0dad", fg="white")
 btn_dest_back.pack(side=tk.LEFT, padx=5)
+frame_fanout = tk.Frame(frame_right, bg="#2c1a47")
+frame_fanout.pack()
+btn_add_dest = tk.Button(frame_fanout, text="+ Ще одна папка", command=add_extra_dest, bg="#6a0dad", fg="white")
+btn_add_dest.pack(side=tk.LEFT, padx=5)
+btn_clear_dests = tk.Button(frame_fanout, text="Лише ця папка", command=clear_extra_dests, bg="#6a0dad", fg="white")
+btn_clear_dests.pack(side=tk.LEFT, padx=5)
+label_fanout = tk.Label(frame_right, text="", fg="#cda4ff", bg="#2c1a47", wraplength=280)
+label_fanout.pack()
 btn_run = tk.Button(frame_right, text="Запуск операції", width=40, command=run_operation,
                     bg="#6a0dad", fg="white")
 btn_run.pack(pady=5)
+frame_sync = tk.Frame(frame_right, bg="#2c1a47")
+frame_sync.pack()
+sync_var = tk.BooleanVar(value=False)
+compare_hash_var = tk.BooleanVar(value=False)
+chk_sync = tk.Checkbutton(frame_sync, text="Лише нові та змінені", variable=sync_var,
+                          bg="#2c1a47", fg="#cda4ff", selectcolor="#3a1f5c", activebackground="#2c1a47")
+chk_sync.pack(side=tk.LEFT, padx=5)
+chk_compare_hash = tk.Checkbutton(frame_sync, text="Порівнювати вміст", variable=compare_hash_var,
+                                  bg="#2c1a47", fg="#cda4ff", selectcolor="#3a1f5c", activebackground="#2c1a47")
+chk_compare_hash.pack(side=tk.LEFT, padx=5)
+move_var = tk.BooleanVar(value=False)
+chk_move = tk.Checkbutton(frame_right, text="Перемістити (оригінали буде видалено)", variable=move_var,
+                          bg="#2c1a47", fg="#cda4ff", selectcolor="#3a1f5c", activebackground="#2c1a47")
+chk_move.pack()
+verify_var = tk.BooleanVar(value=engine.load_settings().getboolean("verify", "enabled"))
+chk_verify = tk.Checkbutton(frame_right, text="Перевіряти копії (контрольні суми)", variable=verify_var,
+                            bg="#2c1a47", fg="#cda4ff", selectcolor="#3a1f5c", activebackground="#2c1a47")
+chk_verify.pack()
+frame_throttle = tk.Frame(frame_right, bg="#2c1a47")
+frame_throttle.pack()
+tk.Label(frame_throttle, text="Ліміт, МБ/с:", bg="#2c1a47", fg="#cda4ff").pack(side=tk.LEFT)
+limit_var = tk.StringVar(value=f"{engine.load_settings().getfloat('throttle', 'limit_mbps'):g}")
+limit_var.trace_add("write", on_limit_changed)
+spin_limit = tk.Spinbox(frame_throttle, from_=0, to=10000, increment=5, width=6, textvariable=limit_var,
+                        bg="#3a1f5c", fg="white", insertbackground="white")
+spin_limit.pack(side=tk.LEFT, padx=5)
+low_priority_var = tk.BooleanVar(value=engine.load_settings().get("throttle", "priority") != "normal")
+chk_low_priority = tk.Checkbutton(frame_throttle, text="Фоновий пріоритет диска", variable=low_priority_var,
+                                  bg="#2c1a47", fg="#cda4ff", selectcolor="#3a1f5c", activebackground="#2c1a47")
+chk_low_priority.pack(side=tk.LEFT, padx=5)
+progress_bar = ttk.Progressbar(frame_right, length=280, maximum=100)
+progress_bar.pack(pady=(5, 0))
+status_label = tk.Label(frame_right, text="", fg="#cda4ff", bg="#2c1a47", wraplength=280)
+status_label.pack(pady=2)
+frame_transfer_buttons = tk.Frame(frame_right, bg="#2c1a47")
+frame_transfer_buttons.pack(pady=5)
+btn_pause = tk.Button(frame_transfer_buttons, text="Пауза", width=15, command=toggle_pause,
+                      bg="#6a0dad", fg="white", state=tk.DISABLED)
+btn_pause.pack(side=tk.LEFT, padx=5)
+btn_cancel = tk.Button(frame_transfer_buttons, text="Скасувати", width=15, command=cancel_transfer,
+                       bg="#6a0dad", fg="white", state=tk.DISABLED)
+btn_cancel.pack(side=tk.LEFT, padx=5)
 
 # ------------------- Центр: Історія та тимчасові файли -------------------
 frame_center = tk.Frame(frame_main, bg="#2c1a47")
 frame_center.pack(side=tk.LEFT, fill=tk.BOTH, expand=True, padx=10, pady=10)
 label_history = tk.Label(frame_center, text="Історія операцій", bg="#2c1a47", fg="#cda4ff")
 label_history.pack(pady=5)
-listbox_history = tk.Listbox(frame_center, width=40, height=15, bg="#3a1f5c", fg="white", selectbackground="#6a0dad")
+frame_history_search = tk.Frame(frame_center, bg="#2c1a47")
+frame_history_search.pack()
+history_search_entry = tk.Entry(frame_history_search, width=22, bg="#3a1f5c", fg="white", insertbackground="white")
+history_search_entry.pack(side=tk.LEFT, padx=5)
+history_search_entry.bind("<Return>", lambda e: refresh_history_listbox())
+btn_history_search = tk.Button(frame_history_search, text="Знайти", command=refresh_history_listbox,
+                               bg="#6a0dad", fg="white")
+btn_history_search.pack(side=tk.LEFT, padx=2)
+btn_history_older = tk.Button(frame_history_search, text="Старіші", command=load_older_history,
+                              bg="#6a0dad", fg="white")
+btn_history_older.pack(side=tk.LEFT, padx=2)
+listbox_history = tk.Listbox(frame_center, width=40, height=13, bg="#3a1f5c", fg="white", selectbackground="#6a0dad")
 listbox_history.pack(pady=5)
 listbox_history.bind("<Double-1>", on_history_double_click)
 label_temp = tk.Label(frame_center, text="Тимчасові файли для вставки", bg="#2c1a47", fg="#cda4ff")
@@ -613,5 +976,7 @@ btn_exit.pack(pady=15)
 load_profiles()
 update_profile_buttons()
 refresh_history_listbox()
+apply_listing_changes()
+start_index_update()
 
 root.mainloop()
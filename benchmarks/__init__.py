@@ -0,0 +1,12 @@
+"""
+Бенчмарки гарячих шляхів Tool Box: пакетне копіювання, підготовка файлів, читання папок,
+вибір імен при конфліктах, історія. Запуск без GUI:
+
+    python -m benchmarks [--scale quick|standard] [--only copy_ history_] [--repeat 3]
+                         [--workdir DIR] [--out results.json] [--compare old.json]
+
+Набори файлів генеруються в workdir (за замовчуванням — тимчасова папка системи) детерміновано
+і перевикористовуються між запусками. LOG_FOLDER теж перенаправляється у workdir — справжні історія,
+профілі й кеш не чіпаються. Результати записуються в JSON; --compare порівнює з попереднім файлом
+і повертає код 1, якщо якийсь випадок повільніший більше ніж на --threshold.
+"""
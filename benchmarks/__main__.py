@@ -0,0 +1,121 @@
+"""python -m benchmarks — див. benchmarks/__init__.py."""
+import argparse, gc, json, os, platform, statistics, subprocess, sys, tempfile, time
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+class Fixtures:
+    """Папки бенчмарку: root — згенеровані набори (зберігаються), scratch — цілі копіювання (очищаються)."""
+    def __init__(self, workdir):
+        self.root = os.path.join(workdir, "fixtures")
+        self.scratch = os.path.join(workdir, "scratch")
+        os.makedirs(self.root, exist_ok=True)
+
+
+def measure(run, setup, repeat):
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        gc.collect()
+        started = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - started)
+    return times
+
+
+def run_cases(cases, fx, scale, repeat, log):
+    results = {}
+    for name, bench in cases:
+        log(f"{name}: підготовка...")
+        run, setup, items, nbytes = bench(fx, scale)
+        times = measure(run, setup, repeat)
+        best = min(times)
+        result = {"seconds": [round(t, 6) for t in times], "best": round(best, 6),
+                  "median": round(statistics.median(times), 6)}
+        if items:
+            result["items"] = items
+            result["items_per_second"] = round(items / best, 1) if best else None
+        if nbytes:
+            result["bytes"] = nbytes
+            result["mb_per_second"] = round(nbytes / best / (1024 * 1024), 1) if best else None
+        results[name] = result
+        log(f"{name}: {best * 1000:.1f} мс (медіана {result['median'] * 1000:.1f} мс)"
+            + (f", {result['items_per_second']:.0f} од./с" if items else "")
+            + (f", {result['mb_per_second']:.1f} МБ/с" if nbytes else ""))
+    return results
+
+
+def compare(old, new, threshold):
+    """Рядки порівняння за найкращим часом і список випадків, що сповільнились більше ніж на threshold."""
+    lines, slower = [], []
+    for name, result in new["results"].items():
+        before = old.get("results", {}).get(name)
+        if not before or not before.get("best"):
+            lines.append(f"{name}: новий випадок")
+            continue
+        ratio = result["best"] / before["best"]
+        mark = ""
+        if ratio > 1 + threshold:
+            mark = "  <-- повільніше"
+            slower.append(name)
+        elif ratio < 1 - threshold:
+            mark = "  (швидше)"
+        lines.append(f"{name}: {before['best'] * 1000:.1f} -> {result['best'] * 1000:.1f} мс (×{ratio:.2f}){mark}")
+    return lines, slower
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="benchmarks", description="Бенчмарки Tool Box")
+    parser.add_argument("--scale", choices=("quick", "standard"), default="standard",
+                        help="розмір наборів файлів (quick — лише перевірити, що все працює)")
+    parser.add_argument("--only", nargs="+", metavar="PREFIX", help="лише випадки, чиї імена так починаються")
+    parser.add_argument("--repeat", type=int, default=3, help="повторів кожного випадку (береться найкращий)")
+    parser.add_argument("--workdir", default=os.path.join(tempfile.gettempdir(), "toolbox-bench"),
+                        help="де генерувати набори файлів і тимчасовий LOG_FOLDER")
+    parser.add_argument("--out", help="JSON з результатами (за замовчуванням — bench-<час>.json у workdir)")
+    parser.add_argument("--compare", metavar="OLD.json", help="порівняти з попереднім запуском")
+    parser.add_argument("--threshold", type=float, default=0.10,
+                        help="відносне сповільнення, що вважається регресією (0.10 — 10%%)")
+    args = parser.parse_args(argv)
+
+    workdir = os.path.abspath(args.workdir)
+    # LOG_FOLDER (історія, профілі, кеш, журнал) визначається від тимчасової папки при імпорті
+    # toolbox.engine — перенаправляємо її у workdir до імпорту, щоб не чіпати справжні дані
+    tempfile.tempdir = os.path.join(workdir, "tmp")
+    os.makedirs(tempfile.tempdir, exist_ok=True)
+    from benchmarks import fixtures
+    from benchmarks.cases import CASES
+
+    cases = [(name, bench) for name, bench in CASES
+             if not args.only or any(name.startswith(prefix) for prefix in args.only)]
+    log = lambda text: print(text, file=sys.stderr, flush=True)
+    scale = fixtures.SCALES[args.scale]
+    report = {"started": time.strftime("%Y-%m-%d %H:%M:%S"), "commit": git_commit(),
+              "python": platform.python_version(), "platform": platform.platform(),
+              "scale": args.scale, "parameters": scale, "repeat": args.repeat,
+              "results": run_cases(cases, Fixtures(workdir), scale, args.repeat, log)}
+    out = args.out or os.path.join(workdir, f"bench-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    log(f"Результати: {out}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            old = json.load(f)
+        if old.get("scale") != report["scale"]:
+            log(f"Увага: порівнюються різні розміри наборів ({old.get('scale')} і {report['scale']})")
+        lines, slower = compare(old, report, args.threshold)
+        print("\n".join(lines))
+        if slower:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
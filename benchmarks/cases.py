@@ -0,0 +1,208 @@
+"""
+Випадки бенчмарку. Кожен — функція (fixtures, scale) -> (run, setup, items, bytes): run() вимірюється,
+setup() (не вимірюється) готує кожен повтор; items і bytes — для швидкості (елементів і МБ за секунду).
+Імпортувати лише після перенаправлення LOG_FOLDER (див. benchmarks/__main__.py).
+"""
+import os, shutil
+
+from toolbox import engine, history
+from toolbox.listing import ListingCache
+from benchmarks import fixtures
+
+CASES = []  # [(ім'я, функція)] у порядку запуску
+
+
+def case(name):
+    def register(func):
+        CASES.append((name, func))
+        return func
+    return register
+
+
+def _empty_folder(path):
+    def setup():
+        shutil.rmtree(path, ignore_errors=True)
+        os.makedirs(path)
+    return setup
+
+
+def _size(paths):
+    return sum(os.path.getsize(p) for p in paths)
+
+
+# ====================== Копіювання (run_operation) ======================
+
+@case("copy_tiny_files")
+def copy_tiny_files(fx, scale):
+    files = fixtures.tiny_files(fx.root, scale["tiny_count"], scale["tiny_size"])
+    dest = os.path.join(fx.scratch, "copy-tiny")
+    run = lambda: engine.run_operation(files, dest, record_history=False)
+    return run, _empty_folder(dest), len(files), _size(files)
+
+
+@case("copy_tiny_files_per_file")
+def copy_tiny_files_per_file(fx, scale):
+    """Те саме без швидкого шляху для малих файлів: кожен файл окремим завданням copy_file."""
+    files = fixtures.tiny_files(fx.root, scale["tiny_count"], scale["tiny_size"])
+    dest = os.path.join(fx.scratch, "copy-tiny-per-file")
+    run = lambda: engine.run_operation(files, dest, record_history=False, small_threshold_kb=0)
+    return run, _empty_folder(dest), len(files), _size(files)
+
+
+@case("copy_huge_files")
+def copy_huge_files(fx, scale):
+    files = fixtures.huge_files(fx.root, scale["huge_count"], scale["huge_mb"])
+    dest = os.path.join(fx.scratch, "copy-huge")
+    run = lambda: engine.run_operation(files, dest, record_history=False)
+    return run, _empty_folder(dest), len(files), _size(files)
+
+
+@case("copy_tiny_files_rename_conflicts")
+def copy_tiny_files_rename_conflicts(fx, scale):
+    """Ті самі файли вдруге в ту саму папку: план з конфліктом на кожен файл і вибором нових імен."""
+    files = fixtures.tiny_files(fx.root, scale["tiny_count"], scale["tiny_size"])
+    dest = os.path.join(fx.scratch, "copy-conflicts")
+
+    def setup():
+        _empty_folder(dest)()
+        engine.run_operation(files, dest, record_history=False)
+    run = lambda: engine.run_operation(files, dest, record_history=False,
+                                       on_conflict=engine.conflict_policy("rename"))
+    return run, setup, len(files), _size(files)
+
+
+# ====================== Підготовка (copy_file_from_list -> stage_files) ======================
+
+def _stage(mode):
+    def bench(fx, scale):
+        from toolbox import cache
+        files = fixtures.tiny_files(fx.root, scale["tiny_count"], scale["tiny_size"])
+        return lambda: engine.stage_files(files, mode=mode), cache.clear, len(files), _size(files)
+    return bench
+
+for _mode in engine.STAGING_MODES:
+    case(f"stage_{_mode}")(_stage(_mode))
+
+
+# ====================== Читання папок (refresh_file_list / refresh_dest_list) ======================
+
+@case("scan_folder_bigdir")
+def scan_folder_big(fx, scale):
+    folder = fixtures.big_directory(fx.root, scale["bigdir_entries"])
+    run = lambda: sum(len(chunk) for chunk in engine.scan_folder(folder))
+    return run, None, scale["bigdir_entries"], 0
+
+
+@case("list_folder_sorted_bigdir")
+def list_folder_sorted(fx, scale):
+    folder = fixtures.big_directory(fx.root, scale["bigdir_entries"])
+    return lambda: engine.list_folder(folder), None, scale["bigdir_entries"], 0
+
+
+@case("listing_cache_cold_bigdir")
+def listing_cache_cold(fx, scale):
+    """Перше відкриття папки в панелі: читання через ListingCache.scan з заповненням кешу."""
+    folder = fixtures.big_directory(fx.root, scale["bigdir_entries"])
+    state = {}
+
+    def setup():
+        state["cache"] = ListingCache()
+    run = lambda: sum(len(chunk) for chunk in state["cache"].scan(folder))
+    return run, setup, scale["bigdir_entries"], 0
+
+
+@case("listing_cache_warm_bigdir")
+def listing_cache_warm(fx, scale):
+    """Повторне відкриття тієї самої папки: з кешу, без читання диска."""
+    folder = fixtures.big_directory(fx.root, scale["bigdir_entries"])
+    cache = ListingCache()
+    for _ in cache.scan(folder):
+        pass
+    return lambda: len(cache.get(folder)), None, scale["bigdir_entries"], 0
+
+
+# ====================== Імена при конфліктах (get_next_available_name) ======================
+
+@case("next_name_single_dense")
+def next_name_single(fx, scale):
+    """Один виклик get_next_available_name у папці з тисячами report_N.pdf (читає папку щоразу)."""
+    folder = fixtures.collision_set(fx.root, scale["collisions"])
+    return lambda: engine.get_next_available_name(folder, "report.pdf"), None, 1, 0
+
+
+@case("next_name_batch_dense")
+def next_name_batch(fx, scale):
+    """Стільки нових імен, скільки вже є в папці, через один NameIndex (як план операції)."""
+    folder = fixtures.collision_set(fx.root, scale["collisions"])
+    count = scale["collisions"]
+
+    def run():
+        names = engine.NameIndex(folder)
+        return [names.allocate("report.pdf") for _ in range(count)]
+    return run, None, count, 0
+
+
+# ====================== Історія (refresh_history_listbox / parse_history_line) ======================
+
+@case("parse_history_lines")
+def parse_history_lines(fx, scale):
+    path = fixtures.history_file(fx.root, scale["history_mb"])
+    with open(path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    run = lambda: [engine.parse_history_line(line) for line in lines]
+    return run, None, len(lines), os.path.getsize(path)
+
+
+@case("history_import_text")
+def history_import_text(fx, scale):
+    """Перший запуск з великим history.txt: імпорт у history.db."""
+    path = fixtures.history_file(fx.root, scale["history_mb"])
+
+    def setup():
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(history.HISTORY_DB + suffix)
+            except OSError:
+                pass
+        engine.ensure_log_folder()
+        shutil.copyfile(path, engine.HISTORY_FILE)
+    return history.count, setup, None, os.path.getsize(path)
+
+
+@case("history_refresh_listbox")
+def history_refresh_listbox(fx, scale):
+    """Остання сторінка історії і текст рядків для списку (як refresh_history_listbox)."""
+    _ensure_history(fx, scale)
+    run = lambda: [engine.format_history_entry(p) for p in engine.read_history()]
+    return run, None, engine.HISTORY_LIMIT, 0
+
+
+@case("history_search_file")
+def history_search_file(fx, scale):
+    _ensure_history(fx, scale)
+    run = lambda: [engine.format_history_entry(p) for p in engine.read_history(search="doc_4242", field="file")]
+    return run, None, None, 0
+
+
+@case("history_search_any")
+def history_search_any(fx, scale):
+    _ensure_history(fx, scale)
+    run = lambda: [engine.format_history_entry(p) for p in engine.read_history(search="archive/17")]
+    return run, None, None, 0
+
+
+@case("history_older_page")
+def history_older_page(fx, scale):
+    """Сторінка з середини історії («Старіші» після багатьох натискань)."""
+    _ensure_history(fx, scale)
+    middle = history.count() // 2
+    return lambda: engine.read_history(before_id=middle), None, engine.HISTORY_LIMIT, 0
+
+
+def _ensure_history(fx, scale):
+    """history.db з великого history.txt (якщо його ще не імпортовано попереднім випадком)."""
+    path = fixtures.history_file(fx.root, scale["history_mb"])
+    if not os.path.exists(engine.HISTORY_FILE) or os.path.getsize(engine.HISTORY_FILE) != os.path.getsize(path):
+        engine.ensure_log_folder()
+        shutil.copyfile(path, engine.HISTORY_FILE)
+    history.count()
@@ -0,0 +1,121 @@
+"""
+Набори файлів для бенчмарків. Генеруються детерміновано (фіксоване зерно) і лише раз:
+поруч із набором лежить .fixture.json з параметрами — якщо вони збігаються, набір не перегенеровується.
+"""
+import json, os, random, shutil
+
+MB = 1024 * 1024
+
+# Розміри наборів: quick — перевірити, що все працює; standard — для порівняння між змінами
+SCALES = {
+    "quick": {"tiny_count": 2000, "tiny_size": 4096, "huge_count": 2, "huge_mb": 64,
+              "bigdir_entries": 20000, "collisions": 2000, "history_mb": 2},
+    "standard": {"tiny_count": 10000, "tiny_size": 4096, "huge_count": 2, "huge_mb": 512,
+                 "bigdir_entries": 100000, "collisions": 10000, "history_mb": 16},
+}
+
+
+def _ready(folder, params):
+    """Чи вже згенеровано folder з тими самими параметрами; якщо ні — очищає його."""
+    marker = os.path.join(folder, ".fixture.json")
+    try:
+        with open(marker, encoding="utf-8") as f:
+            if json.load(f) == params:
+                return True
+    except (OSError, ValueError):
+        pass
+    shutil.rmtree(folder, ignore_errors=True)
+    os.makedirs(folder)
+    return False
+
+
+def _done(folder, params):
+    with open(os.path.join(folder, ".fixture.json"), "w", encoding="utf-8") as f:
+        json.dump(params, f)
+
+
+def _files(folder):
+    return sorted(e.path for e in os.scandir(folder) if e.is_file() and not e.name.startswith("."))
+
+
+def tiny_files(root, count, size):
+    """count файлів по size байтів (випадковий вміст, щоб не було дедуплікації)."""
+    folder = os.path.join(root, f"tiny-{count}x{size}")
+    params = {"count": count, "size": size}
+    if not _ready(folder, params):
+        rng = random.Random(1)
+        for i in range(count):
+            with open(os.path.join(folder, f"file_{i:06d}.dat"), "wb") as f:
+                f.write(rng.randbytes(size))
+        _done(folder, params)
+    return _files(folder)
+
+
+def huge_files(root, count, size_mb):
+    """count файлів по size_mb МБ; пишуться блоками, щоб не тримати файл у пам'яті."""
+    folder = os.path.join(root, f"huge-{count}x{size_mb}mb")
+    params = {"count": count, "size_mb": size_mb}
+    if not _ready(folder, params):
+        rng = random.Random(2)
+        block = rng.randbytes(MB)
+        for i in range(count):
+            with open(os.path.join(folder, f"huge_{i}.bin"), "wb") as f:
+                for j in range(size_mb):
+                    f.write(block[j % 251:] + block[:j % 251])  # різні блоки без нової генерації
+        _done(folder, params)
+    return _files(folder)
+
+
+def big_directory(root, entries):
+    """Папка з entries порожніх файлів і кожним сотим записом — підпапкою."""
+    folder = os.path.join(root, f"bigdir-{entries}")
+    params = {"entries": entries}
+    if not _ready(folder, params):
+        for i in range(entries):
+            path = os.path.join(folder, f"entry_{i:07d}")
+            if i % 100 == 0:
+                os.mkdir(path)
+            else:
+                open(path + ".txt", "wb").close()
+        _done(folder, params)
+    return folder
+
+
+def collision_set(root, count):
+    """Папка з report.pdf і report_1.pdf ... report_{count}.pdf, з пропусками кожного 97-го номера."""
+    folder = os.path.join(root, f"collisions-{count}")
+    params = {"count": count}
+    if not _ready(folder, params):
+        open(os.path.join(folder, "report.pdf"), "wb").close()
+        for i in range(1, count + 1):
+            if i % 97:
+                open(os.path.join(folder, f"report_{i}.pdf"), "wb").close()
+        _done(folder, params)
+    return folder
+
+
+def history_file(root, size_mb):
+    """history.txt попередніх версій (обидва формати рядків) розміром приблизно size_mb МБ."""
+    folder = os.path.join(root, f"history-{size_mb}mb")
+    params = {"size_mb": size_mb}
+    path = os.path.join(folder, "history.txt")
+    if not _ready(folder, params):
+        rng = random.Random(3)
+        written = 0
+        with open(path, "w", encoding="utf-8") as f:
+            i = 0
+            while written < size_mb * MB:
+                stamp = f"2024-{1 + i % 12:02d}-{1 + i % 28:02d} {i % 24:02d}:{i % 60:02d}:{i * 7 % 60:02d}"
+                names = [f"doc_{rng.randrange(100000)}.{rng.choice(('pdf', 'docx', 'xlsx', 'jpg'))}"
+                         for _ in range(rng.randrange(1, 12))]
+                if i % 5:
+                    src = f"/home/user/projects/p{i % 300}"
+                    line = (f"{stamp} | src={src} | files={';'.join(src + '/' + n for n in names)} | "
+                            f"dest=/mnt/share/archive/{i % 40}\n")
+                else:
+                    line = f"{stamp}: {', '.join(names)} -> /mnt/share/archive/{i % 40}\n"
+                f.write(line)
+                written += len(line.encode("utf-8"))
+                i += 1
+        _done(folder, params)
+    return path
@@ -0,0 +1,10 @@
+"""
+Спільне для тестів; імпортується раніше за toolbox. LOG_FOLDER (історія, журнал, settings.ini)
+визначається від тимчасової папки при імпорті toolbox, тому вона перенаправляється в окрему
+папку — справжні дані не чіпаються, а після тестів папка видаляється.
+"""
+import atexit, shutil, tempfile
+
+TEMP = tempfile.mkdtemp(prefix="toolbox-test-")
+tempfile.tempdir = TEMP
+atexit.register(shutil.rmtree, TEMP, True)
@@ -0,0 +1,57 @@
+"""Заміна дельтою без reflink (toolbox/delta.py): змінені блоки — на місці, з відкатом."""
+import os, shutil, tempfile, unittest
+
+import support  # noqa: F401 — перенаправляє LOG_FOLDER, тому раніше за toolbox
+from toolbox import copier, delta
+
+MB = 1024 * 1024
+
+
+class DeltaInPlaceTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src = os.path.join(self.root, "src.bin")
+        self.dst = os.path.join(self.root, "dst.bin")
+        self.old = os.urandom(8 * MB)
+        new = bytearray(self.old)
+        new[3 * MB:3 * MB + 10] = b"x" * 10
+        self.new = bytes(new) + os.urandom(MB // 2)
+        with open(self.dst, "wb") as f:
+            f.write(self.old)
+        with open(self.src, "wb") as f:
+            f.write(self.new)
+        os.utime(self.dst, ns=(10**18, 10**18))
+        self.reflink, copier.reflink = copier.reflink, lambda src, dst: False  # як на ext4/NTFS
+
+    def tearDown(self):
+        copier.reflink = self.reflink
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def read(self, path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def test_writes_only_changed_blocks(self):
+        stats = delta.delta_copy(self.src, self.dst, max_changed_percent=50)
+        self.assertEqual(stats["method"], "delta")
+        self.assertEqual(stats["written"], delta.BLOCK_SIZE + MB // 2)
+        self.assertEqual(self.read(self.dst), self.new)
+        self.assertEqual(sorted(os.listdir(self.root)), ["dst.bin", "src.bin"])
+
+    def test_failed_check_rolls_back(self):
+        def check(path):
+            raise OSError("не збігається")
+        with self.assertRaises(OSError):
+            delta.delta_copy(self.src, self.dst, max_changed_percent=50, check=check)
+        self.assertEqual(self.read(self.dst), self.old)
+        self.assertEqual(os.stat(self.dst).st_mtime_ns, 10**18)
+        self.assertFalse(os.path.exists(delta.undo_path(self.dst)))
+
+    def test_too_many_changes_copies(self):
+        stats = delta.delta_copy(self.src, self.dst, max_changed_percent=0)
+        self.assertEqual(stats["written"], len(self.new))
+        self.assertEqual(self.read(self.dst), self.new)
+
+
+if __name__ == "__main__":
+    unittest.main()
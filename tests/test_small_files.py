@@ -0,0 +1,61 @@
+"""Швидкий шлях для малих файлів (engine.run_operation, settings.ini [small_files])."""
+import os, shutil, tempfile, threading, time, unittest
+
+import support  # noqa: F401 — перенаправляє LOG_FOLDER, тому раніше за toolbox
+from toolbox import engine, scheduler
+
+
+class SmallFilesTest(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.src = os.path.join(self.root, "src")
+        self.dest = os.path.join(self.root, "dest")
+        os.makedirs(self.src)
+        os.makedirs(self.dest)
+        self.files = []
+        for name, data in (("empty.dat", b""), ("small.txt", b"small file")):
+            path = os.path.join(self.src, name)
+            with open(path, "wb") as f:
+                f.write(data)
+            self.files.append(path)
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def copy(self, threshold_kb):
+        return engine.run_operation(self.files, self.dest, src_folder=self.src, record_history=False,
+                                    small_threshold_kb=threshold_kb)
+
+    def test_threshold_zero_disables_small_path(self):
+        result = self.copy(0)
+        self.assertNotIn("small", result["methods"])
+        self.assertEqual(result["files"], 2)
+
+    def test_small_path_copies_empty_files(self):
+        result = self.copy(64)
+        self.assertEqual(result["methods"], {"small": 2})
+        for path in self.files:
+            with open(path, "rb") as a, open(os.path.join(self.dest, os.path.basename(path)), "rb") as b:
+                self.assertEqual(a.read(), b.read())
+
+    def test_batches_respect_device_limit(self):
+        settings = engine.load_settings()
+        settings.set("parallel", "overrides", f"{self.root}=1")
+        limits = scheduler.DeviceLimits(settings)
+        state = {"now": 0, "max": 0}
+        lock = threading.Lock()
+
+        def batch(items):
+            with lock:
+                state["now"] += 1
+                state["max"] = max(state["max"], state["now"])
+            time.sleep(0.01)
+            with lock:
+                state["now"] -= 1
+        scheduler.run_batches(list(range(scheduler.BATCH_SIZE * 8)), batch, 16, limits=limits,
+                              paths=[self.src, self.dest])
+        self.assertEqual(state["max"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
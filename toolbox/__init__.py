@@ -0,0 +1,4 @@
+"""
+Tool Box — копіювання та переміщення файлів "з папки в папку".
+engine — ядро без Tkinter, cli — командний рядок (python -m toolbox).
+"""
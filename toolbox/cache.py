@@ -0,0 +1,297 @@
+"""
+Кеш підготовлених файлів (режими link і snapshot) замість щоденних тимчасових папок.
+
+    cache/objects/ab/abcdef...  — вміст, адресований хешем BLAKE2 (однаковий вміст зберігається один раз)
+    cache/staged/<ключ>/<ім'я>  — жорсткі посилання на об'єкти з оригінальними іменами для вставки
+                                  (ключ — хеш шляху оригіналу: однойменні файли з різних папок не змішуються)
+    cache/cache.db              — індекс SQLite: об'єкти, відомі джерела, лічильники
+
+Незмінений файл (той самий шлях, розмір і mtime) не читається повторно — одразу влучання в кеш.
+Розмір кешу обмежується settings.ini [cache] max_size_mb / max_age_days; найдавніше використані
+об'єкти видаляються першими.
+"""
+import hashlib, os, re, shutil, sqlite3, threading, time
+from contextlib import contextmanager
+
+from toolbox import copier
+from toolbox.engine import LOG_FOLDER, load_settings
+
+CACHE_FOLDER = os.path.join(LOG_FOLDER, "cache")
+OBJECTS_FOLDER = os.path.join(CACHE_FOLDER, "objects")
+STAGED_FOLDER = os.path.join(CACHE_FOLDER, "staged")
+CACHE_DB = os.path.join(CACHE_FOLDER, "cache.db")
+
+COUNTERS = ("hits", "misses", "bytes_saved", "evictions", "bytes_reclaimed")
+_LEGACY_FOLDER = re.compile(r"^\d{4}-\d{2}-\d{2}$")  # старі щоденні тимчасові папки
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS objects (
+    hash TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, last_used REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS objects_size ON objects(size);
+CREATE INDEX IF NOT EXISTS objects_last_used ON objects(last_used);
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, hash TEXT NOT NULL);
+CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL);
+"""
+
+
+@contextmanager
+def _connect():
+    """З'єднання з індексом: транзакція комітиться при виході, з'єднання закривається."""
+    os.makedirs(OBJECTS_FOLDER, exist_ok=True)
+    os.makedirs(STAGED_FOLDER, exist_ok=True)
+    db = sqlite3.connect(CACHE_DB, timeout=30)
+    try:
+        db.executescript(_SCHEMA)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _bump(db, name, value=1):
+    db.execute("INSERT INTO counters(name, value) VALUES (?, ?) "
+               "ON CONFLICT(name) DO UPDATE SET value = value + excluded.value", (name, value))
+
+
+def _object_path(digest):
+    return os.path.join(OBJECTS_FOLDER, digest[:2], digest)
+
+
+def _new_hasher():
+    return hashlib.blake2b(digest_size=16)
+
+
+def staged_view(path):
+    """Шлях у cache/staged, під яким готується оригінал path (папка за хешем шляху, те саме ім'я)."""
+    path = os.path.abspath(path)
+    key = hashlib.blake2b(os.fsencode(path), digest_size=8).hexdigest()
+    return os.path.join(STAGED_FOLDER, key, os.path.basename(path))
+
+
+def is_staged(path):
+    """Чи path — посилання у cache/staged (результат stage)."""
+    return os.path.dirname(os.path.dirname(os.path.abspath(path))) == STAGED_FOLDER
+
+
+def stage(path, link_source=False, control=None, progress=None):
+    """
+    Готує один файл до вставки і повертає шлях у cache/staged з тим самим іменем (staged_view).
+    link_source=True — жорстке посилання на сам оригінал (режим link), якщо той на тому ж диску;
+    інакше (і для snapshot) — посилання на об'єкт кешу.
+    progress(n) отримує байти, які довелося прочитати чи записати (влучання — одразу весь розмір).
+    """
+    if is_staged(path):
+        return os.path.abspath(path)
+    view = staged_view(path)
+    os.makedirs(os.path.dirname(view), exist_ok=True)
+    if os.path.lexists(view):
+        os.remove(view)  # ніколи не пишемо в старе посилання — воно може вказувати на оригінал
+    if link_source:
+        try:
+            os.link(path, view)
+        except OSError:
+            pass
+        else:
+            if progress is not None:
+                progress(os.path.getsize(view))
+            return view
+    with _connect() as db:
+        obj = _ensure_object(db, path, control, progress)
+    try:
+        os.link(obj, view)
+    except OSError:  # ФС без жорстких посилань
+        copier.copy_file(obj, view, control=control)
+    return view
+
+
+def _ensure_object(db, path, control, progress):
+    st = os.stat(path)
+    now = time.time()
+    row = db.execute("SELECT hash FROM sources WHERE path = ? AND size = ? AND mtime_ns = ?",
+                     (path, st.st_size, st.st_mtime_ns)).fetchone()
+    if row and _object_valid(db, row[0]):
+        return _hit(db, row[0], st.st_size, now, progress)
+
+    # Якщо в кеші є об'єкт такого ж розміру — спершу лише хешуємо (без запису): можливо, це дублікат
+    if db.execute("SELECT 1 FROM objects WHERE size = ? LIMIT 1", (st.st_size,)).fetchone():
+        digest = copier.hash_file(path, _new_hasher(), control=control).hexdigest()
+        if _object_valid(db, digest):
+            _remember_source(db, path, st, digest)
+            return _hit(db, digest, st.st_size, now, progress)
+    else:
+        digest = None
+
+    tmp = os.path.join(OBJECTS_FOLDER, f".tmp-{os.getpid()}-{threading.get_ident()}")
+    _remove_quietly(tmp)
+    try:
+        if copier.reflink(path, tmp):
+            if digest is None:
+                digest = copier.hash_file(tmp, _new_hasher(), control=control).hexdigest()
+            if progress is not None:
+                progress(st.st_size)
+        else:
+            hasher = _new_hasher()
+            copier.copy_file(path, tmp, control=control, progress=progress, hasher=hasher)
+            digest = hasher.hexdigest()
+        # Час зміни оригіналу — щоб синхронізація порівнювала посилання у staged з цільовими файлами
+        os.utime(tmp, ns=(st.st_atime_ns, st.st_mtime_ns))
+        obj = _object_path(digest)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        os.replace(tmp, obj)
+    except BaseException:
+        _remove_quietly(tmp)
+        raise
+    obj_st = os.stat(obj)
+    db.execute("INSERT OR REPLACE INTO objects(hash, size, mtime_ns, last_used) VALUES (?, ?, ?, ?)",
+               (digest, obj_st.st_size, obj_st.st_mtime_ns, now))
+    _remember_source(db, path, st, digest)
+    _bump(db, "misses")
+    return obj
+
+
+def _hit(db, digest, size, now, progress):
+    db.execute("UPDATE objects SET last_used = ? WHERE hash = ?", (now, digest))
+    _bump(db, "hits")
+    _bump(db, "bytes_saved", size)
+    if progress is not None and size:
+        progress(size)
+    return _object_path(digest)
+
+
+def _remember_source(db, path, st, digest):
+    db.execute("INSERT OR REPLACE INTO sources(path, size, mtime_ns, hash) VALUES (?, ?, ?, ?)",
+               (path, st.st_size, st.st_mtime_ns, digest))
+
+
+def _object_valid(db, digest):
+    """Об'єкт існує і не змінювався (його могли відредагувати через посилання у staged)."""
+    row = db.execute("SELECT size, mtime_ns FROM objects WHERE hash = ?", (digest,)).fetchone()
+    if not row:
+        return False
+    try:
+        st = os.stat(_object_path(digest))
+    except OSError:
+        st = None
+    if st is None or (st.st_size, st.st_mtime_ns) != row:
+        _drop_object(db, digest)
+        return False
+    return True
+
+
+def _drop_object(db, digest):
+    """Видаляє об'єкт; повертає звільнені байти (0, якщо дані ще тримає посилання у staged)."""
+    path = _object_path(digest)
+    freed = 0
+    try:
+        st = os.stat(path)
+        os.remove(path)
+        if st.st_nlink <= 1:
+            freed = st.st_size
+    except OSError:
+        pass
+    db.execute("DELETE FROM objects WHERE hash = ?", (digest,))
+    db.execute("DELETE FROM sources WHERE hash = ?", (digest,))
+    return freed
+
+
+# ---------------- Обмеження розміру ----------------
+
+def evict(max_size_mb=None, max_age_days=None, keep_since=None):
+    """
+    Видаляє об'єкти, старші за max_age_days, і найдавніше використані, доки кеш більший за max_size_mb
+    (за замовчуванням — з settings.ini). Об'єкти, використані після keep_since, не чіпаються.
+    Також прибирає старі щоденні папки і посилання у staged, старші за max_age_days.
+    Повертає {"removed": кількість, "bytes": звільнено байтів}.
+    """
+    settings = load_settings()
+    if max_size_mb is None:
+        max_size_mb = settings.getint("cache", "max_size_mb")
+    if max_age_days is None:
+        max_age_days = settings.getint("cache", "max_age_days")
+    max_bytes = max_size_mb * 1024 * 1024
+    cutoff = time.time() - max_age_days * 86400
+    if keep_since is None:
+        keep_since = float("inf")
+    removed, reclaimed = 0, 0
+    with _connect() as db:
+        total = db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        for digest, size, last_used in db.execute(
+                "SELECT hash, size, last_used FROM objects ORDER BY last_used").fetchall():
+            if last_used >= keep_since or (total <= max_bytes and last_used >= cutoff):
+                break
+            reclaimed += _drop_object(db, digest)
+            total -= size
+            removed += 1
+        reclaimed += _cleanup_staged(cutoff) + _cleanup_legacy_folders()
+        _bump(db, "evictions", removed)
+        _bump(db, "bytes_reclaimed", reclaimed)
+    return {"removed": removed, "bytes": reclaimed}
+
+
+def _cleanup_staged(cutoff, folder=STAGED_FOLDER):
+    """
+    Посилання у staged, до яких давно не зверталися, і папки, що після них спорожніли (посилання
+    попередніх версій лежать прямо в staged). Повертає звільнені байти (лише якщо inode зник).
+    """
+    freed = 0
+    if not os.path.isdir(folder):
+        return 0
+    for entry in os.scandir(folder):
+        try:
+            if entry.is_dir(follow_symlinks=False):
+                freed += _cleanup_staged(cutoff, entry.path)
+                try:
+                    os.rmdir(entry.path)
+                except OSError:
+                    pass  # ще не порожня
+                continue
+            st = entry.stat(follow_symlinks=False)
+            if st.st_ctime < cutoff:
+                os.remove(entry.path)
+                if st.st_nlink <= 1:
+                    freed += st.st_size
+        except OSError:
+            pass
+    return freed
+
+
+def _cleanup_legacy_folders():
+    """Щоденні папки LOG_FOLDER/YYYY-MM-DD, які створювали попередні версії."""
+    freed = 0
+    if not os.path.isdir(LOG_FOLDER):
+        return 0
+    for entry in os.scandir(LOG_FOLDER):
+        if entry.is_dir(follow_symlinks=False) and _LEGACY_FOLDER.match(entry.name):
+            for root, _, files in os.walk(entry.path):
+                for f in files:
+                    try:
+                        freed += os.path.getsize(os.path.join(root, f))
+                    except OSError:
+                        pass
+            shutil.rmtree(entry.path, ignore_errors=True)
+    return freed
+
+
+def clear():
+    """Повністю очищає кеш (разом з лічильниками)."""
+    shutil.rmtree(CACHE_FOLDER, ignore_errors=True)
+
+
+def stats():
+    """Звіт: кількість і розмір об'єктів, влучання/промахи, частка влучань, звільнене місце."""
+    with _connect() as db:
+        objects, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM objects").fetchone()
+        counters = dict(db.execute("SELECT name, value FROM counters").fetchall())
+    report = {name: counters.get(name, 0) for name in COUNTERS}
+    lookups = report["hits"] + report["misses"]
+    report.update(objects=objects, size=size,
+                  hit_rate=report["hits"] / lookups if lookups else 0.0)
+    return report
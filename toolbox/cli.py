@@ -0,0 +1,306 @@
+"""
+Командний рядок Tool Box (без Tkinter):
+
+    python -m toolbox run --profile 3 [--sync [--compare hash]] [--move] [--verify] [--limit МБ/с] [--priority idle]
+                               [--profiler cprofile|sample|off]
+    python -m toolbox verify ID [--list]
+    python -m toolbox resume [ID] [--list | --discard ID]
+    python -m toolbox watch --profile 3
+    python -m toolbox profiles
+    python -m toolbox history -n 20 [--search TEXT [--field file]] [--before ID]
+    python -m toolbox metrics [--after ID] [--out FILE]
+    python -m toolbox copy SRC... DEST [--method copy_file_range]
+    python -m toolbox cache [--evict | --clear]
+    python -m toolbox index [--update] [--search TEXT [--folder DIR]]
+"""
+import argparse, json, os, shutil, sys, time
+
+from toolbox import copier, engine, scheduler
+
+# --- Коди виходу ---
+EXIT_OK = 0
+EXIT_ERROR = 1      # непередбачена помилка
+EXIT_USAGE = 2      # неправильні аргументи (argparse)
+EXIT_PROFILE = 3    # профіль порожній або неповний
+EXIT_PARTIAL = 4    # частину файлів не знайдено або не скопійовано
+
+
+def cmd_run(args):
+    idx = args.profile - 1
+    result = engine.replay_profile(idx, on_conflict=engine.conflict_policy(args.on_conflict),
+                                   sync=args.sync, compare=args.compare, move=args.move, verify=args.verify,
+                                   limit_mbps=args.limit, priority=args.priority, profiler=args.profiler)
+    for src, dest in result["copied"]:
+        print(f"{os.path.basename(src)} -> {dest}")
+    for name in result["skipped"]:
+        print(f"пропущено: {name}")
+    for name in result["missing"]:
+        print(f"не знайдено: {name}", file=sys.stderr)
+    for path, err in result["errors"]:
+        print(f"помилка: {path}: {err}", file=sys.stderr)
+    verb = "Переміщено" if result["move"] else "Вставлено"
+    for dest_result in result.get("destinations", []):
+        print(f"{dest_result['dest']}: вставлено {dest_result['files']}, пропущено "
+              f"{len(dest_result['skipped']) + len(dest_result['unchanged'])}, помилок {len(dest_result['errors'])}")
+    print(f"{verb} {result['files']} файл(ів) у {result['dest']}")
+    for report in result["folders"]:
+        print(f"Папка {report['src']} -> {report['target']}: файлів {report['files']}, "
+              f"створено папок {report['dirs']}" + (", не завершено" if report["cancelled"] else ""))
+    if result["unchanged"]:
+        print(f"Без змін (пропущено): {len(result['unchanged'])} файл(ів), "
+              f"{result['unchanged_bytes'] / (1024 * 1024):.1f} МБ")
+    if result["delta_saved"]:
+        print(f"Дельта: не переписано {result['delta_saved'] / (1024 * 1024):.1f} МБ")
+    if result["copied"]:
+        methods = ", ".join(f"{m} ×{n}" for m, n in result["methods"].items())
+        print(f"{engine.format_speed(result['bytes'], result['seconds'])}; {methods}")
+        if "bytes_read" in result:
+            print(f"Прочитано джерел: {result['bytes_read'] / (1024 * 1024):.1f} МБ (один раз для всіх папок)")
+    if result["verified"]:
+        print(f"Перевірено ({result['verified']}): {len(result['manifest'])} файл(ів)")
+    if "metrics" in result:
+        phases = ", ".join(f"{phase} {seconds:.2f}" for phase, seconds in result["metrics"]["phases"].items())
+        print(f"Фази, с: {phases}")
+    if "profile_report" in result:
+        print(f"Профіль: {result['profile_report']}")
+    if result["missing"] or result["errors"]:
+        return EXIT_PARTIAL
+    return EXIT_OK
+
+def cmd_copy(args):
+    """Пряме копіювання файлів — щоб порівняти швидкість способів між собою і з shutil.copy."""
+    status = EXIT_OK
+    for src in args.src:
+        try:
+            if args.method == "shutil":
+                started = time.perf_counter()
+                dst = shutil.copy(src, args.dest)
+                stats = {"path": dst, "method": "shutil", "bytes": os.path.getsize(src),
+                         "seconds": time.perf_counter() - started}
+            else:
+                stats = copier.copy_file(src, args.dest, method=args.method)
+        except OSError as e:
+            print(f"помилка: {src}: {e}", file=sys.stderr)
+            status = EXIT_PARTIAL
+            continue
+        print(f"{stats['path']}: {stats['method']}, {engine.format_speed(stats['bytes'], stats['seconds'])}")
+    return status
+
+def cmd_cache(args):
+    from toolbox import cache
+    if args.clear:
+        cache.clear()
+        print("Кеш очищено")
+        return EXIT_OK
+    if args.evict:
+        evicted = cache.evict()
+        print(f"Видалено об'єктів: {evicted['removed']}, звільнено {evicted['bytes'] / (1024 * 1024):.1f} МБ")
+    report = cache.stats()
+    mb = 1024 * 1024
+    print(f"Об'єктів: {report['objects']}, розмір {report['size'] / mb:.1f} МБ")
+    print(f"Влучання: {report['hits']}, промахи: {report['misses']} ({report['hit_rate']:.0%} влучань)")
+    print(f"Не скопійовано завдяки кешу: {report['bytes_saved'] / mb:.1f} МБ")
+    print(f"Витіснено об'єктів: {report['evictions']}, звільнено {report['bytes_reclaimed'] / mb:.1f} МБ")
+    return EXIT_OK
+
+def cmd_index(args):
+    from toolbox import index
+    if args.update:
+        started = time.perf_counter()
+        for step in index.update():
+            print(f"{step['root']}: перевірено папок {step['dirs']}, перечитано {step['scanned']}", file=sys.stderr)
+        print(f"Індекс оновлено за {time.perf_counter() - started:.1f} с")
+    if args.search is not None:
+        folders = [args.folder] if args.folder else [path for path, _ in index.status()["roots"]]
+        for folder in folders:
+            for chunk in index.search(folder, pattern=args.search):
+                for rel, _ in chunk:
+                    print(os.path.join(folder, rel))
+        return EXIT_OK
+    report = index.status()
+    for path, updated in report["roots"]:
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(updated)) if updated else "ще не оновлено"
+        print(f"{path} ({when})")
+    print(f"Індекс: {index.format_status(report)}")
+    return EXIT_OK
+
+def cmd_verify(args):
+    """Перечитує цілі операції з історії і порівнює з її маніфестом (джерела не потрібні)."""
+    from toolbox import history, verify
+    if args.list:
+        for path, size, mtime_ns, digest in history.manifest(args.id):
+            print(f"{digest}  {path}")
+        return EXIT_OK
+    report = verify.verify_operation(args.id)
+    for path in report["changed"]:
+        print(f"змінено: {path}", file=sys.stderr)
+    for path in report["missing"]:
+        print(f"відсутній: {path}", file=sys.stderr)
+    print(f"Операція #{args.id} ({report['algorithm']}): збігається {len(report['ok'])}, "
+          f"змінено {len(report['changed'])}, відсутні {len(report['missing'])}")
+    return EXIT_PARTIAL if report["changed"] or report["missing"] else EXIT_OK
+
+def cmd_resume(args):
+    """Продовжує операції, перервані збоєм (журнал toolbox/journal.py)."""
+    from toolbox import journal
+    if args.discard is not None:
+        print(f"Операцію #{args.discard} відкинуто, видалено тимчасових файлів: {journal.discard(args.discard)}")
+        return EXIT_OK
+    if args.list:
+        for batch in journal.pending():
+            print(f"#{batch['id']} {batch['started']} {batch['src_folder']}: "
+                  f"недописано {len(batch['items'])} файл(ів)")
+            for item in batch["items"]:
+                print(f"    {item['target']} ({item['offset'] / (1024 * 1024):.1f} МБ записано)")
+        return EXIT_OK
+    reports = journal.resume(args.id)
+    if not reports:
+        print("Незавершених операцій немає")
+    status = EXIT_OK
+    for report in reports:
+        for src, err in report["errors"]:
+            print(f"помилка: {src}: {err}", file=sys.stderr)
+        print(f"#{report['id']}: дописано {len(report['copied'])} файл(ів), не перекопійовано "
+              f"{report['resumed_bytes'] / (1024 * 1024):.1f} МБ, помилок {len(report['errors'])}")
+        if report["errors"]:
+            status = EXIT_PARTIAL
+    return status
+
+def cmd_watch(args):
+    """Стежить за папкою src профілю і передає нові файли, доки не перервуть (Ctrl+C, SIGTERM)."""
+    import signal
+    from toolbox import watch
+    control = copier.TransferControl()
+    signal.signal(signal.SIGTERM, lambda signum, frame: control.cancel())
+    print(f"Стеження за профілем {args.profile} (Ctrl+C — зупинити)", file=sys.stderr)
+    status = EXIT_OK
+    try:
+        for result in watch.watch_profile(args.profile - 1, control=control):
+            for path, err in result["errors"]:
+                print(f"помилка: {path}: {err}", file=sys.stderr)
+                status = EXIT_PARTIAL
+            print(f"{time.strftime('%Y-%m-%d %H:%M:%S')} нових {len(result['files'])}: "
+                  f"передано {len(result['copied'])}, без змін {len(result['unchanged'])}, "
+                  f"помилок {len(result['errors'])} -> {result['dest']}", flush=True)
+    except KeyboardInterrupt:
+        control.cancel()
+    return status
+
+def cmd_profiles(args):
+    profiles = engine.load_profiles()
+    for i in range(engine.NUM_PROFILES):
+        p = profiles.get(i)
+        if p:
+            print(f"{i+1}: {p.get('src')} -> {'; '.join(engine.profile_dests(p))} ({len(p.get('files', []))} файл(ів))")
+        else:
+            print(f"{i+1}: —")
+    return EXIT_OK
+
+def cmd_history(args):
+    for parsed in engine.read_history(args.n, before_id=args.before, search=args.search, field=args.field):
+        print(f"#{parsed['id']} {engine.format_history_entry(parsed)}")
+    return EXIT_OK
+
+def cmd_metrics(args):
+    """Метрики операцій з історії — рядками JSON (один рядок — одна операція)."""
+    from toolbox import history
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        for row in history.metrics(after_id=args.after):
+            out.write(json.dumps(row, ensure_ascii=False) + "\n")
+    finally:
+        if args.out:
+            out.close()
+    return EXIT_OK
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="toolbox", description="Tool Box без GUI")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p_run = sub.add_parser("run", help="виконати збережений профіль")
+    p_run.add_argument("--profile", type=int, required=True, choices=range(1, engine.NUM_PROFILES + 1),
+                       metavar=f"1..{engine.NUM_PROFILES}", help="номер профілю (як на кнопці)")
+    p_run.add_argument("--on-conflict", choices=("rename", "replace", "cancel"), default="rename",
+                       help="що робити, якщо файл вже існує (cancel — пропустити)")
+    p_run.add_argument("--sync", action=argparse.BooleanOptionalAction, default=None,
+                       help="копіювати лише нові та змінені файли (за замовчуванням — як у профілі)")
+    p_run.add_argument("--compare", choices=engine.SYNC_COMPARE, default=None,
+                       help="як порівнювати файли при синхронізації (за замовчуванням — як у профілі)")
+    p_run.add_argument("--move", action=argparse.BooleanOptionalAction, default=None,
+                       help="перемістити файли замість копіювання (за замовчуванням — як у профілі)")
+    p_run.add_argument("--verify", action=argparse.BooleanOptionalAction, default=None,
+                       help="перевіряти копії контрольними сумами і записати маніфест "
+                            "(за замовчуванням — як у профілі або settings.ini [verify])")
+    p_run.add_argument("--limit", type=float, metavar="МБ/с",
+                       help="ліміт швидкості, 0 — без ліміту (за замовчуванням — як у профілі або settings.ini)")
+    p_run.add_argument("--priority", choices=scheduler.PRIORITIES,
+                       help="пріоритет диска (за замовчуванням — як у профілі або settings.ini [throttle])")
+    p_run.add_argument("--profiler", choices=("cprofile", "sample", "off"),
+                       help="профілювати операцію і зберегти звіт (за замовчуванням — settings.ini [profiling])")
+    p_run.set_defaults(func=cmd_run)
+
+    p_verify = sub.add_parser("verify", help="перевірити цілі операції з історії за її маніфестом")
+    p_verify.add_argument("id", type=int, help="номер операції (#ID у history)")
+    p_verify.add_argument("--list", action="store_true", help="лише вивести маніфест (хеш  шлях)")
+    p_verify.set_defaults(func=cmd_verify)
+
+    p_resume = sub.add_parser("resume", help="продовжити операції, перервані збоєм чи закриттям програми")
+    p_resume.add_argument("id", type=int, nargs="?", help="номер операції з --list (за замовчуванням — усі)")
+    g_resume = p_resume.add_mutually_exclusive_group()
+    g_resume.add_argument("--list", action="store_true", help="лише показати незавершені операції")
+    g_resume.add_argument("--discard", type=int, metavar="ID",
+                          help="відмовитись від продовження і видалити тимчасові файли")
+    p_resume.set_defaults(func=cmd_resume)
+
+    p_watch = sub.add_parser("watch", help="стежити за папкою src профілю і передавати нові файли")
+    p_watch.add_argument("--profile", type=int, required=True, choices=range(1, engine.NUM_PROFILES + 1),
+                         metavar=f"1..{engine.NUM_PROFILES}", help="номер профілю (як на кнопці)")
+    p_watch.set_defaults(func=cmd_watch)
+
+    p_copy = sub.add_parser("copy", help="скопіювати файли напряму і показати спосіб та МБ/с")
+    p_copy.add_argument("src", nargs="+", help="файли")
+    p_copy.add_argument("dest", help="папка або файл призначення")
+    p_copy.add_argument("--method", choices=copier.METHODS + ("shutil",),
+                        help="примусовий спосіб (за замовчуванням — найшвидший доступний)")
+    p_copy.set_defaults(func=cmd_copy)
+
+    p_cache = sub.add_parser("cache", help="звіт про кеш підготовлених файлів")
+    g_cache = p_cache.add_mutually_exclusive_group()
+    g_cache.add_argument("--evict", action="store_true", help="витіснити старі об'єкти за лімітами з settings.ini")
+    g_cache.add_argument("--clear", action="store_true", help="видалити весь кеш")
+    p_cache.set_defaults(func=cmd_cache)
+
+    p_index = sub.add_parser("index", help="індекс імен файлів для миттєвого пошуку")
+    p_index.add_argument("--update", action="store_true",
+                         help="оновити індекс (корені — settings.ini [index] roots або папки src профілів)")
+    p_index.add_argument("--search", metavar="TEXT", help="частина імені або шаблон з * і ?")
+    p_index.add_argument("--folder", help="шукати лише в цій папці (за замовчуванням — в усіх коренях)")
+    p_index.set_defaults(func=cmd_index)
+
+    p_prof = sub.add_parser("profiles", help="показати профілі")
+    p_prof.set_defaults(func=cmd_profiles)
+
+    p_hist = sub.add_parser("history", help="показати останні операції")
+    p_hist.add_argument("-n", type=int, default=engine.HISTORY_LIMIT, help="кількість записів")
+    p_hist.add_argument("--search", help="текст у src, dest або імені файлу")
+    p_hist.add_argument("--field", choices=("any", "src", "dest", "file"), default="any",
+                        help="де шукати --search")
+    p_hist.add_argument("--before", type=int, metavar="ID", help="записи, старіші за операцію #ID")
+    p_hist.set_defaults(func=cmd_history)
+
+    p_metrics = sub.add_parser("metrics", help="метрики операцій з історії рядками JSON (фази, МБ/с, файли/с)")
+    p_metrics.add_argument("--after", type=int, metavar="ID", help="лише операції, новіші за #ID")
+    p_metrics.add_argument("--out", metavar="FILE", help="записати у файл (за замовчуванням — у stdout)")
+    p_metrics.set_defaults(func=cmd_metrics)
+    return parser
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.func(args)
+    except engine.ProfileError as e:
+        print(e, file=sys.stderr)
+        return EXIT_PROFILE
+    except (engine.ToolBoxError, OSError) as e:
+        print(f"Помилка: {e}", file=sys.stderr)
+        return EXIT_ERROR
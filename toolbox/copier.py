@@ -0,0 +1,715 @@
+"""
+Копіювання файлу з найшвидшим доступним способом і можливістю паузи та скасування між блоками.
+
+Способи (METHODS), від найшвидшого:
+    reflink          — клон на рівні ФС (btrfs, xfs...), дані не копіюються взагалі
+    copy_file_range  — копіювання в ядрі, без передачі даних у Python
+    sendfile         — те саме для старіших ядер / різних ФС
+    readinto         — звичайний цикл читання-запису з одним буфером на потік
+"""
+import errno, hashlib, os, stat, sys, threading, time
+
+CHUNK_SIZE = 1024 * 1024              # мінімальний буфер для readinto
+MAX_CHUNK_SIZE = 8 * 1024 * 1024      # максимальний буфер (мережеві диски з великим st_blksize)
+KERNEL_CHUNK_SIZE = 16 * 1024 * 1024  # скільки байтів за один виклик ядра (між checkpoint)
+JOURNAL_INTERVAL = 64 * 1024 * 1024   # як часто скидати тимчасовий файл на диск і писати зміщення в журнал
+BURST_SECONDS = 0.25                  # обмеження швидкості: скільки секунд ліміту можна передати одним ривком
+FICLONE = 0x40049409  # ioctl Linux: клонування файлу (btrfs, xfs, bcachefs...)
+
+METHODS = ("reflink", "copy_file_range", "sendfile", "readinto")
+
+# Помилки, які означають "ФС/ядро так не вміє" — тоді пробуємо наступний спосіб
+_UNSUPPORTED_ERRNOS = {errno.EXDEV, errno.EINVAL, errno.ENOTTY, errno.EPERM, errno.EBADF, errno.ENOSYS,
+                       getattr(errno, "EOPNOTSUPP", errno.EINVAL), getattr(errno, "ENOTSUP", errno.EINVAL)}
+
+_local = threading.local()  # буфер readinto перевикористовується в межах потоку
+_umask_lock = threading.Lock()
+_umask_value = None
+
+
+class TransferCancelled(Exception):
+    """Передачу скасовано користувачем."""
+
+
+class _Unsupported(Exception):
+    """Спосіб копіювання недоступний для цієї пари файлів (нічого ще не записано)."""
+
+
+class TransferControl:
+    """
+    Керування передачею з іншого потоку (GUI): пауза, продовження, скасування, обмеження швидкості.
+    Потік, що копіює, викликає checkpoint() між блоками і consume(n) після кожного блоку.
+    Ліміт — "відро жетонів", спільне для всіх потоків операції; set_limit() діє одразу, і під час передачі теж.
+    timings — {фаза: секунди}, сумарно по всіх потоках: fsync, verify (перечитування копій з диска),
+    throttled (очікування через ліміт швидкості).
+    """
+    def __init__(self, limit=None):
+        self._cancelled = threading.Event()
+        self._running = threading.Event()
+        self._running.set()
+        self._lock = threading.Lock()
+        self.timings = {}
+        self.set_limit(limit)
+
+    def pause(self):
+        self._running.clear()
+
+    def resume(self):
+        self._running.set()
+
+    def cancel(self):
+        self._cancelled.set()
+        self._running.set()  # розбудити потік на паузі, щоб він завершився
+
+    @property
+    def paused(self):
+        return not self._running.is_set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def checkpoint(self):
+        self._running.wait()
+        if self._cancelled.is_set():
+            raise TransferCancelled("Операцію скасовано")
+
+    def set_limit(self, bytes_per_second):
+        """Ліміт швидкості в байтах за секунду; None або 0 — без обмеження."""
+        with self._lock:
+            self._rate = bytes_per_second or None
+            self._tokens = 0.0
+            self._stamp = time.monotonic()
+
+    @property
+    def limit(self):
+        return self._rate
+
+    def block_size(self, size):
+        """Найбільший блок, який варто передавати за раз, щоб ліміт тримався рівно (а не ривками)."""
+        rate = self._rate
+        return size if rate is None else max(64 * 1024, min(size, int(rate * BURST_SECONDS)))
+
+    def consume(self, n):
+        """Списує n переданих байтів; якщо ліміт перевищено — чекає, доки відро не наповниться."""
+        if self._rate is None:
+            return
+        with self._lock:
+            self._refill()
+            self._tokens -= n
+            if self._tokens >= 0:
+                return
+        started = time.perf_counter()
+        while True:
+            with self._lock:
+                if self._rate is not None:
+                    self._refill()
+                if self._rate is None or self._tokens >= 0:
+                    break
+                delay = -self._tokens / self._rate
+            if self._cancelled.wait(min(delay, 0.1)):  # короткими кроками: ліміт могли змінити
+                break
+        self.add_time("throttled", time.perf_counter() - started)
+
+    def add_time(self, phase, seconds):
+        with self._lock:
+            self.timings[phase] = self.timings.get(phase, 0.0) + seconds
+
+    def _refill(self):
+        now = time.monotonic()
+        if self._rate is not None:
+            self._tokens = min(self._tokens + (now - self._stamp) * self._rate, self._rate * BURST_SECONDS)
+        self._stamp = now
+
+
+def available_methods():
+    """Способи, які має сенс пробувати на цій ОС, у порядку переваги."""
+    if sys.platform.startswith("linux"):
+        return list(METHODS)
+    return ["readinto"]
+
+
+def copy_file(src, dst, control=None, progress=None, method=None, hasher=None, resume_offset=0, journal=None,
+              check=None, durable=False):
+    """
+    Копіює вміст і права доступу src у dst (як shutil.copy, але без зайвих stat/chmod за шляхом).
+    Дані пишуться в тимчасовий файл поруч (part_path) і лише після повного запису атомарно
+    перейменовуються в dst — недописаного файлу під справжнім іменем не буває.
+    method — один із METHODS; None — найшвидший доступний з автоматичним відкатом.
+    hasher (наприклад hashlib.blake2b()) отримує всі байти файлу під час копіювання;
+    тоді дані мусять пройти через Python, тому використовується лише readinto.
+    progress(n) викликається після кожного блоку з кількістю байтів (дірки sparse-файлу теж рахуються).
+    journal(offset) — кожні JOURNAL_INTERVAL байтів, коли тимчасовий файл до offset уже скинуто
+    на диск (toolbox/journal.py). resume_offset — продовжити наявний тимчасовий файл з цього місця
+    (початок вважається вже скопійованим і потрапляє в progress одразу).
+    При помилці чи скасуванні тимчасовий файл видаляється; з journal — залишається для продовження.
+    З journal (або durable=True) тимчасовий файл перед перейменуванням скидається на диск повністю —
+    файл, який журнал потім вважає готовим, після збою живлення не виявиться обрізаним.
+    check(тимчасовий файл) викликається після запису, перед перейменуванням (напр. перевірка вмісту):
+    якщо він кинув виняток, тимчасовий файл видаляється, а dst лишається як був.
+    Повертає словник: path, method (яким способом скопійовано), bytes, seconds.
+    """
+    if os.path.isdir(dst):
+        dst = os.path.join(dst, os.path.basename(src))
+    if os.path.exists(dst) and os.path.samefile(src, dst):
+        raise OSError(errno.EINVAL, f"{src!r} і {dst!r} — той самий файл")
+    if method is not None and method not in METHODS:
+        raise ValueError(f"Невідомий спосіб копіювання: {method}")
+    if hasher is not None:
+        if method not in (None, "readinto"):
+            raise ValueError("Хешування під час копіювання можливе лише зі способом readinto")
+        if resume_offset:
+            raise ValueError("Хешування неможливе при продовженні з середини файлу")
+        method = "readinto"
+    started = time.perf_counter()
+    part = part_path(dst)
+    with open(src, "rb", buffering=0) as fsrc:
+        st = os.fstat(fsrc.fileno())
+        if not 0 <= resume_offset <= st.st_size:
+            resume_offset = 0
+        with open(part, "r+b" if resume_offset else "wb", buffering=0) as fdst:
+            try:
+                if resume_offset:
+                    os.ftruncate(fdst.fileno(), resume_offset)
+                if journal is not None:
+                    progress = _journaled(fdst, progress, journal, resume_offset, control)
+                used = _copy_data(fsrc, fdst, st, control, progress, method, hasher, start=resume_offset)
+                _copy_mode(fdst, part, st)
+                if journal is not None or durable:
+                    _sync(fdst.fileno(), control)
+            except BaseException:
+                fdst.close()
+                if journal is None:
+                    _remove_quietly(part)
+                raise
+    try:
+        if check is not None:
+            check(part)
+        os.replace(part, dst)
+    except BaseException:
+        _remove_quietly(part)
+        raise
+    return {"path": dst, "method": used, "bytes": st.st_size,
+            "seconds": time.perf_counter() - started}
+
+
+def copy_small(src, dst, st, control=None, progress=None, hasher=None, times=False, check=None):
+    """
+    Швидкий шлях для малого файлу (engine.run_operation, settings.ini [small_files]): st — вже
+    прочитаний stat джерела, тож без stat за шляхом, спроб reflink і буфера; файл читається одним
+    викликом, пишеться одним записом під тимчасовим іменем (як copy_file) з правами джерела
+    одразу при створенні, times=True — час зміни ставиться через дескриптор, ще до перейменування.
+    check — як у copy_file. На диск файл не скидається — для журналу це робить sync_files раз на пачку.
+    Повертає словник як copy_file (method — "small").
+    """
+    started = time.perf_counter()
+    if control is not None:
+        control.checkpoint()
+    mode = stat.S_IMODE(st.st_mode)
+    part = part_path(dst)
+    fd = os.open(src, os.O_RDONLY | getattr(os, "O_BINARY", 0))
+    try:
+        data = os.read(fd, st.st_size + 1)
+        if len(data) > st.st_size:  # файл виріс після stat — дочитуємо
+            chunks = [data]
+            while chunks[-1]:
+                chunks.append(os.read(fd, CHUNK_SIZE))
+            data = b"".join(chunks)
+    finally:
+        os.close(fd)
+    if hasher is not None:
+        hasher.update(data)
+    out = os.open(part, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | getattr(os, "O_BINARY", 0), mode)
+    try:
+        view = memoryview(data)
+        while view:
+            view = view[os.write(out, view):]
+        if mode & _umask():  # права, які umask зрізав при створенні
+            if hasattr(os, "fchmod"):
+                os.fchmod(out, mode)
+            else:
+                os.chmod(part, mode)
+        if times and os.utime in os.supports_fd:
+            os.utime(out, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except BaseException:
+        os.close(out)
+        _remove_quietly(part)
+        raise
+    os.close(out)
+    try:
+        if check is not None:
+            check(part)
+        os.replace(part, dst)
+        if times and os.utime not in os.supports_fd:
+            os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+    except BaseException:
+        _remove_quietly(part)
+        raise
+    if control is not None:
+        control.consume(len(data))
+    if progress is not None and data:
+        progress(len(data))
+    return {"path": dst, "method": "small", "bytes": len(data), "seconds": time.perf_counter() - started}
+
+
+def sync_files(paths, control=None):
+    """
+    Скидає на диск уже записані файли paths — пачку малих файлів, перш ніж журнал позначить її
+    готовою: де є os.sync — одним викликом, інакше кожен файл окремо.
+    """
+    started = time.perf_counter()
+    try:
+        if hasattr(os, "sync"):
+            os.sync()
+            return
+        for path in paths:
+            with open(path, "rb+", buffering=0) as f:
+                os.fsync(f.fileno())
+    finally:
+        if control is not None:
+            control.add_time("fsync", time.perf_counter() - started)
+
+
+def _umask():
+    """umask процесу (читається один раз: інакше його не дізнатись, не змінивши)."""
+    global _umask_value
+    with _umask_lock:
+        if _umask_value is None:
+            _umask_value = os.umask(0o022)
+            os.umask(_umask_value)
+        return _umask_value
+
+
+def part_path(dst):
+    """Тимчасове ім'я, під яким dst пишеться до завершення (прихований файл у тій самій папці)."""
+    folder, name = os.path.split(dst)
+    return os.path.join(folder, f".{name}.tbpart")
+
+
+def copy_file_multi(src, dsts, control=None, progress=None, hasher=None, journal=None, check=None):
+    """
+    Копіює src у кілька файлів dsts, читаючи його один раз: кожен блок пишеться в усі цілі
+    одночасно (потік на ціль), а тим часом читається наступний блок у другий буфер.
+    Ціль, запис у яку не вдався (повний диск, відвалився мережевий диск), видаляється, решта
+    продовжується. progress(n) — прочитані байти src; hasher, journal, check і тимчасові файли — як
+    у copy_file (journal(offset) — коли всі цілі, що пишуться, скинуто на диск до offset, а з journal
+    кожна ціль перед перейменуванням скидається на диск повністю; check
+    викликається для кожної цілі, і ціль, яку він відхилив, теж потрапляє в помилки).
+    Повертає для кожної цілі словник як copy_file (method "fanout") або {"path", "error": OSError}.
+    Якщо control скасовано — усі недописані цілі видаляються (без journal) і кидається TransferCancelled.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    dsts = [os.path.join(d, os.path.basename(src)) if os.path.isdir(d) else d for d in dsts]
+    started = time.perf_counter()
+    errors = {}
+    with open(src, "rb", buffering=0) as fsrc:
+        st = os.fstat(fsrc.fileno())
+        chunk = _chunk_size(st) if control is None else control.block_size(_chunk_size(st))
+        outputs = {}
+        for dst in dsts:
+            try:
+                if os.path.exists(dst) and os.path.samefile(src, dst):
+                    raise OSError(errno.EINVAL, f"{src!r} і {dst!r} — той самий файл")
+                outputs[dst] = open(part_path(dst), "wb", buffering=0)
+                _preallocate(outputs[dst].fileno(), st.st_size)
+            except OSError as e:
+                errors[dst] = e
+
+        def drop(dst, error):
+            errors[dst] = error
+            outputs.pop(dst).close()
+            if journal is None:
+                _remove_quietly(part_path(dst))
+
+        buffers = (memoryview(bytearray(chunk)), memoryview(bytearray(chunk)))
+        pool = ThreadPoolExecutor(max_workers=max(1, len(outputs)))
+        writing = []
+        done = blocks = synced = 0
+        try:
+            while outputs:
+                if control is not None:
+                    control.checkpoint()
+                view = buffers[blocks % 2]
+                n = fsrc.readinto(view[:chunk])  # поки попередній блок ще пишеться з іншого буфера
+                for dst, future in writing:
+                    try:
+                        future.result()
+                    except OSError as e:
+                        drop(dst, e)
+                writing = []
+                if journal is not None and done - synced >= JOURNAL_INTERVAL:
+                    for dst in list(outputs):
+                        try:
+                            _sync(outputs[dst].fileno(), control)
+                        except OSError as e:
+                            drop(dst, e)
+                    journal(done)
+                    synced = done
+                if not n:
+                    break
+                if hasher is not None:
+                    hasher.update(view[:n])
+                writing = [(dst, pool.submit(_write_all, f, view[:n])) for dst, f in outputs.items()]
+                done += n
+                blocks += 1
+                if progress is not None:
+                    progress(n)
+                if control is not None:
+                    control.consume(n)
+            for dst in list(outputs):
+                try:
+                    os.ftruncate(outputs[dst].fileno(), done)
+                    _copy_mode(outputs[dst], dst, st)
+                    if journal is not None:
+                        _sync(outputs[dst].fileno(), control)
+                except OSError as e:
+                    drop(dst, e)
+                    continue
+                outputs.pop(dst).close()
+                try:
+                    if check is not None:
+                        check(part_path(dst))
+                    os.replace(part_path(dst), dst)
+                except OSError as e:
+                    errors[dst] = e
+                    _remove_quietly(part_path(dst))
+                except BaseException:
+                    _remove_quietly(part_path(dst))
+                    raise
+        except BaseException:
+            for dst, future in writing:
+                future.exception()  # дочекатися запису, перш ніж закривати файл
+            for dst in list(outputs):
+                outputs.pop(dst).close()
+                if journal is None:
+                    _remove_quietly(part_path(dst))
+            raise
+        finally:
+            pool.shutdown()
+    seconds = time.perf_counter() - started
+    return [{"path": dst, "error": errors[dst]} if dst in errors else
+            {"path": dst, "method": "fanout", "bytes": done, "seconds": seconds} for dst in dsts]
+
+
+def move_file(src, dst, control=None, progress=None, new_hasher=hashlib.blake2b, journal=None):
+    """
+    Переміщує файл src у dst (існуючий dst замінюється).
+    На тому самому пристрої — os.replace: миттєво, дані не копіюються. Між дисками — копія з хешем
+    (new_hasher() — об'єкт хешу, за замовчуванням BLAKE2), перенесення часу зміни і перевірка вмісту
+    тимчасового файлу, прочитаного з диска (hash_on_disk), ще до перейменування в dst — копія, що
+    не збіглася, не замінює наявний dst; лише потім видалення src. journal — як у copy_file.
+    Повертає словник як copy_file; method — "rename" або "<спосіб копіювання>+verify",
+    для переміщення між дисками ще й digest — hexdigest вмісту.
+    """
+    started = time.perf_counter()
+    st = os.stat(src)
+    try:
+        same_device = st.st_dev == os.stat(os.path.dirname(os.path.abspath(dst))).st_dev
+    except OSError:
+        same_device = False
+    if same_device:
+        if control is not None:
+            control.checkpoint()
+        try:
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:  # напр. bind-mount того самого диска — тоді копіюємо
+                raise
+        else:
+            if progress is not None and st.st_size:
+                progress(st.st_size)
+            return {"path": dst, "method": "rename", "bytes": st.st_size,
+                    "seconds": time.perf_counter() - started}
+    hasher = new_hasher()
+
+    def check(part):
+        os.utime(part, ns=(st.st_atime_ns, st.st_mtime_ns))
+        if hash_on_disk(part, new_hasher(), control=control).digest() != hasher.digest():
+            raise OSError(errno.EIO, f"Копія {dst!r} не збігається з оригіналом; оригінал залишено")
+    stats = copy_file(src, dst, control=control, progress=progress, hasher=hasher, journal=journal, check=check)
+    os.remove(src)
+    stats["method"] += "+verify"
+    stats["digest"] = hasher.hexdigest()
+    stats["seconds"] = time.perf_counter() - started
+    return stats
+
+
+def reflink(src, dst):
+    """
+    Створює dst як reflink-копію src (спільні блоки, копіювання при записі).
+    Повертає False, якщо ОС/ФС цього не підтримує; dst тоді не створюється.
+    """
+    if not sys.platform.startswith("linux"):
+        return False
+    with open(src, "rb", buffering=0) as fsrc:
+        st = os.fstat(fsrc.fileno())
+        fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o666)
+        try:
+            _clone(fsrc.fileno(), fd)
+            os.fchmod(fd, stat.S_IMODE(st.st_mode))
+        except BaseException as e:
+            os.close(fd)
+            _remove_quietly(dst)
+            if isinstance(e, _Unsupported):
+                return False
+            raise
+        os.close(fd)
+    return True
+
+
+# ---------------- Внутрішні функції ----------------
+
+def _copy_data(fsrc, fdst, st, control, progress, method, hasher=None, start=0):
+    size = st.st_size
+    candidates = [method] if method else available_methods()
+    if control is not None:
+        control.checkpoint()
+    if start:  # продовження: дописуємо хвіст, клонувати вже нічого
+        if candidates == ["reflink"]:
+            raise OSError(errno.EOPNOTSUPP, "Спосіб reflink неможливий при продовженні")
+        candidates = [m for m in candidates if m != "reflink"]
+    if "reflink" in candidates:
+        candidates.remove("reflink")
+        try:
+            _clone(fsrc.fileno(), fdst.fileno())
+        except _Unsupported as e:
+            if method is not None:
+                raise OSError(errno.EOPNOTSUPP, f"Спосіб reflink недоступний: {e}") from None
+        else:
+            if progress is not None and size:
+                progress(size)
+            return "reflink"
+
+    # Для хешу дірки теж мають бути прочитані (як нулі), тому файл копіюється суцільно
+    sparse = _is_sparse(st) and hasher is None and not start
+    segments = _data_segments(fsrc.fileno(), size) if sparse else [(start, size - start)]
+    if segments == [(0, size)]:
+        _preallocate(fdst.fileno(), size)
+    for m in candidates:
+        try:
+            _copy_segments(m, fsrc, fdst, st, segments, control, progress, hasher)
+            return m
+        except _Unsupported as e:
+            if method is not None:
+                raise OSError(errno.EOPNOTSUPP, f"Спосіб {m} недоступний: {e}") from None
+    raise OSError(errno.EOPNOTSUPP, "Жоден спосіб копіювання не спрацював")
+
+
+def _copy_segments(m, fsrc, fdst, st, segments, control, progress, hasher=None):
+    size = st.st_size
+    end = 0
+    for i, (offset, length) in enumerate(segments):
+        if progress is not None and offset > end:
+            progress(offset - end)  # дірка sparse-файлу або вже скопійований початок: нічого не пишемо
+        if m == "readinto":
+            _copy_readinto(fsrc, fdst, offset, length, _chunk_size(st), control, progress, hasher)
+        else:
+            _copy_kernel(m, fsrc.fileno(), fdst.fileno(), offset, length, control, progress,
+                         first=(i == 0))
+        end = offset + length
+    if progress is not None and size > end:
+        progress(size - end)
+    os.ftruncate(fdst.fileno(), size)  # хвостова дірка і обрізання після preallocate
+
+
+def _copy_kernel(m, in_fd, out_fd, offset, length, control, progress, first):
+    func = getattr(os, m, None)
+    if func is None:  # os.copy_file_range / os.sendfile відсутні у цій збірці Python
+        raise _Unsupported(m)
+    if m == "sendfile":
+        os.lseek(out_fd, offset, os.SEEK_SET)
+    done = 0
+    while done < length:
+        if control is not None:
+            control.checkpoint()
+        count = min(KERNEL_CHUNK_SIZE if control is None else control.block_size(KERNEL_CHUNK_SIZE),
+                    length - done)
+        try:
+            if m == "copy_file_range":
+                n = func(in_fd, out_fd, count, offset + done, offset + done)
+            else:
+                n = func(out_fd, in_fd, offset + done, count)
+        except OSError as e:
+            if first and done == 0 and e.errno in _UNSUPPORTED_ERRNOS:
+                raise _Unsupported(e.strerror) from None
+            raise
+        if n == 0:  # файл коротшає під час копіювання
+            break
+        done += n
+        if progress is not None:
+            progress(n)
+        if control is not None:
+            control.consume(n)
+
+
+def _copy_readinto(fsrc, fdst, offset, length, chunk, control, progress, hasher=None):
+    view = memoryview(_buffer(chunk))
+    if control is not None:
+        chunk = control.block_size(chunk)
+    fsrc.seek(offset)
+    fdst.seek(offset)
+    done = 0
+    while done < length:
+        if control is not None:
+            control.checkpoint()
+        n = fsrc.readinto(view[:min(chunk, length - done)])
+        if not n:
+            break
+        _write_all(fdst, view[:n])
+        if hasher is not None:
+            hasher.update(view[:n])
+        done += n
+        if progress is not None:
+            progress(n)
+        if control is not None:
+            control.consume(n)
+
+
+def hash_file(path, hasher, control=None, progress=None):
+    """Прочитує файл у hasher тим самим перевикористаним буфером. Повертає hasher."""
+    with open(path, "rb", buffering=0) as f:
+        st = os.fstat(f.fileno())
+        chunk = _chunk_size(st)
+        view = memoryview(_buffer(chunk))
+        if control is not None:
+            chunk = control.block_size(chunk)
+        while True:
+            if control is not None:
+                control.checkpoint()
+            n = f.readinto(view[:chunk])
+            if not n:
+                break
+            hasher.update(view[:n])
+            if progress is not None:
+                progress(n)
+            if control is not None:
+                control.consume(n)
+    return hasher
+
+
+def hash_on_disk(path, hasher, control=None, progress=None):
+    """
+    Як hash_file, але вміст береться з диска, а не з кешу сторінок щойно записаного файлу:
+    спершу fsync, потім POSIX_FADV_DONTNEED (де підтримується). Для перевірки копій.
+    """
+    with open(path, "rb", buffering=0) as f:
+        try:
+            _sync(f.fileno(), control, data_only=False)
+            if hasattr(os, "posix_fadvise"):
+                os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_DONTNEED)
+        except OSError:
+            pass  # ФС не вміє (деякі мережеві) — читаємо як є
+    started = time.perf_counter()
+    try:
+        return hash_file(path, hasher, control=control, progress=progress)
+    finally:
+        if control is not None:
+            control.add_time("verify", time.perf_counter() - started)
+
+
+def _sync(fd, control, data_only=True):
+    """fdatasync (data_only) або fsync з обліком часу в control.timings["fsync"]."""
+    started = time.perf_counter()
+    try:
+        (getattr(os, "fdatasync", os.fsync) if data_only else os.fsync)(fd)
+    finally:
+        if control is not None:
+            control.add_time("fsync", time.perf_counter() - started)
+
+
+def _journaled(fdst, progress, journal, start, control):
+    """progress для copy_file з журналом: кожні JOURNAL_INTERVAL байтів — fdatasync і journal(зміщення)."""
+    state = [0, start]  # зміщення (початок при продовженні приходить першим progress), останнє в журналі
+
+    def on_bytes(n):
+        state[0] += n
+        if state[0] - state[1] >= JOURNAL_INTERVAL:
+            _sync(fdst.fileno(), control)
+            journal(state[0])
+            state[1] = state[0]
+        if progress is not None:
+            progress(n)
+    return on_bytes
+
+
+def _write_all(f, view):
+    # FileIO.write без буфера може записати не все
+    while view:
+        n = f.write(view)
+        view = view[n:]
+
+
+def _clone(in_fd, out_fd):
+    if not sys.platform.startswith("linux"):
+        raise _Unsupported("reflink")
+    import fcntl
+    try:
+        fcntl.ioctl(out_fd, FICLONE, in_fd)
+    except OSError as e:
+        if e.errno in _UNSUPPORTED_ERRNOS:
+            raise _Unsupported(e.strerror) from None
+        raise
+
+
+def _chunk_size(st):
+    """Буфер під пристрій: 256 блоків ФС, але в межах CHUNK_SIZE..MAX_CHUNK_SIZE і не більше файлу."""
+    chunk = getattr(st, "st_blksize", 0) * 256
+    chunk = max(CHUNK_SIZE, min(chunk, MAX_CHUNK_SIZE))
+    return min(chunk, max(st.st_size, 64 * 1024))
+
+
+def _buffer(size):
+    buf = getattr(_local, "buf", None)
+    if buf is None or len(buf) < size:
+        buf = _local.buf = bytearray(size)
+    return buf
+
+
+def _is_sparse(st):
+    blocks = getattr(st, "st_blocks", None)
+    return blocks is not None and hasattr(os, "SEEK_DATA") and blocks * 512 < st.st_size
+
+
+def _data_segments(fd, size):
+    """[(offset, length)] ділянок з даними sparse-файлу (SEEK_DATA / SEEK_HOLE)."""
+    segments = []
+    offset = 0
+    try:
+        while offset < size:
+            try:
+                data = os.lseek(fd, offset, os.SEEK_DATA)
+            except OSError as e:
+                if e.errno == errno.ENXIO:  # далі лише дірка до кінця файлу
+                    break
+                raise
+            hole = min(os.lseek(fd, data, os.SEEK_HOLE), size)
+            segments.append((data, hole - data))
+            offset = hole
+    except OSError:
+        return [(0, size)]  # ФС не підтримує SEEK_DATA — копіюємо як звичайний файл
+    finally:
+        os.lseek(fd, 0, os.SEEK_SET)
+    return segments
+
+
+def _preallocate(fd, size):
+    if size and hasattr(os, "posix_fallocate"):
+        try:
+            os.posix_fallocate(fd, 0, size)
+        except OSError:
+            pass  # ФС не підтримує — не страшно
+
+
+def _copy_mode(fdst, dst, st):
+    mode = stat.S_IMODE(st.st_mode)
+    if hasattr(os, "fchmod"):
+        os.fchmod(fdst.fileno(), mode)
+    else:
+        os.chmod(dst, mode)
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,310 @@
+"""
+Заміна великого існуючого файлу "дельтою": переписуються лише блоки, що відрізняються.
+
+Обидва файли читаються блоками по BLOCK_SIZE і порівнюються; у цільовий файл пишуться тільки
+змінені блоки і хвіст, якого там ще нема (дописані логи, бази даних, образи ВМ).
+Якщо змінених блоків стає більше за max_changed_percent — порівнювати далі немає сенсу,
+решта файлу просто переписується підряд (без читання старого вмісту).
+
+Де ФС вміє reflink (btrfs, xfs), сам dst під час оновлення не змінюється: блоки пишуться в його
+reflink-копію під тимчасовим іменем (copier.part_path), яка після повного запису перейменовується
+в dst — як і при звичайному копіюванні, недописаного файлу під справжнім іменем не буває.
+
+Без reflink (ext4, NTFS) змінені блоки пишуться прямо в dst, а їхній старий вміст — спершу в
+undo-файл поруч (undo_path), скинутий на диск до запису блоків. Скасування, помилка чи перевірка,
+що не пройшла, повертають dst як був (rollback); після збою це робить наступний delta_copy
+(journal.resume) або journal.discard. Так оновлюються лише файли, що не коротшають (зрізаний хвіст
+довелося б зберігати цілком); якщо змін більше за max_changed_percent, оновлення відкочується
+і файл копіюється звичайно (copier.copy_file).
+"""
+import os, stat, struct, time
+
+from toolbox import copier
+from toolbox.engine import load_settings
+
+BLOCK_SIZE = 1024 * 1024
+UNDO_BLOCKS = 16  # змінених блоків, чий старий вміст скидається в undo-файл одним fsync
+
+_UNDO_MAGIC = b"TBUNDO1\0"
+_UNDO_HEADER = struct.Struct("<8sQqq")  # мітка, старий розмір dst, його atime і mtime (нс)
+_UNDO_RECORD = struct.Struct("<QI")   # зміщення, довжина; далі — старий вміст блоку
+
+
+def should_use_delta(src, dst):
+    """Чи варто замінювати dst дельтою (settings.ini [delta]): файл великий і його розмір близький до src."""
+    settings = load_settings()
+    if not settings.getboolean("delta", "enabled"):
+        return False
+    try:
+        src_size, dst_size = os.path.getsize(src), os.path.getsize(dst)
+    except OSError:
+        return False
+    min_size = settings.getint("delta", "min_size_mb") * 1024 * 1024
+    # Якщо старий файл значно менший, майже все одно доведеться писати заново
+    return dst_size >= min_size and dst_size * 2 >= src_size
+
+
+def delta_copy(src, dst, control=None, progress=None, max_changed_percent=None, hasher=None, check=None,
+               durable=False):
+    """
+    Оновлює існуючий dst до вмісту src, переписуючи лише змінені блоки: reflink-копії dst, яка потім
+    атомарно замінює dst, а без reflink — самого dst з undo-файлом (див. опис модуля). Якщо так
+    не можна (dst довший за src або без права запису) — звичайне copier.copy_file.
+    progress(n) — оброблені байти src; hasher, якщо є, отримує всі байти src, а check(файл)
+    викликається з новим вмістом перед тим, як він стане dst; durable=True — тимчасовий файл перед
+    заміною скидається на диск (як у copier.copy_file; оновлення на місці скидається завжди).
+    При скасуванні чи помилці dst лишається як був.
+    Повертає словник як copier.copy_file плюс written — скільки байтів фактично записано.
+    """
+    if max_changed_percent is None:
+        max_changed_percent = load_settings().getint("delta", "max_changed_percent")
+    started = time.perf_counter()
+    rollback(dst)  # залишок оновлення на місці, перерваного збоєм
+    part = copier.part_path(dst)
+    _remove_quietly(part)  # залишок перерваної спроби — reflink створює файл заново
+    if not copier.reflink(dst, part):
+        try:
+            in_place = os.path.getsize(dst) <= os.path.getsize(src) and os.access(dst, os.W_OK)
+        except OSError:
+            in_place = False
+        if in_place:
+            stats = _update_in_place(src, dst, control, progress, max_changed_percent, hasher, check, durable)
+        else:
+            stats = copier.copy_file(src, dst, control=control, progress=progress, hasher=hasher, check=check,
+                                     durable=durable)
+            stats["written"] = stats["bytes"]
+        stats["seconds"] = time.perf_counter() - started
+        return stats
+    try:
+        stats = _update(src, part, control, progress, max_changed_percent, hasher, durable)
+        if check is not None:
+            check(part)
+        os.replace(part, dst)
+    except BaseException:
+        _remove_quietly(part)
+        raise
+    stats.update(path=dst, seconds=time.perf_counter() - started)
+    return stats
+
+
+def _update(src, part, control, progress, max_changed_percent, hasher, durable):
+    """Переписує в part (копії старого вмісту) блоки, що відрізняються від src."""
+    with open(src, "rb", buffering=0) as fsrc, open(part, "r+b", buffering=0) as fdst:
+        st = os.fstat(fsrc.fileno())
+        size = st.st_size
+        limit = size * max_changed_percent // 100
+        old_size = os.fstat(fdst.fileno()).st_size
+        src_buf, dst_buf = bytearray(BLOCK_SIZE), bytearray(BLOCK_SIZE)
+        src_view, dst_view = memoryview(src_buf), memoryview(dst_buf)
+        offset = written = 0
+        comparing = True
+        while offset < size:
+            if control is not None:
+                control.checkpoint()
+            n = _read_full(fsrc, src_view)
+            if not n:
+                break
+            if hasher is not None:
+                hasher.update(src_view[:n])
+            if comparing and offset < old_size:
+                m = _read_full(fdst, dst_view[:n])
+                if m == n and src_view[:n] == dst_view[:n]:
+                    offset += n
+                    if progress is not None:
+                        progress(n)
+                    if control is not None:
+                        control.consume(n)
+                    continue
+            fdst.seek(offset)
+            _write_all(fdst, src_view[:n])
+            written += n
+            offset += n
+            if comparing and written > limit:
+                comparing = False  # дельта вже не виграє — далі просто пишемо
+            if progress is not None:
+                progress(n)
+            if control is not None:
+                control.consume(n)
+        fdst.truncate(offset)
+        if hasattr(os, "fchmod"):
+            os.fchmod(fdst.fileno(), stat.S_IMODE(st.st_mode))
+        else:
+            os.chmod(part, stat.S_IMODE(st.st_mode))
+        if durable:
+            _sync(fdst.fileno(), control)
+    return {"method": "delta" if comparing else "delta+readinto", "bytes": size, "written": written}
+
+
+def _update_in_place(src, dst, control, progress, max_changed_percent, hasher, check, durable):
+    """
+    Переписує в самому dst (не довшому за src) блоки, що відрізняються від src; старий вміст
+    кожного — спершу в undo-файл, який скидається на диск перед записом пачки з UNDO_BLOCKS блоків.
+    Змін забагато — dst відкочується, решта src лише дочитується в hasher, і файл копіюється.
+    """
+    undo = undo_path(dst)
+    with open(src, "rb", buffering=0) as fsrc, open(dst, "r+b", buffering=0) as fdst:
+        st = os.fstat(fsrc.fileno())
+        size = st.st_size
+        limit = size * max_changed_percent // 100
+        old = os.fstat(fdst.fileno())
+        old_size = old.st_size
+        src_view, dst_view = memoryview(bytearray(BLOCK_SIZE)), memoryview(bytearray(BLOCK_SIZE))
+        pending = []  # [(зміщення, нові байти)] — старий вміст уже в undo-файлі, у dst ще не записано
+        offset = written = replaced = 0  # replaced — переписано старого вмісту (для limit)
+        too_many = False
+        try:
+            with open(undo, "wb", buffering=0) as fundo:
+                _write_all(fundo, _UNDO_HEADER.pack(_UNDO_MAGIC, old_size, old.st_atime_ns, old.st_mtime_ns))
+                _sync(fundo.fileno(), control)
+                while offset < size:
+                    if control is not None:
+                        control.checkpoint()
+                    n = _read_full(fsrc, src_view)
+                    if not n:
+                        break
+                    if hasher is not None:
+                        hasher.update(src_view[:n])
+                    changed = offset >= old_size  # хвіст, якого ще нема: відкат його просто обріже
+                    if not changed:
+                        fdst.seek(offset)
+                        m = _read_full(fdst, dst_view[:min(n, old_size - offset)])
+                        changed = m < n or src_view[:n] != dst_view[:n]
+                        if changed:
+                            replaced += m
+                            if replaced > limit:
+                                too_many = True
+                                break
+                            _write_all(fundo, _UNDO_RECORD.pack(offset, m))
+                            _write_all(fundo, dst_view[:m])
+                    if changed:
+                        pending.append((offset, bytes(src_view[:n])))
+                        written += n
+                        if len(pending) >= UNDO_BLOCKS:
+                            _flush(fundo, fdst, pending, control)
+                    offset += n
+                    if progress is not None:
+                        progress(n)
+                    if control is not None:
+                        control.consume(n)
+                if not too_many:
+                    _flush(fundo, fdst, pending, control)
+                    if offset < old_size:
+                        raise OSError(f"Джерело {src!r} змінилося під час оновлення")
+                    if hasattr(os, "fchmod"):
+                        os.fchmod(fdst.fileno(), stat.S_IMODE(st.st_mode))
+                    else:
+                        os.chmod(dst, stat.S_IMODE(st.st_mode))
+                    _sync(fdst.fileno(), control)
+                    if check is not None:
+                        check(dst)
+        except BaseException:
+            rollback(dst)
+            raise
+        if too_many:
+            rollback(dst)
+            while hasher is not None:  # хеш уже отримав початок src — дочитуємо решту
+                if control is not None:
+                    control.checkpoint()
+                n = _read_full(fsrc, src_view)
+                if not n:
+                    break
+                hasher.update(src_view[:n])
+    if too_many:
+        skip = [offset]  # ці байти progress уже отримав
+
+        def rest(n):
+            n, skip[0] = max(0, n - skip[0]), max(0, skip[0] - n)
+            if n:
+                progress(n)
+        stats = copier.copy_file(src, dst, control=control, progress=rest if progress is not None else None,
+                                 check=check, durable=durable)
+        stats["written"] = stats["bytes"]
+        return stats
+    _remove_quietly(undo)
+    return {"path": dst, "method": "delta", "bytes": size, "written": written}
+
+
+def undo_path(dst):
+    """Undo-файл оновлення dst на місці (прихований файл у тій самій папці, як copier.part_path)."""
+    folder, name = os.path.split(dst)
+    return os.path.join(folder, f".{name}.tbundo")
+
+
+def rollback(dst):
+    """
+    Повертає dst як був до перерваного оновлення на місці (вміст, розмір і час зміни — за
+    undo-файлом) і видаляє undo-файл.
+    Записи, не дописані в undo-файл до кінця, пропускаються: їхні блоки в dst ще не змінювались.
+    Повертає True, якщо undo-файл був.
+    """
+    undo = undo_path(dst)
+    try:
+        fundo = open(undo, "rb")
+    except FileNotFoundError:
+        return False
+    with fundo:
+        header = fundo.read(_UNDO_HEADER.size)
+        magic, old_size, atime_ns, mtime_ns = (_UNDO_HEADER.unpack(header) if len(header) == _UNDO_HEADER.size
+                                               else (None, 0, 0, 0))
+        if magic == _UNDO_MAGIC:  # інакше заголовок не встиг на диск — dst ще не змінювався
+            try:
+                with open(dst, "r+b", buffering=0) as fdst:
+                    while True:
+                        record = fundo.read(_UNDO_RECORD.size)
+                        if len(record) < _UNDO_RECORD.size:
+                            break
+                        offset, length = _UNDO_RECORD.unpack(record)
+                        data = fundo.read(length)
+                        if len(data) < length:
+                            break
+                        fdst.seek(offset)
+                        _write_all(fdst, data)
+                    fdst.truncate(old_size)
+                    _sync(fdst.fileno(), None)
+                os.utime(dst, ns=(atime_ns, mtime_ns))  # файл — як до оновлення, разом із часом зміни
+            except FileNotFoundError:
+                pass  # dst уже видалили — повертати нічого
+    os.remove(undo)
+    return True
+
+
+def _flush(fundo, fdst, pending, control):
+    """Скидає undo-записи на диск і лише потім пише в dst нові блоки pending."""
+    if not pending:
+        return
+    _sync(fundo.fileno(), control)
+    for offset, data in pending:
+        fdst.seek(offset)
+        _write_all(fdst, data)
+    pending.clear()
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _sync(fd, control):
+    started = time.perf_counter()
+    getattr(os, "fdatasync", os.fsync)(fd)
+    if control is not None:
+        control.add_time("fsync", time.perf_counter() - started)
+
+
+def _read_full(f, view):
+    """Читає, доки не заповнить view або не дійде до кінця файлу."""
+    total = 0
+    while total < len(view):
+        n = f.readinto(view[total:])
+        if not n:
+            break
+        total += n
+    return total
+
+
+def _write_all(f, view):
+    while view:
+        n = f.write(view)
+        view = view[n:]
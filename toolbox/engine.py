@@ -0,0 +1,962 @@
+"""
+Ядро Tool Box без Tkinter: копіювання, історія операцій і профілі.
+Його використовують і GUI ("Tool Box.py"), і командний рядок (python -m toolbox).
+"""
+import errno, os, re, stat, tempfile, threading, time, configparser
+from datetime import datetime
+
+from toolbox import copier
+from toolbox.copier import TransferControl
+
+# --- Константи ---
+LOG_FOLDER = os.path.join(tempfile.gettempdir(), "Tool box", "files")
+HISTORY_FILE = os.path.join(LOG_FOLDER, "history.txt")
+PROFILES_FILE = os.path.join(LOG_FOLDER, "profiles.ini")
+SETTINGS_FILE = os.path.join(LOG_FOLDER, "settings.ini")
+NUM_PROFILES = 8
+HISTORY_LIMIT = 50
+SCAN_CHUNK_SIZE = 1000  # записів папки в одній порції для фонового завантаження списку
+
+CONFLICT_CHOICES = ("replace", "rename", "cancel")
+
+# Як файли потрапляють у список для вставки:
+#   ref      — лише посилання на оригінал, нічого не копіюється (читається під час вставки)
+#   link     — жорстке посилання на оригінал у кеші (або об'єкт кешу, якщо диск інший)
+#   snapshot — знімок на момент вибору: об'єкт кешу (reflink або копія, див. toolbox/cache.py)
+STAGING_MODES = ("ref", "link", "snapshot")
+
+# Як синхронізація визначає, що файл у цільовій папці вже такий самий:
+#   mtime — однаковий розмір і час зміни (як rsync за замовчуванням)
+#   hash  — те саме, а якщо час відрізняється — порівняння вмісту за BLAKE2
+SYNC_COMPARE = ("mtime", "hash")
+MTIME_WINDOW_NS = 2 * 10**9  # FAT і частина мережевих дисків зберігають час з точністю до 2 с
+
+DEFAULT_SETTINGS = {
+    "staging": {"mode": "ref"},
+    "cache": {"max_size_mb": "4096", "max_age_days": "30"},
+    "delta": {"enabled": "yes", "min_size_mb": "64", "max_changed_percent": "50"},
+    "listing": {"cache_entries": "300000"},
+    "parallel": {"workers": "8", "ssd": "4", "hdd": "1", "other": "2", "overrides": ""},
+    "index": {"roots": "", "refresh_minutes": "30"},
+    "verify": {"enabled": "no", "algorithm": "blake2b"},
+    "throttle": {"limit_mbps": "0", "priority": "normal"},
+    "small_files": {"threshold_kb": "256", "workers": "16"},
+    "watch": {"settle_seconds": "2", "batch_seconds": "10", "poll_seconds": "5", "max_pending": "10000",
+              "ignore": ".*; *.part; *.crdownload; *.tmp; ~$*"},
+    "profiling": {"mode": "off", "interval_ms": "5"},
+}
+
+
+class ToolBoxError(Exception):
+    """Базова помилка ядра; текст придатний для показу користувачу."""
+
+
+class ProfileError(ToolBoxError):
+    """Профіль порожній або містить неповні дані."""
+
+
+# ====================== Файли ======================
+
+def ensure_log_folder():
+    os.makedirs(LOG_FOLDER, exist_ok=True)
+
+def load_settings():
+    """settings.ini з LOG_FOLDER поверх DEFAULT_SETTINGS."""
+    config = configparser.ConfigParser()
+    config.read_dict(DEFAULT_SETTINGS)
+    if os.path.exists(SETTINGS_FILE):
+        config.read(SETTINGS_FILE, encoding='utf-8')
+    return config
+
+_SUFFIX = re.compile(r"^(.*)_(\d+)$")
+
+
+class NameIndex:
+    """
+    Імена в папці, прочитані одним os.listdir, і найбільший суфікс _N для кожної пари
+    (ім'я, розширення) — щоб перевіряти зайнятість і вибирати нові імена без повторного читання.
+    """
+    def __init__(self, folder):
+        self.folder = folder
+        self._names = set()
+        self._suffixes = {}  # (ім'я, розширення) -> найбільший N серед "ім'я_N.розширення"
+        for name in os.listdir(folder):
+            self.add(name)
+
+    def __contains__(self, name):
+        return os.path.normcase(name) in self._names
+
+    def add(self, name):
+        """Позначає ім'я зайнятим (вже є в папці або заплановане)."""
+        name = os.path.normcase(name)
+        self._names.add(name)
+        root, ext = os.path.splitext(name)
+        match = _SUFFIX.match(root)
+        if match:
+            key = (match.group(1), ext)
+            self._suffixes[key] = max(self._suffixes.get(key, 0), int(match.group(2)))
+
+    def allocate(self, filename):
+        """Наступне вільне "ім'я_N.розширення" (N — більше за всі наявні); воно одразу стає зайнятим."""
+        name, ext = os.path.splitext(filename)
+        counter = self._suffixes.get((os.path.normcase(name), os.path.normcase(ext)), 0) + 1
+        candidate = f"{name}_{counter}{ext}"
+        while candidate in self:
+            counter += 1
+            candidate = f"{name}_{counter}{ext}"
+        self.add(candidate)
+        return candidate
+
+def get_next_available_name(folder, filename):
+    return NameIndex(folder).allocate(filename)
+
+def scan_folder(folder, folders_only=False, chunk_size=SCAN_CHUNK_SIZE):
+    """
+    Читає папку одним проходом os.scandir і видає порції [(ім'я, is_dir)] у порядку диска.
+    Тип запису береться з DirEntry (без окремого stat, крім символьних посилань).
+    Записи, що не є ні файлом, ні папкою (биті посилання, сокети), пропускаються.
+    """
+    chunk = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+                if not is_dir and (folders_only or not entry.is_file()):
+                    continue
+            except OSError:
+                continue
+            chunk.append((entry.name, is_dir))
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+    if chunk:
+        yield chunk
+
+def list_folder(folder):
+    """Повертає (папки, файли) — імена, відсортовані без урахування регістру."""
+    folders, files = [], []
+    for chunk in scan_folder(folder):
+        for name, is_dir in chunk:
+            (folders if is_dir else files).append(name)
+    folders.sort(key=str.lower)
+    files.sort(key=str.lower)
+    return folders, files
+
+def _progress_counter(paths, progress, stats=None):
+    """
+    Повертає (total, callback). callback(n, name, found=0) накопичує байти і передає
+    progress(done, total, name) — загальний прогрес усієї операції. Папки в total не входять:
+    їхні файли додаються через found, коли їх знайде обхід (toolbox/tree.py).
+    stats — {шлях: stat або None}, якщо вже прочитані.
+    """
+    total = 0
+    for p in paths:
+        try:
+            st = os.stat(p) if stats is None else stats[p]
+        except OSError:
+            continue
+        if st is not None and stat.S_ISREG(st.st_mode):
+            total += st.st_size
+    counts = [0, total]  # зроблено, всього
+    lock = threading.Lock()  # advance викликають паралельні копіювання
+    def advance(n, name, found=0):
+        with lock:
+            counts[0] += n
+            counts[1] += found
+            if progress is not None:
+                progress(counts[0], counts[1], name)
+    return total, advance
+
+def stage_files(paths, control=None, progress=None, mode=None):
+    """
+    Готує файли до вставки (див. STAGING_MODES; за замовчуванням — з settings.ini).
+    Неіснуючі шляхи пропускаються. Повертає шляхи, з яких читатиме run_operation:
+    оригінали для "ref" або посилання з кешу (cache/staged/<ключ>/<ім'я>, окреме для кожного
+    оригіналу — однойменні файли з різних папок не перетинаються) для "link" і "snapshot".
+    Звідки взялося посилання, пам'ятається до кінця операції, яка його використала.
+    Папки завжди лишаються посиланнями на оригінал — run_operation копіює їх рекурсивно.
+    progress(done, total, name) — загальний прогрес у байтах; control — TransferControl.
+    """
+    if mode is None:
+        mode = load_settings().get("staging", "mode")
+    if mode not in STAGING_MODES:
+        raise ToolBoxError(f"Невідомий режим підготовки файлів: {mode}")
+    files = [os.path.abspath(p) for p in paths if os.path.isfile(p) or os.path.isdir(p)]
+    if mode == "ref":
+        return files
+    from toolbox import cache
+    started = time.time()
+    _, advance = _progress_counter(files, progress)
+    staged = []
+    for file_path in files:
+        if os.path.isdir(file_path):
+            staged.append(file_path)
+            continue
+        filename = os.path.basename(file_path)
+        view = cache.stage(file_path, link_source=(mode == "link"), control=control,
+                           progress=lambda n: advance(n, filename))
+        _staged_origins[view] = file_path
+        staged.append(view)
+    cache.evict(keep_since=started)
+    return staged
+
+_staged_origins = {}  # посилання в cache/staged -> оригінал (для історії та переміщення)
+
+def _original_path(staged_path, src_folder):
+    """
+    Оригінал файлу: для "ref" це сам шлях, для кешу — той, з якого його підготовлено в цьому процесі,
+    інакше файл з тим самим іменем у src_folder.
+    """
+    from toolbox import cache
+    if staged_path in _staged_origins:
+        return _staged_origins[staged_path]
+    if cache.is_staged(staged_path) and src_folder:
+        return os.path.join(src_folder, os.path.basename(staged_path))
+    return staged_path
+
+def files_identical(src, dst, compare="mtime"):
+    """Чи dst вже містить те саме, що src (див. SYNC_COMPARE)."""
+    st_src, st_dst = os.stat(src), os.stat(dst)
+    if st_src.st_size != st_dst.st_size:
+        return False
+    if abs(st_src.st_mtime_ns - st_dst.st_mtime_ns) <= MTIME_WINDOW_NS:
+        return True
+    if compare != "hash":
+        return False
+    import hashlib
+    if (copier.hash_file(src, hashlib.blake2b()).digest()
+            != copier.hash_file(dst, hashlib.blake2b()).digest()):
+        return False
+    copy_times(src, dst, st_src)  # наступного разу вистачить порівняння часу
+    return True
+
+def copy_times(src, dst, st=None):
+    """Переносить час зміни src на dst, щоб синхронізація впізнавала незмінені файли."""
+    if st is None:
+        st = os.stat(src)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+def conflict_policy(choice):
+    """
+    Створює on_conflict для run_operation, який завжди повертає один вибір.
+    Використовується без GUI (CLI, скрипти).
+    """
+    if choice not in CONFLICT_CHOICES:
+        raise ValueError(f"Невідомий вибір: {choice}")
+    return lambda filename, multiple=False: (choice, True)
+
+def plan_operation(staged_files, dest_folder, sync=False, compare="mtime"):
+    """
+    Планування вставки до копіювання: dest_folder читається один раз (NameIndex), для кожного файлу
+    визначається дія. Повертає {"dest", "index", "items", "errors"}, де items — словники
+    {"src", "name", "target", "action"}, а action:
+        copy      — імені в папці немає
+        conflict  — ім'я зайняте, рішення дає resolve_conflicts
+        replace   — синхронізація: файл змінився (для папки — злиття з наявною)
+        unchanged — синхронізація: такий самий файл уже є
+    """
+    if not os.path.isdir(dest_folder):
+        raise ToolBoxError(f"Папка для вставлення не існує: {dest_folder}")
+    index = NameIndex(dest_folder)
+    plan = {"dest": dest_folder, "index": index, "items": [], "errors": []}
+    planned = set()  # імена, які займуть попередні файли цієї ж операції
+    for src in staged_files:
+        name = os.path.basename(src)
+        item = {"src": src, "name": name, "target": os.path.join(dest_folder, name), "action": "copy"}
+        if name in index:
+            item["action"] = "conflict"
+            if sync:
+                try:
+                    identical = (os.path.normcase(name) not in planned and not os.path.isdir(src)
+                                 and files_identical(src, item["target"], compare))
+                except OSError as e:
+                    plan["errors"].append((src, str(e)))
+                    continue
+                item["action"] = "unchanged" if identical else "replace"
+        else:
+            index.add(name)
+        planned.add(os.path.normcase(name))
+        plan["items"].append(item)
+    return plan
+
+def resolve_conflicts(plan, choices):
+    """
+    Застосовує рішення до конфліктів плану (choices — CONFLICT_CHOICES у порядку конфліктів):
+    replace — замінити (папку — злити з наявною, однойменні файли в ній замінюються),
+    rename — нове ім'я з індексу (без читання папки), cancel — пропустити файл.
+    """
+    conflicts = [item for item in plan["items"] if item["action"] == "conflict"]
+    if len(choices) != len(conflicts):
+        raise ValueError("Кількість рішень не збігається з кількістю конфліктів")
+    for item, choice in zip(conflicts, choices):
+        if choice == "replace":
+            item["action"] = "replace"
+        elif choice == "rename":
+            item["target"] = os.path.join(plan["dest"], plan["index"].allocate(item["name"]))
+            item["action"] = "copy"
+        elif choice == "cancel":
+            item["action"] = "skip"
+        else:
+            raise ValueError(f"Невідомий вибір: {choice}")
+
+def _ask_each(names, on_conflict):
+    """Рішення для конфліктів через старий покроковий on_conflict (з "застосувати для всіх")."""
+    choices = []
+    last_choice = None
+    for name in names:
+        if last_choice is None:
+            choice, apply_all = on_conflict(name, multiple=len(names) > 1)
+            if apply_all:
+                last_choice = choice
+        else:
+            choice = last_choice
+        choices.append(choice)
+    return choices
+
+def run_operation(staged_files, dest_folder, src_folder="", on_conflict=None, record_history=True,
+                  control=None, progress=None, sync=False, compare="mtime", on_conflicts=None, move=False,
+                  verify=None, limit_mbps=None, priority=None, staging_seconds=None, profiler=None,
+                  small_threshold_kb=None):
+    """
+    Вставляє підготовлені файли (результат stage_files) у dest_folder.
+    Спершу складається план (plan_operation) і вирішуються всі конфлікти імен, потім файли
+    копіюються без зупинок. on_conflicts(names) -> список CONFLICT_CHOICES для всіх конфліктів
+    одразу (або None — скасувати операцію); якщо його немає — on_conflict(filename, multiple) ->
+    (choice, apply_to_all) для кожного по черзі; без обох існуючі файли перейменовуються.
+    dest_folder може бути списком папок (роздача): кожен файл читається один раз і пишеться в усі
+    папки одночасно (copier.copy_file_multi); план, конфлікти (імена тоді — повні шляхи цілей)
+    і запис в історії — окремі для кожної папки.
+    Папки серед staged_files копіюються рекурсивно зі збереженням структури (toolbox/tree.py):
+    обхід і копіювання йдуть одночасно, пам'ять не залежить від розміру дерева. В історії папка —
+    один запис серед файлів операції; у журнал (resume) її файли не потрапляють — перервану папку
+    можна докопіювати синхронізацією.
+    sync=True — режим синхронізації: файли, що вже є у dest_folder без змін (див. files_identical
+    і SYNC_COMPARE), пропускаються, змінені замінюються без питань, а час зміни переноситься.
+    Великі файли при заміні оновлюються дельтою (toolbox/delta.py) — пишуться лише змінені блоки
+    (якщо файл іде лише в одну папку).
+    move=True — переміщення оригіналів (copier.move_file): на тому самому диску — перейменування,
+    інакше копія з перевіркою і видаленням оригіналу; незмінені при синхронізації файли не чіпаються.
+    Лише для однієї папки.
+    verify=True — перевірка контрольними сумами (toolbox/verify.py): хеш рахується під час копіювання,
+    тимчасовий файл перечитується з диска і порівнюється ще до перейменування в ціль; копія, що
+    не збіглася, видаляється (наявна ціль не змінюється) і потрапляє в errors.
+    None — як у settings.ini [verify]. Хеші записуються маніфестом поруч із записом історії.
+    Файли копіюються паралельно в межах лімітів пристроїв (toolbox/scheduler.py) під тимчасовими
+    іменами і перейменовуються після повного запису; операція ведеться в журналі (toolbox/journal.py),
+    тож після збою недописані файли продовжуються з останнього підтвердженого місця (journal.resume).
+    limit_mbps — ліміт швидкості операції в МБ/с (0 — без ліміту), priority — пріоритет диска потоків
+    копіювання (scheduler.PRIORITIES); None — як у settings.ini [throttle]. Ліміт тримається в control,
+    тож його можна змінювати під час передачі (control.set_limit).
+    Малі файли (не більше small_threshold_kb КБ; None — settings.ini [small_files], 0 — вимкнено)
+    копіюються окремим швидким шляхом: пачками у [small_files] workers потоках (не більше за ліміт
+    пристроїв джерел і папки), з уже прочитаного stat, одним читанням і записом (copier.copy_small),
+    права і час — через дескриптор, а журнал оновлюється раз на пачку. Stat кожного файлу операції читається один раз.
+    staging_seconds — скільки тривала підготовка файлів (stage_files), для метрик операції.
+    profiler — профілювання операції (toolbox/profiling.py: cprofile, sample або off); None — як
+    у settings.ini [profiling]. Шлях до звіту — у profile_report результату.
+    control (TransferControl) дозволяє паузу і скасування між блоками;
+    progress(done, total, name) отримує загальний прогрес у прочитаних байтах.
+    Повертає словник (порядок — як у staged_files): copied — [(джерело, ціль)], skipped — імена,
+    errors — [(шлях, текст)], cancelled — чи операцію перервано (вже вставлені файли залишаються
+    і записуються в історію), bytes і seconds — обсяг і загальний час копіювання,
+    methods — {спосіб копіювання: кількість файлів},
+    unchanged і unchanged_bytes — імена та обсяг файлів, пропущених синхронізацією,
+    delta_saved — скільки байтів не довелося переписувати завдяки дельті, move — чи це переміщення
+    (тоді в methods — "rename" або "<спосіб>+verify"), verified — алгоритм перевірки або None,
+    manifest — [(ціль, розмір, mtime_ns, хеш)] записаних і (при синхронізації) незмінених файлів,
+    metrics — зведення для аналізу швидкості (записується і в історію): phases — секунди за фазами
+    (staging, listing, conflicts, copying, а всередині копіювання сумарно по потоках fsync, verify,
+    throttled), bytes, seconds, mb_per_second, files, files_per_second і кількість conflicts, skipped,
+    unchanged, errors.
+    files — скільки файлів скопійовано разом із файлами папок, folders — звіти tree.copy_tree
+    для скопійованих папок (їх (папка, ціль) — теж у copied).
+    Для списку папок — ті самі ключі, зведені по всіх папках (dest — папки через "; "), плюс
+    destinations — такий словник для кожної папки і bytes_read — скільки прочитано джерел.
+    """
+    args = (staged_files, dest_folder, src_folder, on_conflict, record_history, control, progress, sync,
+            compare, on_conflicts, move, verify, limit_mbps, priority, staging_seconds, small_threshold_kb)
+    mode = None
+    if profiler != "off":
+        from toolbox import profiling
+        mode = profiling.configured_mode(profiler)
+    if mode is None:
+        return _run_operation(*args)
+    result, report = profiling.profile_call(mode, "operation", _run_operation, *args)
+    result["profile_report"] = report
+    return result
+
+
+def _run_operation(staged_files, dest_folder, src_folder, on_conflict, record_history, control, progress,
+                   sync, compare, on_conflicts, move, verify, limit_mbps, priority, staging_seconds,
+                   small_threshold_kb):
+    """Сама операція run_operation (без профілювання)."""
+    started_at = time.perf_counter()
+    if on_conflict is None:
+        on_conflict = conflict_policy("rename")
+    if compare not in SYNC_COMPARE:
+        raise ToolBoxError(f"Невідомий спосіб порівняння: {compare}")
+    fanout = not isinstance(dest_folder, str)
+    dests = list(dict.fromkeys(dest_folder)) if fanout else [dest_folder]
+    if not dests:
+        raise ToolBoxError("Не вказано папку для вставлення")
+    if move and len(dests) > 1:
+        raise ToolBoxError("Переміщення можливе лише в одну папку")
+    from toolbox import scheduler, verify as verification
+    algorithm = verification.configured_algorithm(verify)
+    settings = load_settings()
+    if limit_mbps is None:
+        limit_mbps = settings.getfloat("throttle", "limit_mbps")
+    if priority is None:
+        priority = settings.get("throttle", "priority")
+    if priority not in scheduler.PRIORITIES:
+        raise ToolBoxError(f"Невідомий пріоритет: {priority}")
+    if control is None:
+        control = TransferControl()
+    control.set_limit(int(limit_mbps * 1024 * 1024))
+    timings_before = dict(control.timings)
+    phases = {"staging": staging_seconds or 0.0, "listing": 0.0, "conflicts": 0.0}
+    results = [{"copied": [], "skipped": [], "errors": [], "dest": dest, "cancelled": False,
+                "bytes": 0, "seconds": 0.0, "methods": {}, "unchanged": [], "unchanged_bytes": 0,
+                "delta_saved": 0, "move": move, "verified": algorithm, "manifest": [], "files": 0,
+                "folders": []} for dest in dests]
+
+    plans = []
+    for dest, result in zip(dests, results):
+        started = time.perf_counter()
+        plan = plan_operation(staged_files, dest, sync=sync, compare=compare)
+        phases["listing"] += time.perf_counter() - started
+        result["errors"].extend(plan["errors"])
+        conflicts = [item["name"] for item in plan["items"] if item["action"] == "conflict"]
+        result["conflicts"] = len(conflicts)
+        if conflicts:
+            started = time.perf_counter()
+            if len(dests) > 1:
+                conflicts = [os.path.join(dest, name) for name in conflicts]
+            choices = on_conflicts(conflicts) if on_conflicts is not None else _ask_each(conflicts, on_conflict)
+            if choices is None:
+                for r in results:
+                    r["cancelled"] = True
+                return _combine_results(results) if fanout else results[0]
+            resolve_conflicts(plan, choices)
+            phases["conflicts"] += time.perf_counter() - started
+        plans.append(plan)
+
+    # Один stat на файл для всієї операції: прогрес, папки, малі файли, журнал
+    file_stats = {}
+    for src in staged_files:
+        try:
+            file_stats[src] = os.stat(src)
+        except OSError:
+            file_stats[src] = None
+    _, advance = _progress_counter(staged_files, progress, file_stats)
+    from toolbox import delta, tree
+    from toolbox.journal import Journal
+    new_hasher = (lambda: verification.new_hasher(algorithm)) if algorithm else None
+    folders = {src for src, st in file_stats.items() if st is not None and stat.S_ISDIR(st.st_mode)}
+    if small_threshold_kb is None:
+        small_threshold_kb = settings.getint("small_files", "threshold_kb")
+    small_limit = small_threshold_kb * 1024
+
+    def execute(item):
+        on_journal = lambda offset: journal.advance(item["journal_id"], offset)
+        stats = copy_one(item["src"], item["target"], item["mode"], on_journal, durable=True)
+        journal.done(item["journal_id"])
+        return stats
+
+    def execute_small(batch):
+        """Пачка малих файлів: помилки — в outcome кожного, журнал — одним записом на пачку."""
+        done = []
+        try:
+            for item in batch:
+                try:
+                    stats = copy_one(item["src"], item["target"], "copy", st=file_stats[item["src"]])
+                except OSError as e:
+                    item["outcome"] = (None, e)
+                    continue
+                item["outcome"] = (stats, None)
+                done.append(item)
+        finally:
+            if done:  # готовими в журналі стають лише файли, вже скинуті на диск
+                copier.sync_files([item["target"] for item in done], control)
+                journal.done_many([item["journal_id"] for item in done])
+
+    def copy_one(temp_file_path, dest_file, mode, on_journal=None, st=None, durable=False):
+        """
+        st — stat джерела, якщо вже відомий: тоді малий файл іде швидким шляхом (copier.copy_small).
+        durable=True — файл у журналі: перед перейменуванням скидається на диск (copier.copy_file;
+        малі файли — пачкою в execute_small).
+        """
+        filename = os.path.basename(temp_file_path)
+        on_bytes = lambda n: advance(n, filename)
+        hasher = new_hasher() if new_hasher else None
+        if small_limit > 0 and mode == "copy" and st is not None and st.st_size <= small_limit:
+            stats = copier.copy_small(temp_file_path, dest_file, st, control=control, progress=on_bytes,
+                                      hasher=hasher, times=sync,
+                                      check=_copy_check(temp_file_path, hasher, new_hasher, False, control))
+        elif mode == "move":
+            if new_hasher is None:
+                stats = copier.move_file(_original_path(temp_file_path, src_folder), dest_file,
+                                         control=control, progress=on_bytes, journal=on_journal)
+            else:
+                stats = copier.move_file(_original_path(temp_file_path, src_folder), dest_file,
+                                         control=control, progress=on_bytes, new_hasher=new_hasher,
+                                         journal=on_journal)
+                if "digest" not in stats:  # перейменування: вміст не проходив через копіювання
+                    stats["digest"] = copier.hash_file(dest_file, hasher, control=control).hexdigest()
+        else:
+            check = _copy_check(temp_file_path, hasher, new_hasher, sync, control)
+            if mode == "delta":  # перервана дельта відкочується: при продовженні просто повторюється
+                stats = delta.delta_copy(temp_file_path, dest_file, control=control, progress=on_bytes,
+                                         hasher=hasher, check=check, durable=durable)
+            else:
+                stats = copier.copy_file(temp_file_path, dest_file, control=control, progress=on_bytes,
+                                         hasher=hasher, journal=on_journal, check=check)
+        if hasher is not None:
+            stats.setdefault("digest", hasher.hexdigest())
+            _add_manifest_row(stats)
+        return stats
+
+    def execute_multi(src, items):
+        """Один файл у кілька папок: [(stats або None, помилка або None)] для кожної цілі."""
+        hasher = new_hasher() if new_hasher else None
+        def on_journal(offset):
+            for item in items:
+                journal.advance(item["journal_id"], offset)
+        copied = copier.copy_file_multi(src, [item["target"] for item in items], control=control,
+                                        progress=lambda n: advance(n, items[0]["name"]), hasher=hasher,
+                                        journal=on_journal,
+                                        check=_copy_check(src, hasher, new_hasher, sync, control))
+        outcomes = []
+        for item, stats in zip(items, copied):
+            if "error" in stats:
+                outcomes.append((None, stats["error"]))
+                continue
+            try:
+                if hasher is not None:
+                    stats["digest"] = hasher.hexdigest()
+                    _add_manifest_row(stats)
+            except OSError as e:
+                outcomes.append((None, e))
+                continue
+            journal.done(item["journal_id"])
+            outcomes.append((stats, None))
+        return outcomes
+
+    def copy_folder(item):
+        """Папка рекурсивно (toolbox/tree.py): обхід і копіювання одночасно, прогрес росте з обходом."""
+        def unchanged(path, dest):
+            if not files_identical(path, dest, compare):
+                return False
+            advance(os.path.getsize(path), os.path.basename(path))
+            return True
+        if move and item["action"] == "copy":  # той самий диск — одне перейменування всієї папки
+            report = tree.move_tree(item["src"], item["target"])
+            if report is not None:
+                return report
+        report = tree.copy_tree(item["src"], item["target"],
+                                lambda path, dest, st: copy_one(path, dest, "move" if move else "copy", st=st),
+                                control=control, merge=item["action"] == "replace",
+                                skip=unchanged if sync else None,
+                                on_found=lambda n: advance(0, item["name"], n), priority=priority, keep_dirs=move)
+        if move and not report["cancelled"] and not report["errors"]:
+            tree.remove_empty_dirs(report)
+        report.pop("walked", None)
+        return report
+
+    # Цілі кожного джерела в усіх папках: файл читається один раз для всіх; папки — окремо
+    targets = {}
+    trees = []
+    for k, plan in enumerate(plans):
+        for item in plan["items"]:
+            if item["action"] in ("copy", "replace") and item["src"] in folders:
+                trees.append(item)
+            elif item["action"] in ("copy", "replace"):
+                targets.setdefault(item["src"], []).append(item)
+            elif item["action"] == "unchanged":
+                results[k]["unchanged"].append(item["name"])
+                results[k]["unchanged_bytes"] += file_stats[item["src"]].st_size
+    for src in staged_files:
+        if src not in targets and src not in folders:  # нікуди не копіюється (без змін або пропущено) — прогрес як прочитаний
+            if file_stats[src] is not None:
+                advance(file_stats[src].st_size, os.path.basename(src))
+    # Журнал (toolbox/journal.py): після збою недописані файли можна продовжити (python -m toolbox resume)
+    for src, items in targets.items():
+        for item in items:
+            if move:
+                item["mode"] = "move"
+            elif len(items) == 1 and item["action"] == "replace" and delta.should_use_delta(src, item["target"]):
+                item["mode"] = "delta"
+            else:
+                item["mode"] = "copy"
+    journal_items = [item for items in targets.values() for item in items]
+    journal, ids = Journal.begin(
+        src_folder, {"sync": sync, "verify": algorithm, "move": move},
+        [(_original_path(item["src"], src_folder), item["target"], item["mode"], None) if move
+         else (item["src"], item["target"], item["mode"], file_stats[item["src"]]) for item in journal_items])
+    for item, item_id in zip(journal_items, ids):
+        item["journal_id"] = item_id
+    small, large = [], []
+    for src, items in targets.items():
+        st = file_stats[src]
+        if (small_limit > 0 and len(items) == 1 and items[0]["mode"] == "copy" and st is not None
+                and st.st_size <= small_limit):
+            small.append(items[0])
+        else:
+            large.append((src, items))
+    jobs = []
+    for src, items in large:
+        if len(items) == 1:
+            job = lambda item=items[0]: [(execute(item), None)]
+        else:
+            job = lambda src=src, items=items: execute_multi(src, items)
+        jobs.append((job, [src] + [os.path.dirname(item["target"]) for item in items]))
+    # Копіювання паралельне в межах лімітів пристроїв (toolbox/scheduler.py), результати — у порядку плану
+    started = time.perf_counter()
+    try:
+        limits = scheduler.DeviceLimits(settings)
+        if small:
+            paths = {os.path.dirname(path) for item in small for path in (item["src"], item["target"])}
+            scheduler.run_batches(small, execute_small, settings.getint("small_files", "workers"),
+                                  control=control, priority=priority, limits=limits, paths=paths)
+        outcomes_by_job = scheduler.run(jobs, control=control, limits=limits, priority=priority)
+        for (src, items), (outcomes, error) in zip(large, outcomes_by_job):
+            for i, item in enumerate(items):
+                item["outcome"] = (None, error) if outcomes is None else outcomes[i]
+    finally:
+        unfinished = [item for item in journal_items if item.get("outcome", (None, None))[0] is None]
+        if control is not None and control.cancelled:
+            # Скасовано користувачем — продовжувати нічого: недописані тимчасові файли прибираються
+            for item in unfinished:
+                try:
+                    os.remove(copier.part_path(item["target"]))
+                except OSError:
+                    pass
+            journal.finish()
+        else:
+            # Помилка без тимчасового файлу (немає доступу, не збіглась контрольна сума) — не перерва:
+            # resume такий файл не повторює. Продовжити можна лише недописані і ще не початі.
+            failed = [item for item in unfinished
+                      if "outcome" in item and not os.path.exists(copier.part_path(item["target"]))]
+            journal.failed([item["journal_id"] for item in failed])
+            if len(failed) < len(unfinished):
+                journal.close()  # залишається незавершеним для resume
+            else:
+                journal.finish()
+    for item in trees:
+        if control.cancelled:
+            break
+        item["tree"] = copy_folder(item)
+    seconds = time.perf_counter() - started
+    phases["copying"] = seconds
+    for phase, total in control.timings.items():
+        phases[phase] = total - timings_before.get(phase, 0.0)
+    total_seconds = phases["staging"] + time.perf_counter() - started_at
+
+    for dest, plan, result in zip(dests, plans, results):
+        result["seconds"] = seconds
+        for item in plan["items"]:
+            if item["action"] == "skip":
+                result["skipped"].append(item["name"])
+            if item["action"] not in ("copy", "replace"):
+                continue
+            if "tree" in item:
+                report = item["tree"]
+                result["folders"].append(report)
+                result["errors"].extend(report["errors"])
+                if report["files"] or not (report["errors"] or report["cancelled"]):
+                    result["copied"].append((item["src"], item["target"]))
+                result["files"] += report["files"]
+                result["bytes"] += report["bytes"]
+                result["unchanged_bytes"] += report["unchanged_bytes"]
+                result["manifest"].extend(report["manifest"])
+                for method, n in report["methods"].items():
+                    result["methods"][method] = result["methods"].get(method, 0) + n
+                continue
+            stats, error = item.get("outcome", (None, None))
+            if error is not None:
+                result["errors"].append((item["src"], str(error)))
+            elif stats is not None:
+                result["copied"].append((item["src"], stats["path"]))
+                result["files"] += 1
+                result["bytes"] += stats["bytes"]
+                result["methods"][stats["method"]] = result["methods"].get(stats["method"], 0) + 1
+                if "written" in stats:
+                    result["delta_saved"] += stats["bytes"] - stats["written"]
+                if "manifest" in stats:
+                    result["manifest"].append(stats["manifest"])
+        if algorithm and result["unchanged"]:
+            result["manifest"].extend(_unchanged_manifest(plan, algorithm, control))
+        if control is not None and control.cancelled:
+            result["cancelled"] = True
+        result["metrics"] = _metrics(result, phases, total_seconds)
+        if record_history and result["copied"]:
+            original_files = [_original_path(s, src_folder) for s, _ in result["copied"]]
+            details = {"metrics": result["metrics"]}
+            if move:
+                details.update(operation="move", methods=result["methods"])
+            if algorithm:
+                details.update(verified=algorithm, manifest=result["manifest"])
+            add_to_history(original_files, src_folder, dest, **details)
+    # Оригінали використаних посилань більше не потрібні: після операції GUI очищає список,
+    # а після скасування в ньому лишаються лише ще не вставлені файли
+    cancelled = any(r["cancelled"] for r in results)
+    for path in {s for r in results for s, _ in r["copied"]} if cancelled else staged_files:
+        _staged_origins.pop(path, None)
+    if not fanout:
+        return results[0]
+    combined = _combine_results(results)
+    combined["bytes_read"] = sum(os.path.getsize(src) for src in targets if os.path.exists(src))
+    return combined
+
+def _copy_check(src, hasher, new_hasher, sync, control):
+    """
+    check для copier (тимчасовий файл, ще до перейменування в ціль): перевірка вмісту з диска
+    за хешем (якщо є) і перенесення часу при синхронізації. Копія, що не збіглася, до цілі
+    не доходить — наявний файл лишається як був. None — перевіряти нічого.
+    """
+    if hasher is None and not sync:
+        return None
+
+    def check(part):
+        if hasher is not None:
+            on_disk = copier.hash_on_disk(part, new_hasher(), control=control)
+            if on_disk.digest() != hasher.digest():
+                raise OSError(errno.EIO, f"Копія {os.path.basename(src)!r} не збігається з оригіналом "
+                                         f"(контрольна сума); ціль не змінено")
+        if sync:
+            copy_times(src, part)
+    return check
+
+def _add_manifest_row(stats):
+    st = os.stat(stats["path"])
+    stats["manifest"] = (stats["path"], st.st_size, st.st_mtime_ns, stats["digest"])
+
+def _metrics(result, phases, seconds):
+    """Метрики операції для result["metrics"] (див. run_operation)."""
+    files = result["files"]
+    return {"phases": {phase: round(value, 3) for phase, value in phases.items()},
+            "bytes": result["bytes"], "seconds": round(seconds, 3),
+            "mb_per_second": round(result["bytes"] / 1024 / 1024 / seconds, 2) if seconds else 0.0,
+            "files": files, "files_per_second": round(files / seconds, 1) if seconds else 0.0,
+            "conflicts": result.get("conflicts", 0), "skipped": len(result["skipped"]),
+            "unchanged": len(result["unchanged"]) + sum(report["unchanged"] for report in result["folders"]),
+            "errors": len(result["errors"])}
+
+def _combine_results(results):
+    """Зведений результат роздачі в кілька папок (ключі як в однієї) + destinations."""
+    combined = {"dest": "; ".join(r["dest"] for r in results), "destinations": results,
+                "cancelled": any(r["cancelled"] for r in results), "move": False,
+                "verified": results[0]["verified"], "seconds": max(r["seconds"] for r in results),
+                "methods": {}}
+    for key in ("copied", "skipped", "errors", "unchanged", "manifest", "folders"):
+        combined[key] = [x for r in results for x in r[key]]
+    for key in ("bytes", "unchanged_bytes", "delta_saved", "files"):
+        combined[key] = sum(r[key] for r in results)
+    for r in results:
+        for method, n in r["methods"].items():
+            combined["methods"][method] = combined["methods"].get(method, 0) + n
+    if "metrics" in results[0]:
+        metrics = results[0]["metrics"]
+        combined["metrics"] = _metrics(dict(combined, conflicts=sum(r.get("conflicts", 0) for r in results)),
+                                       metrics["phases"], metrics["seconds"])
+    return combined
+
+def _unchanged_manifest(plan, algorithm, control=None):
+    """
+    Рядки маніфесту для файлів, пропущених синхронізацією: хеш береться з попереднього маніфесту,
+    якщо ціль відтоді не змінилась (розмір і mtime), інакше читається сама ціль — не джерело.
+    """
+    from toolbox import history, verify
+    targets = [item["target"] for item in plan["items"] if item["action"] == "unchanged"]
+    known = history.latest_digests(targets, algorithm)
+    rows = []
+    for target in targets:
+        try:
+            st = os.stat(target)
+            previous = known.get(target)
+            if previous is not None and previous[:2] == (st.st_size, st.st_mtime_ns):
+                digest = previous[2]
+            else:
+                digest = copier.hash_file(target, verify.new_hasher(algorithm), control=control).hexdigest()
+        except OSError:
+            continue
+        rows.append((target, st.st_size, st.st_mtime_ns, digest))
+    return rows
+
+# ====================== Історія ======================
+
+def add_to_history(files, src_folder, dest_folder, **details):
+    """Записує операцію в історію (toolbox/history.py). Повертає її id."""
+    from toolbox import history
+    date_str = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    return history.add(files, src_folder, dest_folder, date_str, **details)
+
+def parse_history_line(line):
+    """Розбирає рядок history.txt попередніх версій (для імпорту в history.db)."""
+    line = line.strip()
+    m = re.match(r'^(.*?)\s*\|\s*src=(.*?)\s*\|\s*files=(.*?)\s*\|\s*dest=(.*)$', line)
+    if m:
+        timestamp = m.group(1).strip()
+        src = m.group(2).strip()
+        files_str = m.group(3).strip()
+        dest = m.group(4).strip()
+        files = [p for p in files_str.split(";") if p]
+        return {"timestamp": timestamp, "src": src, "files": files, "dest": dest}
+    m2 = re.match(r'^(.*?):\s*(.*?)\s*->\s*(.*)$', line)
+    if m2:
+        timestamp = m2.group(1).strip()
+        names = [n.strip() for n in m2.group(2).split(",") if n.strip()]
+        dest = m2.group(3).strip()
+        return {"timestamp": timestamp, "src": None, "files": names, "dest": dest}
+    return {"timestamp": "", "src": None, "files": [], "dest": "", "raw": line}
+
+def read_history(limit=HISTORY_LIMIT, before_id=None, search=None, field="any"):
+    """
+    Останні limit записів історії, від старих до нових; кожен має id.
+    before_id — сторінка старіших записів; search — лише записи, де field містить цей текст.
+    """
+    from toolbox import history
+    if search:
+        return history.search(search, field=field, limit=limit, before_id=before_id)
+    return history.tail(limit, before_id=before_id)
+
+def format_speed(nbytes, seconds):
+    """"12.3 МБ за 0.8 с (15.4 МБ/с)"."""
+    mb = nbytes / (1024 * 1024)
+    rate = mb / seconds if seconds > 0 else 0.0
+    return f"{mb:.1f} МБ за {seconds:.2f} с ({rate:.1f} МБ/с)"
+
+def format_history_entry(parsed):
+    """Короткий рядок для списку історії."""
+    if parsed.get("raw"):
+        return parsed["raw"]
+    timestamp = parsed.get("timestamp", "")
+    files = parsed.get("files", [])
+    dest = parsed.get("dest", "")
+    short_names = ", ".join(os.path.basename(p) for p in files[:3])
+    if len(files) > 3:
+        short_names += f" +{len(files)-3}"
+    mark = " ✓" if parsed.get("verified") else ""
+    if parsed.get("operation") == "move":
+        return f"{timestamp}: переміщено {short_names} -> {dest}{mark}"
+    return f"{timestamp}: {short_names} -> {dest}{mark}"
+
+# ====================== Профілі ======================
+
+def load_profiles():
+    """Зчитує profiles.ini. Повертає {індекс: профіль або None} для всіх NUM_PROFILES."""
+    ensure_log_folder()
+    profiles = {i: None for i in range(NUM_PROFILES)}
+    if not os.path.exists(PROFILES_FILE):
+        return profiles
+    config = configparser.ConfigParser()
+    config.read(PROFILES_FILE, encoding='utf-8')
+    for i in range(NUM_PROFILES):
+        section = f"Profile{i+1}"
+        if section in config:
+            src = config[section].get('src', '')
+            dest = config[section].get('dest', '')
+            files = config[section].get('files', '')
+            files_list = [p for p in files.split(';') if p]
+            profiles[i] = {'src': src, 'dest': dest, 'files': files_list,
+                           'sync': config[section].getboolean('sync', False),
+                           'compare': config[section].get('compare', 'mtime'),
+                           'move': config[section].getboolean('move', False),
+                           'verify': config[section].getboolean('verify', False),
+                           'limit_mbps': config[section].getfloat('limit_mbps', 0),
+                           'priority': config[section].get('priority', '')}
+    return profiles
+
+def save_profiles(profiles):
+    ensure_log_folder()
+    config = configparser.ConfigParser()
+    for i in range(NUM_PROFILES):
+        section = f"Profile{i+1}"
+        config[section] = {}
+        p = profiles.get(i)
+        if p:
+            config[section]['src'] = p.get('src') or ''
+            config[section]['dest'] = p.get('dest') or ''
+            config[section]['files'] = ";".join(p.get('files') or [])
+            if p.get('sync'):
+                config[section]['sync'] = 'yes'
+                config[section]['compare'] = p.get('compare') or 'mtime'
+            if p.get('move'):
+                config[section]['move'] = 'yes'
+            if p.get('verify'):
+                config[section]['verify'] = 'yes'
+            if p.get('limit_mbps'):
+                config[section]['limit_mbps'] = f"{p['limit_mbps']:g}"
+            if p.get('priority'):
+                config[section]['priority'] = p['priority']
+    with open(PROFILES_FILE, 'w', encoding='utf-8') as f:
+        config.write(f)
+
+def check_profile(profiles, idx):
+    """Повертає профіль idx або кидає ProfileError, якщо він порожній чи неповний."""
+    p = profiles.get(idx)
+    if not p:
+        raise ProfileError(f"Профіль #{idx+1} порожній.")
+    if not p.get('src') or not p.get('files') or not profile_dests(p):  # dest з одних ";" — теж порожній
+        raise ProfileError("Профіль містить неповні дані.")
+    return p
+
+def profile_dests(profile):
+    """Папки призначення профілю: dest може містити кілька папок через ";" (роздача)."""
+    return [d.strip() for d in (profile.get('dest') or '').split(';') if d.strip()]
+
+def resolve_profile_files(profile):
+    """
+    Шукає файли профілю: за повним шляхом, а якщо його нема — за іменем у папці src.
+    Повертає (знайдені шляхи, імена відсутніх файлів).
+    """
+    found, missing = [], []
+    src = profile.get('src')
+    for fp in profile.get('files', []):
+        if os.path.isfile(fp):
+            found.append(fp)
+            continue
+        candidate = os.path.join(src, os.path.basename(fp))
+        if os.path.isfile(candidate):
+            found.append(candidate)
+        else:
+            missing.append(os.path.basename(fp))
+    return found, missing
+
+def replay_profile(idx, on_conflict=None, profiles=None, control=None, sync=None, compare=None, move=None,
+                   verify=None, limit_mbps=None, priority=None, profiler=None):
+    """
+    Повністю виконує профіль idx без GUI: пошук файлів, підготовка, вставка (у всі папки dest).
+    sync, compare і move за замовчуванням беруться з профілю; verify — з профілю, а якщо там
+    не ввімкнено — з settings.ini [verify]; limit_mbps і priority — з профілю, якщо там задані,
+    інакше з settings.ini [throttle]; profiler — як у run_operation. У режимі синхронізації та при
+    переміщенні файли беруться прямо з оригіналів (без підготовки); синхронізація копіює лише
+    нові та змінені.
+    Повертає результат run_operation з додатковим ключем missing.
+    """
+    if profiles is None:
+        profiles = load_profiles()
+    p = check_profile(profiles, idx)
+    if sync is None:
+        sync = p.get('sync', False)
+    if compare is None:
+        compare = p.get('compare') or 'mtime'
+    if move is None:
+        move = p.get('move', False)
+    if verify is None:
+        verify = True if p.get('verify') else None
+    if limit_mbps is None:
+        limit_mbps = p.get('limit_mbps') or None
+    if priority is None:
+        priority = p.get('priority') or None
+    found, missing = resolve_profile_files(p)
+    started = time.perf_counter()
+    staged = found if sync or move else stage_files(found, control=control)
+    staging_seconds = time.perf_counter() - started
+    dests = profile_dests(p)
+    result = run_operation(staged, dests if len(dests) > 1 else dests[0], src_folder=p['src'],
+                           on_conflict=on_conflict, control=control, sync=sync, compare=compare, move=move,
+                           verify=verify, limit_mbps=limit_mbps, priority=priority,
+                           staging_seconds=staging_seconds, profiler=profiler)
+    result["missing"] = missing
+    return result
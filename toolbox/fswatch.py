@@ -0,0 +1,100 @@
+"""
+Сповіщення про зміни у файловій системі: inotify (Linux) через ctypes, без сторонніх пакетів.
+Якщо inotify недоступний (інша ОС, обмеження контейнера), available() повертає False —
+тоді викликач сам перевіряє час зміни (mtime) папок.
+"""
+import ctypes, ctypes.util, errno, os, select, struct, sys
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000  # черга ядра переповнилась — частину подій втрачено
+IN_IGNORED = 0x00008000     # спостереження знято (папку видалено або remove_watch)
+IN_ONLYDIR = 0x01000000
+IN_ISDIR = 0x40000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+# Зміни списку файлів папки
+LISTING_EVENTS = IN_CREATE | IN_DELETE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE_SELF | IN_MOVE_SELF
+
+_EVENT = struct.Struct("iIII")  # struct inotify_event: wd, mask, cookie, len (далі ім'я)
+READ_SIZE = 64 * 1024
+
+_libc = None
+
+
+def _load():
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux"):
+            try:
+                libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+                libc.inotify_init1.argtypes = [ctypes.c_int]
+                libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+                libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+                _libc = libc
+            except (OSError, AttributeError):
+                pass
+    return _libc
+
+
+def available():
+    return bool(_load())
+
+
+def _error():
+    code = ctypes.get_errno()
+    return OSError(code, os.strerror(code))
+
+
+class Inotify:
+    """Один дескриптор inotify. read() повертає [(wd, mask, cookie, name)]."""
+    def __init__(self):
+        libc = _load()
+        if not libc:
+            raise OSError(errno.ENOSYS, "inotify недоступний")
+        fd = libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if fd < 0:
+            raise _error()
+        self._libc = libc
+        self.fd = fd
+
+    def add_watch(self, path, mask=LISTING_EVENTS):
+        """Спостереження за папкою path; повертає wd. OSError — напр. вичерпано max_user_watches."""
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(path), mask | IN_ONLYDIR)
+        if wd < 0:
+            raise _error()
+        return wd
+
+    def remove_watch(self, wd):
+        self._libc.inotify_rm_watch(self.fd, wd)  # помилка означає, що його вже знято ядром
+
+    def read(self, timeout=None):
+        """Події, що надійшли; чекає не довше timeout секунд (None — без обмеження)."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, READ_SIZE)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + _EVENT.size <= len(data):
+            wd, mask, cookie, length = _EVENT.unpack_from(data, offset)
+            offset += _EVENT.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            events.append((wd, mask, cookie, os.fsdecode(name)))
+        return events
+
+    def close(self):
+        os.close(self.fd)
@@ -0,0 +1,201 @@
+"""
+Історія операцій у SQLite (history.db) замість перечитування всього history.txt.
+
+    operations — одна операція: час, src, dest, файли (через ";"), details (JSON для додаткових даних)
+    op_files   — файли операції окремими рядками, щоб шукати за іменем
+    manifests  — контрольні суми записаних файлів для операцій з перевіркою (toolbox/verify.py)
+
+history.txt попередніх версій (обидва формати рядків, див. engine.parse_history_line) імпортується
+автоматично; запам'ятовується зміщення, тож рядки, дописані старою версією пізніше, теж підхопляться.
+"""
+import json, os, sqlite3
+from contextlib import contextmanager
+
+from toolbox.engine import LOG_FOLDER, HISTORY_FILE, HISTORY_LIMIT, ensure_log_folder, parse_history_line
+
+HISTORY_DB = os.path.join(LOG_FOLDER, "history.db")
+SEARCH_FIELDS = ("any", "src", "dest", "file")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS operations (
+    id INTEGER PRIMARY KEY, timestamp TEXT NOT NULL, src TEXT, dest TEXT NOT NULL,
+    files TEXT NOT NULL, raw TEXT, details TEXT);
+CREATE INDEX IF NOT EXISTS operations_src ON operations(src);
+CREATE INDEX IF NOT EXISTS operations_dest ON operations(dest);
+CREATE TABLE IF NOT EXISTS op_files (op_id INTEGER NOT NULL, name TEXT NOT NULL, path TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS op_files_op ON op_files(op_id);
+CREATE INDEX IF NOT EXISTS op_files_name ON op_files(name);
+CREATE TABLE IF NOT EXISTS manifests (
+    op_id INTEGER NOT NULL, path TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, digest TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS manifests_op ON manifests(op_id);
+CREATE INDEX IF NOT EXISTS manifests_path ON manifests(path);
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+"""
+
+
+@contextmanager
+def _connect():
+    ensure_log_folder()
+    db = sqlite3.connect(HISTORY_DB, timeout=30)
+    try:
+        db.executescript(_SCHEMA)
+        with db:
+            _migrate_text_history(db)
+        with db:
+            yield db
+    finally:
+        db.close()
+
+
+def _insert(db, timestamp, src, files, dest, raw=None, details=None):
+    cur = db.execute(
+        "INSERT INTO operations(timestamp, src, dest, files, raw, details) VALUES (?, ?, ?, ?, ?, ?)",
+        (timestamp, src, dest, ";".join(files), raw, json.dumps(details) if details else None))
+    op_id = cur.lastrowid
+    db.executemany("INSERT INTO op_files(op_id, name, path) VALUES (?, ?, ?)",
+                   [(op_id, os.path.basename(p), p) for p in files])
+    return op_id
+
+
+def _migrate_text_history(db):
+    """Імпортує нові рядки history.txt (від запам'ятованого зміщення)."""
+    try:
+        size = os.path.getsize(HISTORY_FILE)
+    except OSError:
+        return
+    row = db.execute("SELECT value FROM meta WHERE key = 'text_offset'").fetchone()
+    offset = int(row[0]) if row else 0
+    if size < offset:  # файл замінили або обрізали — читаємо спочатку
+        offset = 0
+    if size == offset:
+        return
+    with open(HISTORY_FILE, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b"\n") + 1  # лише завершені рядки
+    for line in data[:end].decode("utf-8", errors="replace").splitlines():
+        if not line.strip():
+            continue
+        parsed = parse_history_line(line)
+        _insert(db, parsed["timestamp"], parsed["src"], parsed["files"], parsed["dest"], raw=parsed.get("raw"))
+    db.execute("INSERT OR REPLACE INTO meta(key, value) VALUES ('text_offset', ?)", (str(offset + end),))
+
+
+def _entry(row):
+    op_id, timestamp, src, dest, files, raw, details = row
+    entry = {"id": op_id, "timestamp": timestamp, "src": src, "dest": dest,
+             "files": [p for p in files.split(";") if p]}
+    if raw is not None:
+        entry["raw"] = raw
+    if details:
+        entry.update(json.loads(details))
+    return entry
+
+
+_COLUMNS = "id, timestamp, src, dest, files, raw, details"
+
+
+def add(files, src_folder, dest_folder, timestamp, manifest=None, **details):
+    """
+    Записує операцію; details — додаткові поля (зберігаються як JSON і повертаються в записі).
+    manifest — [(ціль, розмір, mtime_ns, хеш)] для операції з перевіркою. Повертає id.
+    """
+    with _connect() as db:
+        op_id = _insert(db, timestamp, src_folder, files, dest_folder, details=details)
+        if manifest:
+            db.executemany("INSERT INTO manifests(op_id, path, size, mtime_ns, digest) VALUES (?, ?, ?, ?, ?)",
+                           [(op_id,) + tuple(row) for row in manifest])
+        return op_id
+
+
+def tail(limit=HISTORY_LIMIT, before_id=None):
+    """
+    Останні limit операцій (від старих до нових). before_id — взяти ті, що раніше за цю операцію
+    (наступна сторінка в минуле).
+    """
+    with _connect() as db:
+        if before_id is None:
+            rows = db.execute(f"SELECT {_COLUMNS} FROM operations ORDER BY id DESC LIMIT ?", (limit,))
+        else:
+            rows = db.execute(f"SELECT {_COLUMNS} FROM operations WHERE id < ? ORDER BY id DESC LIMIT ?",
+                              (before_id, limit))
+        return [_entry(r) for r in reversed(rows.fetchall())]
+
+
+def search(text, field="any", limit=HISTORY_LIMIT, before_id=None):
+    """
+    Операції, у яких src, dest або ім'я файлу (field, див. SEARCH_FIELDS) містить text (без урахування
+    регістру для латиниці). Порядок і посторінковість як у tail().
+    """
+    if field not in SEARCH_FIELDS:
+        raise ValueError(f"Невідоме поле пошуку: {field}")
+    pattern = f"%{text}%"
+    conditions = []
+    if field in ("any", "src"):
+        conditions.append("src LIKE :p")
+    if field in ("any", "dest"):
+        conditions.append("dest LIKE :p")
+    if field in ("any", "file"):
+        conditions.append("id IN (SELECT op_id FROM op_files WHERE name LIKE :p)")
+    where = "(" + " OR ".join(conditions) + ")"
+    params = {"p": pattern, "limit": limit}
+    if before_id is not None:
+        where += " AND id < :before"
+        params["before"] = before_id
+    with _connect() as db:
+        rows = db.execute(f"SELECT {_COLUMNS} FROM operations WHERE {where} ORDER BY id DESC LIMIT :limit",
+                          params).fetchall()
+    return [_entry(r) for r in reversed(rows)]
+
+
+def get(op_id):
+    with _connect() as db:
+        row = db.execute(f"SELECT {_COLUMNS} FROM operations WHERE id = ?", (op_id,)).fetchone()
+    return _entry(row) if row else None
+
+
+def manifest(op_id):
+    """Маніфест операції: [(ціль, розмір, mtime_ns, хеш)] (порожній, якщо її виконано без перевірки)."""
+    with _connect() as db:
+        return db.execute("SELECT path, size, mtime_ns, digest FROM manifests WHERE op_id = ? ORDER BY rowid",
+                          (op_id,)).fetchall()
+
+
+def latest_digests(paths, algorithm):
+    """
+    Останні відомі хеші файлів за маніфестами операцій з алгоритмом algorithm:
+    {шлях: (розмір, mtime_ns, хеш)}. Чи файл відтоді не змінився, вирішує викликач.
+    """
+    result = {}
+    with _connect() as db:
+        for path in paths:
+            for op_id, size, mtime_ns, digest in db.execute(
+                    "SELECT op_id, size, mtime_ns, digest FROM manifests WHERE path = ? ORDER BY op_id DESC",
+                    (path,)):
+                row = db.execute("SELECT details FROM operations WHERE id = ?", (op_id,)).fetchone()
+                if row and row[0] and json.loads(row[0]).get("verified") == algorithm:
+                    result[path] = (size, mtime_ns, digest)
+                    break
+    return result
+
+
+def metrics(after_id=None):
+    """
+    Метрики операцій (engine.run_operation, ключ metrics) від старих до нових, по одній:
+    {"id", "timestamp", "src", "dest", "operation", "files", ...метрики}. Операції без метрик
+    (записані попередніми версіями) пропускаються. after_id — лише новіші за цю операцію.
+    """
+    with _connect() as db:
+        rows = db.execute("SELECT id, timestamp, src, dest, details FROM operations "
+                          "WHERE id > ? AND details LIKE '%\"metrics\"%' ORDER BY id", (after_id or 0,))
+        for op_id, timestamp, src, dest, details in rows:
+            details = json.loads(details)
+            if "metrics" not in details:
+                continue
+            yield dict({"id": op_id, "timestamp": timestamp, "src": src, "dest": dest,
+                        "operation": details.get("operation", "copy")}, **details["metrics"])
+
+
+def count():
+    with _connect() as db:
+        return db.execute("SELECT COUNT(*) FROM operations").fetchone()[0]
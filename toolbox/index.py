@@ -0,0 +1,286 @@
+"""
+Постійний індекс імен файлів (index.db у LOG_FOLDER) для миттєвого пошуку у великих папках.
+
+Корені індексу — settings.ini [index] roots (через ";"), за замовчуванням — папки src профілів.
+Оновлення інкрементне, за часом зміни папок: папка, чий mtime не змінився, не перечитується
+(створення, видалення і перейменування файлу змінюють mtime його папки), тож повторне оновлення
+мільйонів файлів — це лише stat кожної папки.
+
+    dirs  — папки: повний шлях, батьківська папка, mtime на момент останнього читання
+    files — імена файлів кожної папки
+    names — повнотекстовий індекс FTS5 з триграмами над files.name: пошук частини імені
+            (від 3 символів) не переглядає таблицю; без FTS5 — перебір імен (повільніше, але працює)
+"""
+import os, re, sqlite3, time
+from contextlib import contextmanager
+
+from toolbox.engine import LOG_FOLDER, ensure_log_folder, load_profiles, load_settings
+
+INDEX_DB = os.path.join(LOG_FOLDER, "index.db")
+COMMIT_EVERY = 500        # папок між фіксаціями (пошук бачить оновлення частинами, збій не губить усе)
+SEARCH_CHUNK_SIZE = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS roots (path TEXT PRIMARY KEY, updated REAL);
+CREATE TABLE IF NOT EXISTS dirs (id INTEGER PRIMARY KEY, path TEXT NOT NULL UNIQUE, parent INTEGER, mtime_ns INTEGER);
+CREATE INDEX IF NOT EXISTS dirs_parent ON dirs(parent);
+CREATE TABLE IF NOT EXISTS files (id INTEGER PRIMARY KEY, dir INTEGER NOT NULL, name TEXT NOT NULL);
+CREATE INDEX IF NOT EXISTS files_dir ON files(dir);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS names USING fts5(name, content='files', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO names(rowid, name) VALUES (new.id, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO names(names, rowid, name) VALUES ('delete', old.id, old.name);
+END;
+"""
+
+
+@contextmanager
+def _connect():
+    ensure_log_folder()
+    db = sqlite3.connect(INDEX_DB, timeout=30)
+    try:
+        db.execute("PRAGMA journal_mode=WAL")  # пошук читає, поки фоновий потік оновлює
+        db.executescript(_SCHEMA)
+        try:
+            db.executescript(_FTS_SCHEMA)
+        except sqlite3.OperationalError:
+            pass  # SQLite без FTS5 або без триграм (старше 3.34)
+        yield db
+    finally:
+        db.close()
+
+
+def _has_fts(db):
+    return db.execute("SELECT 1 FROM sqlite_master WHERE name = 'names'").fetchone() is not None
+
+
+def _subtree_range(path):
+    """Межі шляхів під path для порівняння за індексом: path/ <= шлях < path + наступний символ після /."""
+    return path + os.sep, path + chr(ord(os.sep) + 1)
+
+
+def configured_roots(settings=None):
+    """Корені з settings.ini [index] roots або, якщо не задано, папки src профілів (вкладені відкидаються)."""
+    if settings is None:
+        settings = load_settings()
+    text = settings.get("index", "roots").strip()
+    if text:
+        roots = [p.strip() for p in text.split(";") if p.strip()]
+    else:
+        roots = [p["src"] for p in load_profiles().values() if p and p.get("src")]
+    roots = sorted({os.path.abspath(p) for p in roots if os.path.isdir(p)})
+    result = []
+    for path in roots:
+        if not any(path.startswith(r.rstrip(os.sep) + os.sep) for r in result):
+            result.append(path)
+    return result
+
+
+# ====================== Оновлення ======================
+
+def update(roots=None):
+    """
+    Генератор: оновлює індекс для roots (за замовчуванням configured_roots()) і видає прогрес
+    {"root", "dirs" — перевірено папок, "scanned" — перечитано змінених} кожні COMMIT_EVERY папок
+    та в кінці кожного кореня. Корені, яких більше немає в списку, видаляються з індексу.
+    Перервати можна, закривши генератор: уже зафіксоване лишається.
+    """
+    if roots is None:
+        roots = configured_roots()
+    roots = [os.path.abspath(r) for r in roots]
+    with _connect() as db:
+        for (old,) in db.execute("SELECT path FROM roots").fetchall():
+            if old not in roots:
+                with db:
+                    _drop_tree(db, old)
+                    db.execute("DELETE FROM roots WHERE path = ?", (old,))
+        for root in roots:
+            yield from _update_root(db, root)
+
+
+def _update_root(db, root):
+    with db:
+        db.execute("INSERT OR IGNORE INTO roots(path) VALUES (?)", (root,))
+        row = db.execute("SELECT id, mtime_ns FROM dirs WHERE path = ?", (root,)).fetchone()
+        if row is None:
+            row = (db.execute("INSERT INTO dirs(path) VALUES (?)", (root,)).lastrowid, None)
+    stack = [(row[0], root, row[1])]
+    checked = scanned = 0
+    try:
+        while stack:
+            dir_id, path, known_mtime = stack.pop()
+            checked += 1
+            try:
+                mtime_ns = os.stat(path).st_mtime_ns
+            except OSError:
+                if path == root:
+                    mtime_ns = None
+                else:
+                    _drop_tree(db, path)
+                    continue
+            if mtime_ns is not None and mtime_ns == known_mtime:
+                stack.extend(db.execute("SELECT id, path, mtime_ns FROM dirs WHERE parent = ?", (dir_id,)))
+            elif mtime_ns is not None:
+                stack.extend(_scan_dir(db, dir_id, path))
+                db.execute("UPDATE dirs SET mtime_ns = ? WHERE id = ?", (mtime_ns, dir_id))
+                scanned += 1
+            if checked % COMMIT_EVERY == 0:
+                db.commit()
+                yield {"root": root, "dirs": checked, "scanned": scanned}
+        db.execute("UPDATE roots SET updated = ? WHERE path = ?", (time.time(), root))
+        db.commit()
+    finally:
+        db.commit()  # при перериванні — зафіксувати вже прочитані папки (їхні підпапки лишаються з mtime NULL)
+    yield {"root": root, "dirs": checked, "scanned": scanned}
+
+
+def _scan_dir(db, dir_id, path):
+    """Перечитує папку: файли — різницею з індексом, зниклі підпапки — видаляє. Повертає підпапки для обходу."""
+    files, subdirs = set(), set()
+    try:
+        with os.scandir(path) as entries:
+            for entry in entries:
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.add(entry.name)
+                    elif entry.is_file():
+                        files.add(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        pass  # немає доступу — індекс для неї порожній
+    known = dict(db.execute("SELECT name, id FROM files WHERE dir = ?", (dir_id,)))
+    db.executemany("DELETE FROM files WHERE id = ?", [(i,) for name, i in known.items() if name not in files])
+    db.executemany("INSERT INTO files(dir, name) VALUES (?, ?)", [(dir_id, n) for n in files if n not in known])
+    children = []
+    for child_id, child_path, child_mtime in db.execute(
+            "SELECT id, path, mtime_ns FROM dirs WHERE parent = ?", (dir_id,)).fetchall():
+        name = os.path.basename(child_path)
+        if name in subdirs:
+            subdirs.discard(name)
+            children.append((child_id, child_path, child_mtime))
+        else:
+            _drop_tree(db, child_path)
+    for name in subdirs:
+        child_path = os.path.join(path, name)
+        child_id = db.execute("INSERT INTO dirs(path, parent) VALUES (?, ?)", (child_path, dir_id)).lastrowid
+        children.append((child_id, child_path, None))
+    return children
+
+
+def _drop_tree(db, path):
+    lo, hi = _subtree_range(path)
+    where = "path = ? OR (path >= ? AND path < ?)"
+    db.execute(f"DELETE FROM files WHERE dir IN (SELECT id FROM dirs WHERE {where})", (path, lo, hi))
+    db.execute(f"DELETE FROM dirs WHERE {where}", (path, lo, hi))
+
+
+# ====================== Пошук ======================
+
+class _Entry:
+    """Те, що search.make_matcher очікує від os.DirEntry: name, path і stat()."""
+    __slots__ = ("name", "path")
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.basename(path)
+
+    def stat(self):
+        return os.stat(self.path)
+
+
+def _fts_query(pattern, regex, extensions):
+    """Умова MATCH з літеральних частин шаблону і розширень (триграми — від 3 символів) або None."""
+    def phrase(text):
+        return '"' + text.replace('"', '""') + '"'
+    terms = []
+    if pattern and not regex:
+        terms += [phrase(part) for part in re.split(r"[*?]|\[[^\]]*\]", pattern) if len(part) >= 3]
+    suffixes = ["." + e.strip().lstrip(".") for e in extensions or [] if e.strip()]
+    if suffixes and all(len(s) >= 3 for s in suffixes):
+        terms.append("(" + " OR ".join(phrase(s) for s in suffixes) + ")")
+    return " AND ".join(terms) or None
+
+
+def search(folder, pattern=None, regex=False, extensions=None, chunk_size=SEARCH_CHUNK_SIZE, **filters):
+    """
+    Як search.search, але з індексу: генератор порцій [(шлях відносно folder, False)].
+    Параметри фільтра — як у search.make_matcher; розмір і дата перевіряються stat лише для файлів,
+    що підійшли за іменем (тоді ж пропускаються файли, що зникли після останнього оновлення індексу).
+    """
+    from toolbox.search import make_matcher
+    matcher = make_matcher(pattern, regex=regex, extensions=extensions, **filters)
+    folder = os.path.abspath(folder)
+    prefix = len(folder.rstrip(os.sep)) + 1
+    lo, hi = _subtree_range(folder.rstrip(os.sep))
+    under = "(d.path = :folder OR (d.path >= :lo AND d.path < :hi))"
+    params = {"folder": folder, "lo": lo, "hi": hi}
+    with _connect() as db:
+        query = _fts_query(pattern, regex, extensions) if _has_fts(db) else None
+        if query is not None:
+            params["q"] = query
+            sql = (f"SELECT d.path, f.name FROM names JOIN files f ON f.id = names.rowid "
+                   f"JOIN dirs d ON d.id = f.dir WHERE names MATCH :q AND {under}")
+        else:
+            sql = f"SELECT d.path, f.name FROM dirs d JOIN files f ON f.dir = d.id WHERE {under}"
+        cursor = db.execute(sql, params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                break
+            chunk = []
+            for path, name in rows:
+                entry = _Entry(os.path.join(path, name))
+                try:
+                    if matcher(entry):
+                        chunk.append((entry.path[prefix:], False))
+                except OSError:
+                    continue
+            yield chunk
+
+
+def covers(folder):
+    """Чи є folder під коренем індексу, який уже хоча б раз повністю оновлено."""
+    folder = os.path.abspath(folder)
+    if not os.path.exists(INDEX_DB):
+        return False
+    with _connect() as db:
+        roots = db.execute("SELECT path, updated FROM roots").fetchall()
+    for path, updated in roots:
+        if updated is not None and (folder == path or folder.startswith(path.rstrip(os.sep) + os.sep)):
+            return True
+    return False
+
+
+def status():
+    """{"roots": [(шлях, час оновлення або None)], "files", "dirs", "size" — байт на диску}."""
+    if not os.path.exists(INDEX_DB):
+        return {"roots": [], "files": 0, "dirs": 0, "size": 0}
+    with _connect() as db:
+        roots = db.execute("SELECT path, updated FROM roots ORDER BY path").fetchall()
+        files = db.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+        dirs = db.execute("SELECT COUNT(*) FROM dirs").fetchone()[0]
+    size = sum(os.path.getsize(INDEX_DB + suffix) for suffix in ("", "-wal")
+               if os.path.exists(INDEX_DB + suffix))
+    return {"roots": roots, "files": files, "dirs": dirs, "size": size}
+
+
+def format_status(report, now=None):
+    """"1234 файл(ів), 12.5 МБ, оновлено 5 хв тому" (за найдавніше оновленим коренем)."""
+    if not report["roots"]:
+        return "індекс порожній"
+    text = f"{report['files']} файл(ів), {report['size'] / (1024 * 1024):.1f} МБ"
+    times = [updated for _, updated in report["roots"]]
+    if None in times:
+        return text + ", ще не оновлено повністю"
+    minutes = int(((now or time.time()) - min(times)) // 60)
+    if minutes < 1:
+        return text + ", оновлено щойно"
+    if minutes < 120:
+        return text + f", оновлено {minutes} хв тому"
+    return text + f", оновлено {minutes // 60} год тому"
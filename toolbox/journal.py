@@ -0,0 +1,279 @@
+"""
+Журнал передач (journal.db у LOG_FOLDER): після збою, закриття програми чи втрати мережевого диска
+видно, які файли операції не дописані і до якого місця.
+
+Файли пишуться під тимчасовими іменами (copier.part_path: ".<ім'я>.tbpart" у тій самій папці)
+і перейменовуються в остаточні лише після повного запису, тож під справжнім іменем недописаного
+файлу не буває. Кожні copier.JOURNAL_INTERVAL байтів тимчасовий файл скидається на диск і в журнал
+записується зміщення — resume() продовжує з нього; перед перейменуванням файл скидається на диск
+повністю, тож позначений готовим файл після збою живлення не виявиться обрізаним.
+
+    batches — операція: папка-джерело, параметри (sync, verify, move), чи завершена
+    items   — файл операції: джерело, ціль, спосіб (copy, delta, move), розмір і mtime джерела,
+              підтверджене зміщення, done: 0 — ще ні, 1 — готовий, -1 — не вдався (не продовжується)
+"""
+import json, os, sqlite3, threading, time
+from datetime import datetime
+
+from toolbox import copier
+from toolbox.engine import LOG_FOLDER, ToolBoxError, ensure_log_folder
+
+JOURNAL_DB = os.path.join(LOG_FOLDER, "journal.db")
+KEEP_FINISHED_DAYS = 7
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS batches (
+    id INTEGER PRIMARY KEY, started TEXT NOT NULL, src_folder TEXT, options TEXT NOT NULL,
+    finished REAL);
+CREATE TABLE IF NOT EXISTS items (
+    id INTEGER PRIMARY KEY, batch INTEGER NOT NULL, src TEXT NOT NULL, target TEXT NOT NULL,
+    mode TEXT NOT NULL, size INTEGER NOT NULL, mtime_ns INTEGER NOT NULL,
+    offset INTEGER NOT NULL DEFAULT 0, done INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS items_batch ON items(batch);
+"""
+
+
+def _open():
+    ensure_log_folder()
+    db = sqlite3.connect(JOURNAL_DB, timeout=30, check_same_thread=False)
+    db.execute("PRAGMA journal_mode=WAL")
+    db.execute("PRAGMA synchronous=NORMAL")  # без fsync на кожен файл; готовність перевіряється і за диском
+    db.executescript(_SCHEMA)
+    return db
+
+
+class Journal:
+    """
+    Записи однієї операції. Створюється begin(); advance() і done() викликаються з потоків
+    копіювання, finish() — коли операція завершилась (успішно чи скасована користувачем).
+    """
+    def __init__(self, db, batch_id):
+        self._db = db
+        self._lock = threading.Lock()
+        self.batch_id = batch_id
+
+    @classmethod
+    def begin(cls, src_folder, options, items):
+        """
+        items — [(джерело, ціль, спосіб, stat джерела або None — прочитати)]; повертає
+        (Journal, [id запису для кожного item]).
+        Заодно прибирає завершені операції, старші за KEEP_FINISHED_DAYS.
+        """
+        db = _open()
+        with db:
+            db.execute("DELETE FROM items WHERE batch IN (SELECT id FROM batches WHERE finished < ?)",
+                       (time.time() - KEEP_FINISHED_DAYS * 86400,))
+            db.execute("DELETE FROM batches WHERE finished < ?", (time.time() - KEEP_FINISHED_DAYS * 86400,))
+            batch_id = db.execute("INSERT INTO batches(started, src_folder, options) VALUES (?, ?, ?)",
+                                  (datetime.now().strftime("%Y-%m-%d %H:%M:%S"), src_folder,
+                                   json.dumps(options))).lastrowid
+            ids = []
+            for src, target, mode, st in items:
+                try:
+                    if st is None:
+                        st = os.stat(src)
+                    size, mtime_ns = st.st_size, st.st_mtime_ns
+                except OSError:
+                    size = mtime_ns = -1
+                ids.append(db.execute(
+                    "INSERT INTO items(batch, src, target, mode, size, mtime_ns) VALUES (?, ?, ?, ?, ?, ?)",
+                    (batch_id, src, target, mode, size, mtime_ns)).lastrowid)
+        return cls(db, batch_id), ids
+
+    def advance(self, item_id, offset):
+        """Зміщення, до якого тимчасовий файл уже скинуто на диск."""
+        with self._lock, self._db:
+            self._db.execute("UPDATE items SET offset = ? WHERE id = ?", (offset, item_id))
+
+    def done(self, item_id):
+        with self._lock, self._db:
+            self._db.execute("UPDATE items SET done = 1 WHERE id = ?", (item_id,))
+
+    def done_many(self, item_ids):
+        """Кілька готових файлів однією транзакцією (пачки малих файлів)."""
+        if not item_ids:
+            return
+        with self._lock, self._db:
+            self._db.executemany("UPDATE items SET done = 1 WHERE id = ?", [(i,) for i in item_ids])
+
+    def failed(self, item_ids):
+        """
+        Файли, що не вдались не через перерву (немає доступу, не збіглась контрольна сума):
+        resume їх не повторює — помилку користувач уже бачив.
+        """
+        if not item_ids:
+            return
+        with self._lock, self._db:
+            self._db.executemany("UPDATE items SET done = -1 WHERE id = ?", [(i,) for i in item_ids])
+
+    def finish(self):
+        with self._lock, self._db:
+            self._db.execute("UPDATE batches SET finished = ? WHERE id = ?", (time.time(), self.batch_id))
+        self.close()
+
+    def close(self):
+        """Закрити, лишивши операцію незавершеною (для resume)."""
+        self._db.close()
+
+
+def pending():
+    """Незавершені операції: [{"id", "started", "src_folder", "options", "items": [...]}] (старі першими)."""
+    if not os.path.exists(JOURNAL_DB):
+        return []
+    db = _open()
+    try:
+        batches = []
+        for batch_id, started, src_folder, options in db.execute(
+                "SELECT id, started, src_folder, options FROM batches WHERE finished IS NULL ORDER BY id"
+        ).fetchall():
+            items = [dict(zip(("id", "src", "target", "mode", "size", "mtime_ns", "offset"), row))
+                     for row in db.execute("SELECT id, src, target, mode, size, mtime_ns, offset FROM items "
+                                           "WHERE batch = ? AND done = 0 ORDER BY id", (batch_id,))]
+            batches.append({"id": batch_id, "started": started, "src_folder": src_folder,
+                            "options": json.loads(options), "items": items})
+        return batches
+    finally:
+        db.close()
+
+
+def discard(batch_id):
+    """
+    Відмовитись від продовження: тимчасові файли видаляються, перервані оновлення дельтою на місці
+    відкочуються (delta.rollback), операція позначається завершеною.
+    """
+    from toolbox import delta
+    for batch in pending():
+        if batch["id"] == batch_id:
+            for item in batch["items"]:
+                _remove_quietly(copier.part_path(item["target"]))
+                if item["mode"] == "delta":
+                    delta.rollback(item["target"])
+            Journal(_open(), batch_id).finish()
+            return len(batch["items"])
+    raise ToolBoxError(f"Незавершеної операції #{batch_id} в журналі немає")
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _resume_offset(item):
+    """
+    З якого місця продовжувати: підтверджене журналом зміщення, якщо джерело не змінилось
+    (розмір і mtime) і останній підтверджений блок тимчасового файлу збігається з джерелом; інакше 0.
+    """
+    offset = item["offset"]
+    if not offset:
+        return 0
+    try:
+        st = os.stat(item["src"])
+        if (st.st_size, st.st_mtime_ns) != (item["size"], item["mtime_ns"]):
+            return 0
+        if os.path.getsize(copier.part_path(item["target"])) < offset:
+            return 0
+        block = min(offset, copier.CHUNK_SIZE)
+        with open(item["src"], "rb") as a, open(copier.part_path(item["target"]), "rb") as b:
+            a.seek(offset - block)
+            b.seek(offset - block)
+            if a.read(block) != b.read(block):
+                return 0
+    except OSError:
+        return 0
+    return offset
+
+
+def resume(batch_id=None, control=None, progress=None):
+    """
+    Продовжує незавершені операції (усі або batch_id): недописані файли дописуються з підтвердженого
+    зміщення (див. _resume_offset), файли без тимчасового — копіюються заново, заміни дельтою
+    повторюються (вже оновлені блоки лише порівнюються). Після кожної операції — запис в історію.
+    Файл, що знову не вдався, лишається для продовження, лише якщо залишився його тимчасовий файл
+    (перерва посеред запису); інакше він позначається невдалим (Journal.failed).
+    Повертає [{"id", "copied" — [(джерело, ціль)], "resumed_bytes" — не перекопійовано,
+    "errors" — [(джерело, текст)], "manifest" — {ціль: рядок маніфесту}, якщо операція з перевіркою}].
+    """
+    from toolbox import delta, engine, verify
+    batches = [b for b in pending() if batch_id is None or b["id"] == batch_id]
+    if batch_id is not None and not batches:
+        raise ToolBoxError(f"Незавершеної операції #{batch_id} в журналі немає")
+    reports = []
+    for batch in batches:
+        journal = Journal(_open(), batch["id"])
+        options = batch["options"]
+        algorithm = options.get("verify")
+        report = {"id": batch["id"], "copied": [], "resumed_bytes": 0, "errors": [], "manifest": {}}
+        interrupted = False
+        try:
+            for item in batch["items"]:
+                src, target = item["src"], item["target"]
+                try:
+                    if item["mode"] == "move" and not os.path.exists(src) and os.path.exists(target):
+                        journal.done(item["id"])  # переміщення встигло завершитись до збою
+                        report["copied"].append((src, target))
+                        continue
+                    checked = {}
+
+                    def check(part):
+                        """Тимчасовий файл до перейменування в target: час і перевірка вмісту."""
+                        if options.get("sync") or item["mode"] == "move":
+                            engine.copy_times(src, part)
+                        if algorithm or item["mode"] == "move":
+                            # Хеш джерела під час перерваного копіювання втрачено — порівнюємо файли повністю
+                            new = lambda: verify.new_hasher(algorithm or "blake2b")
+                            checked["digest"] = copier.hash_on_disk(part, new(), control=control).hexdigest()
+                            if copier.hash_file(src, new(), control=control).hexdigest() != checked["digest"]:
+                                raise OSError(f"Копія {target!r} не збігається з оригіналом; ціль не змінено")
+                    if item["mode"] == "delta":
+                        delta.delta_copy(src, target, control=control, progress=progress, check=check,
+                                         durable=True)
+                    else:
+                        if not os.path.exists(src):
+                            raise OSError(f"Джерело зникло: {src}")
+                        offset = _resume_offset(item)
+                        report["resumed_bytes"] += offset
+                        copier.copy_file(src, target, control=control, progress=progress, resume_offset=offset,
+                                         journal=lambda n, item_id=item["id"]: journal.advance(item_id, n),
+                                         check=check)
+                    if algorithm:
+                        st = os.stat(target)
+                        report["manifest"][target] = (target, st.st_size, st.st_mtime_ns, checked["digest"])
+                    if item["mode"] == "move":
+                        os.remove(src)
+                except OSError as e:
+                    report["errors"].append((src, str(e)))
+                    if os.path.exists(copier.part_path(target)):
+                        interrupted = True
+                    else:
+                        journal.failed([item["id"]])
+                    continue
+                journal.done(item["id"])
+                report["copied"].append((src, target))
+        except copier.TransferCancelled:
+            interrupted = True  # тимчасові файли лишаються — можна продовжити пізніше
+        if report["copied"]:
+            _record(batch, report, algorithm)
+        if interrupted or (control is not None and control.cancelled):
+            journal.close()
+        else:
+            journal.finish()
+        reports.append(report)
+        if control is not None and control.cancelled:
+            break
+    return reports
+
+
+def _record(batch, report, algorithm):
+    from toolbox import engine
+    by_dest = {}
+    for src, target in report["copied"]:
+        by_dest.setdefault(os.path.dirname(target), []).append((src, target))
+    for dest, pairs in by_dest.items():
+        details = {"resumed": batch["id"]}
+        if batch["options"].get("move"):
+            details["operation"] = "move"
+        if algorithm:
+            details.update(verified=algorithm, manifest=[report["manifest"][t] for _, t in pairs])
+        engine.add_to_history([src for src, _ in pairs], batch["src_folder"], dest, **details)
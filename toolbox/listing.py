@@ -0,0 +1,239 @@
+"""
+Кеш списків папок для обох панелей GUI: повторне відкриття папки — без читання диска.
+
+Актуальність підтримується inotify (toolbox/fswatch.py): зміни застосовуються до кешу одразу,
+без повторного читання папки. Де inotify недоступний (або вичерпано ліміт спостережень),
+папка перевіряється за mtime: при відкритті, а показана на екрані — фоновим потоком раз на
+POLL_INTERVAL секунд (тоді її перечитують у фоні й передають різницю).
+"""
+import os, stat, threading
+from collections import OrderedDict, deque
+
+from toolbox import fswatch
+from toolbox.engine import load_settings, scan_folder
+
+POLL_INTERVAL = 1.0
+MAX_CHANGES = 10000  # подій для показаних папок, що чекають на GUI; далі — повне перечитування
+
+
+class _Folder:
+    __slots__ = ("entries", "mtime_ns", "wd")
+
+    def __init__(self, entries, mtime_ns, wd):
+        self.entries = entries  # {ім'я: is_dir}
+        self.mtime_ns = mtime_ns
+        self.wd = wd            # None — inotify не стежить, перевіряємо mtime
+
+
+class ListingCache:
+    """
+    Списки папок [(ім'я, is_dir)], найдавніше відкриті витісняються, коли записів стає більше
+    за max_entries (settings.ini [listing] cache_entries).
+    Показані на екрані папки задаються set_live(); їхні зміни GUI забирає через poll_changes().
+    """
+    def __init__(self, max_entries=None):
+        if max_entries is None:
+            max_entries = load_settings().getint("listing", "cache_entries")
+        self.max_entries = max_entries
+        self._folders = OrderedDict()
+        self._by_wd = {}
+        self._total = 0
+        self._live = set()
+        self._changes = deque()
+        self._lock = threading.Lock()
+        try:
+            self._inotify = fswatch.Inotify()
+        except OSError:
+            self._inotify = None
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+        self._thread.start()
+
+    # --- Для GUI ---
+
+    def get(self, folder):
+        """Список з кешу або None (немає або папка змінилась без нашого відома)."""
+        folder = os.path.abspath(folder)
+        with self._lock:
+            cached = self._folders.get(folder)
+            if cached is None:
+                return None
+            if cached.wd is None and _mtime_ns(folder) != cached.mtime_ns:
+                self._drop(folder)
+                return None
+            self._folders.move_to_end(folder)
+            return list(cached.entries.items())
+
+    def scan(self, folder, chunk_size=None):
+        """
+        engine.scan_folder, що після повного читання кладе список у кеш (для StreamWorker).
+        Якщо папка змінилась під час читання, у кеш вона не потрапляє.
+        """
+        folder = os.path.abspath(folder)
+        mtime_ns = _mtime_ns(folder)
+        entries = []
+        kwargs = {"chunk_size": chunk_size} if chunk_size else {}
+        for chunk in scan_folder(folder, **kwargs):
+            entries.extend(chunk)
+            yield chunk
+        self._put(folder, dict(entries), mtime_ns)
+
+    def set_live(self, folders):
+        """Папки, показані зараз на екрані (їхні зміни потрапляють у poll_changes)."""
+        with self._lock:
+            self._live = {os.path.abspath(f) for f in folders if f}
+            self._changes = deque(c for c in self._changes if c[0] in self._live)
+
+    def poll_changes(self):
+        """
+        Зміни показаних папок від останнього виклику: [(папка, додані [(ім'я, is_dir)], видалені {імена})].
+        (папка, None, None) — змін забагато або їх втрачено: папку треба перечитати.
+        """
+        with self._lock:
+            changes, self._changes = list(self._changes), deque()
+        merged = OrderedDict()
+        for folder, added, removed in changes:
+            if added is None or merged.get(folder, ()) is None:
+                merged[folder] = None
+                continue
+            adds, removes = merged.setdefault(folder, ({}, set()))
+            for name in removed:
+                adds.pop(name, None)
+                removes.add(name)
+            for name, is_dir in added:
+                adds[name] = is_dir
+        return [(folder, None, None) if value is None else (folder, list(value[0].items()), value[1])
+                for folder, value in merged.items()]
+
+    # --- Внутрішнє ---
+
+    def _put(self, folder, entries, mtime_ns):
+        wd = None
+        if self._inotify is not None:
+            try:
+                wd = self._inotify.add_watch(folder)
+            except OSError:
+                pass  # ліміт спостережень або немає доступу — перевірятимемо mtime
+        if mtime_ns is None or _mtime_ns(folder) != mtime_ns:
+            with self._lock:
+                # Для папки, за якою вже стежимо, ядро повертає той самий wd — його не знімаємо
+                if wd is not None and wd not in self._by_wd:
+                    self._inotify.remove_watch(wd)
+            return  # змінилась під час читання
+        with self._lock:
+            self._drop(folder, keep_wd=wd)
+            self._folders[folder] = _Folder(entries, mtime_ns, wd)
+            self._total += len(entries)
+            if wd is not None:
+                self._by_wd[wd] = folder
+            while self._total > self.max_entries and len(self._folders) > 1:
+                oldest = next(iter(self._folders))
+                self._drop(oldest)
+
+    def _drop(self, folder, keep_wd=None):
+        """Прибирає папку з кешу; її спостереження знімається, якщо це не keep_wd (новий запис)."""
+        cached = self._folders.pop(folder, None)
+        if cached is None:
+            return
+        self._total -= len(cached.entries)
+        if cached.wd is not None:
+            self._by_wd.pop(cached.wd, None)
+            if cached.wd != keep_wd:
+                self._inotify.remove_watch(cached.wd)
+
+    def _queue(self, folder, added, removed):
+        if folder not in self._live:
+            return
+        if len(self._changes) >= MAX_CHANGES:
+            self._changes.clear()
+            added = removed = None
+        self._changes.append((folder, added, removed))
+
+    def _watch(self):
+        while True:
+            if self._inotify is not None:
+                events = self._inotify.read(POLL_INTERVAL)
+                if events:
+                    self._apply_events(events)
+            else:
+                threading.Event().wait(POLL_INTERVAL)
+            self._poll_unwatched()
+
+    def _apply_events(self, events):
+        # stat нових записів — поза блокуванням (мережеві диски)
+        resolved = []
+        for wd, mask, cookie, name in events:
+            folder = self._by_wd.get(wd)
+            is_dir = None
+            if folder is not None and mask & (fswatch.IN_CREATE | fswatch.IN_MOVED_TO):
+                is_dir = _entry_type(os.path.join(folder, name))
+            resolved.append((wd, mask, name, is_dir))
+        with self._lock:
+            for wd, mask, name, is_dir in resolved:
+                if mask & fswatch.IN_Q_OVERFLOW:
+                    for folder in list(self._folders):
+                        if self._folders[folder].wd is not None:
+                            self._drop(folder)
+                        self._queue(folder, None, None)
+                    continue
+                folder = self._by_wd.get(wd)
+                cached = self._folders.get(folder)
+                if cached is None:
+                    continue
+                if mask & (fswatch.IN_DELETE_SELF | fswatch.IN_MOVE_SELF | fswatch.IN_IGNORED):
+                    self._drop(folder)
+                    self._queue(folder, None, None)
+                elif mask & (fswatch.IN_DELETE | fswatch.IN_MOVED_FROM):
+                    if cached.entries.pop(name, None) is not None:
+                        self._total -= 1
+                        self._queue(folder, [], {name})
+                elif is_dir is not None:
+                    if name not in cached.entries:
+                        self._total += 1
+                    cached.entries[name] = is_dir
+                    self._queue(folder, [(name, is_dir)], {name})
+
+    def _poll_unwatched(self):
+        """Показані папки без inotify: якщо mtime змінився — перечитати у фоні і передати різницю."""
+        with self._lock:
+            folders = [(f, self._folders[f].mtime_ns) for f in self._live
+                       if f in self._folders and self._folders[f].wd is None]
+        for folder, mtime_ns in folders:
+            current = _mtime_ns(folder)
+            if current == mtime_ns:
+                continue
+            try:
+                entries = dict(e for chunk in scan_folder(folder) for e in chunk)
+            except OSError:
+                entries = None
+            with self._lock:
+                cached = self._folders.get(folder)
+                if cached is None or cached.mtime_ns != mtime_ns:
+                    continue
+                if entries is None:
+                    self._drop(folder)
+                    self._queue(folder, None, None)
+                    continue
+                added = [(n, d) for n, d in entries.items() if cached.entries.get(n) != d]
+                removed = {n for n in cached.entries if n not in entries}
+                self._total += len(entries) - len(cached.entries)
+                cached.entries, cached.mtime_ns = entries, current
+                if added or removed:
+                    self._queue(folder, added, removed)
+
+
+def _mtime_ns(folder):
+    try:
+        return os.stat(folder).st_mtime_ns
+    except OSError:
+        return None
+
+
+def _entry_type(path):
+    """True — папка, False — файл, None — зник або ні те, ні інше (як engine.scan_folder)."""
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return None
+    if stat.S_ISDIR(mode):
+        return True
+    return False if stat.S_ISREG(mode) else None
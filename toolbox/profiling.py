@@ -0,0 +1,137 @@
+"""
+Профілювання операцій на вимогу (settings.ini [profiling] або run --profiler): звіт зберігається
+в LOG_FOLDER/profiling, щоб побачити, де саме витрачається час повільної операції.
+
+    cprofile — точний облік викликів (cProfile) у викликаючому потоці і в кожному потоці копіювання
+               (toolbox/scheduler.py), зведений в один звіт: .prof (pstats, snakeviz) і .txt (топ функцій)
+    sample   — вибірковий: раз на interval_ms знімаються стеки всіх потоків (sys._current_frames);
+               майже не сповільнює операцію. .folded (для flamegraph.pl / speedscope) і .txt
+"""
+import cProfile, io, os, pstats, sys, threading, time
+from collections import Counter
+from contextlib import contextmanager
+from datetime import datetime
+
+from toolbox.engine import LOG_FOLDER, ToolBoxError, load_settings
+
+PROFILING_FOLDER = os.path.join(LOG_FOLDER, "profiling")
+MODES = ("cprofile", "sample")
+TOP_FUNCTIONS = 40
+
+_session = None  # активне профілювання cprofile: {"owner", "profiles", "lock"}
+
+
+def configured_mode(mode=None):
+    """Режим з settings.ini [profiling] mode (off — None); mode — примусово."""
+    if mode is None:
+        mode = load_settings().get("profiling", "mode")
+    if mode in ("", "off", "no"):
+        return None
+    if mode not in MODES:
+        raise ToolBoxError(f"Невідомий режим профілювання: {mode}")
+    return mode
+
+
+def profile_call(mode, label, func, *args, **kwargs):
+    """
+    Виконує func(*args, **kwargs) під профайлером mode і зберігає звіт.
+    Повертає (результат func, шлях до звіту .txt). Звіт пишеться й тоді, коли func кинула виняток.
+    """
+    os.makedirs(PROFILING_FOLDER, exist_ok=True)
+    base = os.path.join(PROFILING_FOLDER, f"{datetime.now().strftime('%Y%m%d-%H%M%S')}-{label}-{mode}")
+    run = _run_cprofile if mode == "cprofile" else _run_sampled
+    return run(base, func, args, kwargs), base + ".txt"
+
+
+@contextmanager
+def thread_profile():
+    """Для потоків копіювання: якщо йде профілювання cprofile, потік профілюється окремо і додається до звіту."""
+    session = _session
+    if session is None or session["owner"] == threading.get_ident():
+        yield
+        return
+    profile = cProfile.Profile()
+    profile.enable()
+    try:
+        yield
+    finally:
+        profile.disable()
+        with session["lock"]:
+            session["profiles"].append(profile)
+
+
+def _run_cprofile(base, func, args, kwargs):
+    global _session
+    if _session is not None:
+        raise ToolBoxError("Профілювання вже виконується")
+    _session = {"owner": threading.get_ident(), "profiles": [], "lock": threading.Lock()}
+    main = cProfile.Profile()
+    started = time.perf_counter()
+    main.enable()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        main.disable()
+        session, _session = _session, None
+        stats = pstats.Stats(main)
+        for profile in session["profiles"]:
+            stats.add(profile)
+        stats.dump_stats(base + ".prof")
+        text = io.StringIO()
+        stats.stream = text
+        stats.sort_stats("cumulative").print_stats(TOP_FUNCTIONS)
+        with open(base + ".txt", "w", encoding="utf-8") as f:
+            f.write(f"cProfile: {time.perf_counter() - started:.2f} с, потоків {1 + len(session['profiles'])}\n")
+            f.write(text.getvalue())
+
+
+def _run_sampled(base, func, args, kwargs):
+    interval = load_settings().getfloat("profiling", "interval_ms") / 1000
+    stacks = Counter()
+    stop = threading.Event()
+    samples = [0]
+
+    def sample():
+        me = threading.get_ident()
+        while not stop.wait(interval):
+            samples[0] += 1
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                calls = []
+                while frame is not None:
+                    code = frame.f_code
+                    calls.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                stacks[(names.get(ident, str(ident)),) + tuple(reversed(calls))] += 1
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    started = time.perf_counter()
+    sampler.start()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        stop.set()
+        sampler.join()
+        _write_samples(base, stacks, samples[0], interval, time.perf_counter() - started)
+
+
+def _write_samples(base, stacks, samples, interval, seconds):
+    with open(base + ".folded", "w", encoding="utf-8") as f:
+        for stack, count in stacks.most_common():
+            f.write(";".join(part.replace(";", ",") for part in stack) + f" {count}\n")
+    own, total = Counter(), Counter()
+    for stack, count in stacks.items():
+        own[stack[-1]] += count
+        for call in set(stack[1:]):
+            total[call] += count
+    with open(base + ".txt", "w", encoding="utf-8") as f:
+        f.write(f"Вибірка: {seconds:.2f} с, {samples} знімків по {interval * 1000:.0f} мс "
+                f"(частка — від знімків усіх потоків разом)\n\n")
+        all_samples = sum(stacks.values()) or 1
+        for title, counter in (("Найбільше власного часу", own), ("Найбільше часу разом з викликаними", total)):
+            f.write(f"{title}:\n")
+            for call, count in counter.most_common(TOP_FUNCTIONS):
+                f.write(f"{100 * count / all_samples:6.1f}%  {call}\n")
+            f.write("\n")
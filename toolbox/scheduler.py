@@ -0,0 +1,244 @@
+"""
+Паралельне виконання копіювань з обмеженням на кожен пристрій.
+
+Кожне завдання навантажує пристрої своїх шляхів (джерело і папка призначення, за st_dev).
+Одночасно на пристрої виконується не більше завдань, ніж його ліміт:
+    ssd   — SSD/NVMe (у /sys/dev/block/.../queue/rotational нуль)
+    hdd   — диски, що обертаються: паралельні потоки лише ганяли б головку
+    other — решта (мережеві, tmpfs, не Linux) — невідомо, тому помірно
+Ліміти і загальна кількість потоків — settings.ini [parallel]; overrides задає ліміт для конкретних
+папок (найдовший збіг префікса), напр. "overrides = /mnt/nas=4; /media/usb=1".
+
+Малі файли (run_batches) копіюються пачками по BATCH_SIZE у власній кількості потоків: для них
+час іде на затримки відкриття і запису, а не на пропускну здатність диска, і паралельні запити
+ці затримки перекривають (особливо на мережевих дисках). Але й тут потоків не більше за ліміт
+пристроїв — на диску, що обертається, паралельні пачки так само ганяли б головку.
+
+Потоки копіювання можуть працювати з нижчим пріоритетом диска (PRIORITIES, Linux ioprio_set):
+    normal — як у решти програм
+    low    — найнижчий рівень звичайного класу (best-effort 7)
+    idle   — диск лише тоді, коли ним більше ніхто не користується (планувальники bfq/cfq)
+"""
+import ctypes, ctypes.util, os, platform, sys, threading
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+
+from toolbox import profiling
+from toolbox.copier import TransferCancelled
+from toolbox.engine import load_settings
+
+
+BATCH_SIZE = 64  # малих файлів в одному завданні run_batches
+PRIORITIES = ("normal", "low", "idle")
+_IOPRIO_VALUES = {"low": 2 << 13 | 7, "idle": 3 << 13}  # клас << IOPRIO_CLASS_SHIFT | рівень
+_IOPRIO_WHO_PROCESS = 1  # з who=0 — поточний потік
+_IOPRIO_SYSCALLS = {"x86_64": (251, 252), "aarch64": (30, 31), "i686": (289, 290), "i386": (289, 290),
+                    "armv7l": (314, 315)}  # (ioprio_set, ioprio_get)
+_libc = None
+
+
+def device_kind(dev):
+    """"ssd", "hdd" або "other" для st_dev (Linux — за /sys/dev/block)."""
+    if not sys.platform.startswith("linux"):
+        return "other"
+    base = f"/sys/dev/block/{os.major(dev)}:{os.minor(dev)}"
+    for queue in (os.path.join(base, "queue"), os.path.join(base, "..", "queue")):  # розділ -> диск
+        try:
+            with open(os.path.join(queue, "rotational")) as f:
+                return "hdd" if f.read().strip() == "1" else "ssd"
+        except OSError:
+            continue
+    return "other"
+
+
+class DeviceLimits:
+    """Визначає пристрій шляху і його ліміт паралельності (з кешем за st_dev)."""
+    def __init__(self, settings=None):
+        if settings is None:
+            settings = load_settings()
+        self.workers = max(1, settings.getint("parallel", "workers"))
+        self.kind_limits = {kind: max(1, settings.getint("parallel", kind)) for kind in ("ssd", "hdd", "other")}
+        self.overrides = []
+        for part in settings.get("parallel", "overrides").split(";"):
+            if "=" in part:
+                path, limit = part.rsplit("=", 1)
+                self.overrides.append((os.path.normcase(os.path.abspath(path.strip())), max(1, int(limit))))
+        self.overrides.sort(key=lambda o: len(o[0]), reverse=True)
+        self._by_dev = {}
+
+    def device(self, path):
+        """(ключ пристрою, ліміт) для шляху."""
+        try:
+            dev = os.stat(path).st_dev
+        except OSError:
+            dev = None
+        full = os.path.normcase(os.path.abspath(path))
+        for prefix, limit in self.overrides:
+            if full == prefix or full.startswith(prefix.rstrip(os.sep) + os.sep):
+                return (prefix, dev), limit
+        if dev not in self._by_dev:
+            self._by_dev[dev] = self.kind_limits[device_kind(dev) if dev is not None else "other"]
+        return dev, self._by_dev[dev]
+
+
+def _ioprio():
+    global _libc
+    if _libc is None:
+        _libc = False
+        if sys.platform.startswith("linux") and platform.machine() in _IOPRIO_SYSCALLS:
+            try:
+                _libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            except OSError:
+                pass
+    return _libc, _IOPRIO_SYSCALLS.get(platform.machine(), (None, None))
+
+
+@contextmanager
+def io_priority(priority):
+    """
+    Поточний потік читає і пише з пріоритетом priority (один із PRIORITIES), потім попередній
+    повертається. Де ioprio недоступний (не Linux, інша архітектура, заборонено) — нічого не робить.
+    """
+    value = _IOPRIO_VALUES.get(priority)
+    libc, (set_nr, get_nr) = _ioprio() if value is not None else (None, (None, None))
+    changed = False
+    if libc:
+        old = libc.syscall(get_nr, _IOPRIO_WHO_PROCESS, 0)
+        changed = old >= 0 and libc.syscall(set_nr, _IOPRIO_WHO_PROCESS, 0, value) == 0
+    try:
+        yield
+    finally:
+        if changed:
+            libc.syscall(set_nr, _IOPRIO_WHO_PROCESS, 0, old)
+
+
+def run(jobs, control=None, limits=None, priority=None):
+    """
+    Виконує jobs — [(функція без аргументів, [шляхи, чиї пристрої вона навантажує])] — паралельно
+    в межах лімітів пристроїв, у порядку списку, наскільки дозволяють ліміти.
+    priority — пріоритет диска для потоків, що виконують завдання (PRIORITIES; None — не змінювати).
+    Повертає [(результат, OSError або None)] у порядку jobs; для завдань, що не почались або
+    перервані скасуванням (TransferCancelled), — (None, None). Інші винятки кидаються після зупинки потоків.
+    """
+    if limits is None:
+        limits = DeviceLimits()
+    outcomes = [(None, None)] * len(jobs)
+    # Черги завдань за набором пристроїв: обирається найраніше завдання, чиї пристрої мають вільне місце
+    queues = OrderedDict()
+    job_limits = {}
+    for i, (func, paths) in enumerate(jobs):
+        devices = {}
+        for path in paths:
+            key, limit = limits.device(path)
+            devices[key] = limit
+        group = tuple(sorted(devices.items(), key=repr))
+        job_limits[group] = devices
+        queues.setdefault(group, deque()).append(i)
+    busy = {}
+    lock = threading.Condition()
+    state = {"remaining": len(jobs), "error": None}
+
+    def take():
+        best = None
+        for group, queue in queues.items():
+            if queue and all(busy.get(k, 0) < limit for k, limit in job_limits[group].items()):
+                if best is None or queue[0] < queues[best][0]:
+                    best = group
+        if best is None:
+            return None, None
+        return best, queues[best].popleft()
+
+    def worker():
+        with io_priority(priority), profiling.thread_profile():
+            work()
+
+    def work():
+        while True:
+            with lock:
+                while True:
+                    if state["error"] is not None or state["remaining"] == 0 or (
+                            control is not None and control.cancelled):
+                        lock.notify_all()
+                        return
+                    group, i = take()
+                    if i is not None:
+                        break
+                    lock.wait()
+                state["remaining"] -= 1
+                for k in job_limits[group]:
+                    busy[k] = busy.get(k, 0) + 1
+            try:
+                outcomes[i] = (jobs[i][0](), None)
+            except OSError as e:
+                outcomes[i] = (None, e)
+            except TransferCancelled:
+                pass  # control.cancelled уже встановлено — нові завдання не беруться
+            except BaseException as e:
+                with lock:
+                    if state["error"] is None:
+                        state["error"] = e
+            finally:
+                with lock:
+                    for k in job_limits[group]:
+                        busy[k] -= 1
+                    lock.notify_all()
+
+    count = min(limits.workers, len(jobs))
+    if count <= 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    if state["error"] is not None:
+        raise state["error"]
+    return outcomes
+
+
+def run_batches(items, func, workers, control=None, priority=None, limits=None, paths=()):
+    """
+    Викликає func(пачка) для пачок items по BATCH_SIZE у workers потоках, по черзі, наскільки встигають
+    потоки. Потоків не більше за найменший ліміт пристроїв шляхів paths (limits — як у run()).
+    Помилки окремих елементів func обробляє сама; після скасування (TransferCancelled) нові
+    пачки не беруться, інші винятки кидаються після зупинки потоків. priority — як у run().
+    """
+    if limits is None:
+        limits = DeviceLimits()
+    for path in paths:
+        workers = min(workers, limits.device(path)[1])
+    batches = iter([items[i:i + BATCH_SIZE] for i in range(0, len(items), BATCH_SIZE)])
+    lock = threading.Lock()
+    state = {"error": None}
+
+    def worker():
+        with io_priority(priority), profiling.thread_profile():
+            while True:
+                with lock:
+                    if state["error"] is not None or (control is not None and control.cancelled):
+                        return
+                    batch = next(batches, None)
+                if batch is None:
+                    return
+                try:
+                    func(batch)
+                except TransferCancelled:
+                    return
+                except BaseException as e:
+                    with lock:
+                        if state["error"] is None:
+                            state["error"] = e
+                    return
+
+    count = min(workers, -(-len(items) // BATCH_SIZE))
+    if count <= 1:
+        worker()
+    else:
+        threads = [threading.Thread(target=worker, daemon=True) for _ in range(count)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    if state["error"] is not None:
+        raise state["error"]
@@ -0,0 +1,134 @@
+"""
+Рекурсивний пошук файлів з фільтрами: ім'я (шаблон або регулярний вираз), розширення, розмір, час зміни.
+
+Папки обходяться паралельно кількома потоками (стільки, скільки дозволяє ліміт диска з
+settings.ini [parallel], див. toolbox/scheduler.py), результати видаються порціями по мірі
+знаходження — GUI показує їх, не чекаючи кінця обходу. Символьні посилання на папки не
+обходяться (щоб не зациклитись).
+"""
+import fnmatch, os, queue, re, threading, time
+
+SEARCH_CHUNK_SIZE = 500
+IDLE_SECONDS = 0.2  # як часто видавати порцію (можливо порожню), поки нових збігів немає
+_DONE = object()
+
+
+def make_matcher(pattern=None, regex=False, extensions=None, min_size=None, max_size=None,
+                 modified_within_days=None):
+    """
+    Функція DirEntry -> bool для файлів. pattern без * і ? шукається як частина імені;
+    regex=True — pattern є регулярним виразом (re.search). Регістр не враховується.
+    extensions — ["pdf", ".docx"]; розміри в байтах; modified_within_days — змінені за останні N днів.
+    """
+    name_match = None
+    if pattern:
+        if regex:
+            name_match = re.compile(pattern, re.IGNORECASE).search
+        else:
+            if not any(c in pattern for c in "*?["):
+                pattern = f"*{pattern}*"
+            name_match = re.compile(fnmatch.translate(pattern), re.IGNORECASE).match
+    suffixes = tuple("." + e.strip().lower().lstrip(".") for e in extensions or [] if e.strip())
+    newer_than = time.time() - modified_within_days * 86400 if modified_within_days is not None else None
+    need_stat = min_size is not None or max_size is not None or newer_than is not None
+
+    def match(entry):
+        if name_match is not None and not name_match(entry.name):
+            return False
+        if suffixes and not entry.name.lower().endswith(suffixes):
+            return False
+        if need_stat:
+            st = entry.stat()
+            if min_size is not None and st.st_size < min_size:
+                return False
+            if max_size is not None and st.st_size > max_size:
+                return False
+            if newer_than is not None and st.st_mtime < newer_than:
+                return False
+        return True
+    return match
+
+
+def search(root, matcher, workers=None, chunk_size=SEARCH_CHUNK_SIZE):
+    """
+    Генератор порцій [(шлях відносно root, False)] — файлів під root, для яких matcher(DirEntry) істинний.
+    Поки нових збігів немає, раз на IDLE_SECONDS видається порожня порція (щоб споживач міг зупинитись).
+    Закриття генератора (або вихід з циклу) зупиняє всі потоки обходу.
+    Папки без доступу тихо пропускаються.
+    """
+    if workers is None:
+        from toolbox.scheduler import DeviceLimits
+        workers = DeviceLimits().device(root)[1]
+    root = os.path.abspath(root)
+    prefix = len(root.rstrip(os.sep)) + 1
+    dirs = queue.Queue()
+    found = queue.Queue(maxsize=64)  # обмежено: якщо споживач не встигає, обхід чекає
+    stop = threading.Event()
+    lock = threading.Lock()
+    pending = [1]  # папки в черзі або в обробці
+
+    def put(batch):
+        while not stop.is_set():
+            try:
+                found.put(batch, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def walk():
+        while not stop.is_set():
+            folder = dirs.get()
+            if folder is None:
+                return
+            batch = []
+            try:
+                with os.scandir(folder) as entries:
+                    for entry in entries:
+                        if stop.is_set():
+                            break
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                with lock:
+                                    pending[0] += 1
+                                dirs.put(entry.path)
+                            elif entry.is_file() and matcher(entry):
+                                batch.append((entry.path[prefix:], False))
+                        except OSError:
+                            continue
+            except OSError:
+                pass
+            if batch:
+                put(batch)
+            with lock:
+                pending[0] -= 1
+                finished = pending[0] == 0
+            if finished:
+                for _ in range(workers):
+                    dirs.put(None)
+                put(_DONE)
+
+    dirs.put(root)
+    threads = [threading.Thread(target=walk, daemon=True) for _ in range(max(1, workers))]
+    for t in threads:
+        t.start()
+    try:
+        chunk = []
+        while True:
+            try:
+                batch = found.get(timeout=IDLE_SECONDS)
+            except queue.Empty:
+                yield chunk
+                chunk = []
+                continue
+            if batch is _DONE:
+                break
+            chunk.extend(batch)
+            if len(chunk) >= chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+    finally:
+        stop.set()
+        for _ in threads:
+            dirs.put(None)
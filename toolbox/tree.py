@@ -0,0 +1,198 @@
+"""
+Рекурсивне копіювання папок потоком: обхід і копіювання йдуть одночасно.
+
+Обхід (у викликаючому потоці) читає папку за папкою через os.scandir, створює в цілі всі її
+підпапки одним проходом і кладе файли в обмежену чергу (QUEUE_SIZE); потоки копіювання беруть їх
+звідти. Копіювання починається з першою прочитаною папкою, а в пам'яті — лише черга і стек ще
+не обійдених папок, тож дерево з мільйонами файлів не складається в список.
+
+Відносна структура зберігається; посилання на папки не обходяться (щоб не зациклитись),
+посилання на файли копіюються як файли. Що робити з кожним файлом (копія, переміщення,
+перевірка), вирішує викликач — engine.run_operation передає свою функцію execute.
+Переміщення в межах одного диска, коли цілі ще немає, — одне перейменування всієї папки (move_tree).
+"""
+import errno, os, queue, threading
+
+from toolbox import profiling, scheduler
+from toolbox.copier import TransferCancelled
+
+QUEUE_SIZE = 1000  # файлів, що чекають копіювання
+PUT_TIMEOUT = 0.2  # як часто обхід і потоки, що чекають на черзі, перевіряють скасування
+
+
+def copy_tree(src, target, execute, control=None, merge=False, skip=None, on_found=None,
+              limits=None, priority=None, keep_dirs=False):
+    """
+    Копіює вміст папки src у папку target (створюється; merge=True — може вже існувати, тоді
+    однойменні файли замінюються). execute(джерело, ціль, st) копіює один файл і повертає словник
+    як copier.copy_file; st — stat джерела, вже прочитаний обходом. skip(джерело, ціль) — для файлів,
+    що вже є в цілі: True — пропустити як незмінений (синхронізація). on_found(n) отримує розмір
+    кожного знайденого файлу — для загального прогресу, поки обхід ще триває. Кількість потоків — як дозволяють ліміти пристроїв
+    src і target (scheduler.DeviceLimits), priority — пріоритет диска потоків копіювання.
+    Повертає {"src", "target", "files", "dirs" — створені папки, "bytes", "methods", "manifest",
+    "unchanged", "unchanged_bytes", "errors" — [(шлях, текст)], "cancelled"}; keep_dirs=True — ще й
+    "walked", усі папки джерела (для переміщення: remove_empty_dirs). Після скасування (control)
+    звіт повертається так само — вже скопійовані файли лишаються і враховані в ньому.
+    """
+    if limits is None:
+        limits = scheduler.DeviceLimits()
+    report = {"src": src, "target": target, "files": 0, "dirs": 0, "bytes": 0, "methods": {},
+              "manifest": [], "unchanged": 0, "unchanged_bytes": 0, "errors": [], "cancelled": False}
+    if keep_dirs:
+        report["walked"] = []
+    try:
+        os.makedirs(target, exist_ok=merge)
+    except OSError as e:
+        report["errors"].append((target, str(e)))
+        return report
+    pending = queue.Queue(QUEUE_SIZE)
+    lock = threading.Lock()
+    state = {"error": None}
+    stopped = threading.Event()  # потоки копіювання завершились — обхід далі не чекає
+
+    def cancelled():
+        return stopped.is_set() or (control is not None and control.cancelled)
+
+    def put(job):
+        while not cancelled():
+            try:
+                pending.put(job, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def worker():
+        with scheduler.io_priority(priority), profiling.thread_profile():
+            work()
+
+    def work():
+        while not cancelled():
+            try:
+                job = pending.get(timeout=PUT_TIMEOUT)
+            except queue.Empty:
+                continue
+            if job is None:
+                return
+            path, dest, st, exists = job
+            try:
+                if exists and skip is not None and skip(path, dest):
+                    with lock:
+                        report["unchanged"] += 1
+                        report["unchanged_bytes"] += st.st_size
+                    continue
+                stats = execute(path, dest, st)
+            except OSError as e:
+                with lock:
+                    report["errors"].append((path, str(e)))
+                continue
+            except TransferCancelled:
+                stopped.set()
+                return
+            except BaseException as e:
+                with lock:
+                    if state["error"] is None:
+                        state["error"] = e
+                stopped.set()
+                return
+            with lock:
+                report["files"] += 1
+                report["bytes"] += stats["bytes"]
+                report["methods"][stats["method"]] = report["methods"].get(stats["method"], 0) + 1
+                if "manifest" in stats:
+                    report["manifest"].append(stats["manifest"])
+
+    _, limit_src = limits.device(src)
+    _, limit_dest = limits.device(target)
+    threads = [threading.Thread(target=worker, daemon=True)
+               for _ in range(min(limits.workers, limit_src, limit_dest))]
+    for t in threads:
+        t.start()
+    try:
+        _walk(src, target, merge, report, put, cancelled, on_found)
+    finally:
+        for _ in threads:
+            if not put(None):
+                stopped.set()  # скасовано: черга вже нікому не потрібна
+                break
+        for t in threads:
+            t.join()
+    if state["error"] is not None:
+        raise state["error"]
+    report["cancelled"] = control is not None and control.cancelled
+    return report
+
+
+def move_tree(src, target):
+    """
+    Переміщує папку src у target (ще не існує) одним os.rename — миттєво, скільки б файлів не було.
+    Повертає звіт як copy_tree (files і dirs — кількість у переміщеній папці, дані не читаються;
+    methods — {"rename": files}) або None, якщо це інший диск (EXDEV) — тоді потрібен copy_tree.
+    """
+    report = {"src": src, "target": target, "files": 0, "dirs": 0, "bytes": 0, "methods": {},
+              "manifest": [], "unchanged": 0, "unchanged_bytes": 0, "errors": [], "cancelled": False}
+    try:
+        os.rename(src, target)
+    except OSError as e:
+        if e.errno == errno.EXDEV:
+            return None
+        report["errors"].append((src, str(e)))
+        return report
+    stack = [target]
+    while stack:  # лише для звіту: читаються записи папок, без stat файлів
+        try:
+            with os.scandir(stack.pop()) as it:
+                for entry in it:
+                    if entry.is_dir(follow_symlinks=False):
+                        report["dirs"] += 1
+                        stack.append(entry.path)
+                    else:
+                        report["files"] += 1
+        except OSError:
+            continue
+    report["methods"]["rename"] = report["files"]
+    return report
+
+
+def _walk(src, target, merge, report, put, cancelled, on_found):
+    """Обхід у глибину: для кожної папки — одне читання, підпапки в цілі разом, файли в чергу."""
+    stack = [(src, target, merge)]
+    while stack and not cancelled():
+        folder, dest, existing_dest = stack.pop()
+        if "walked" in report:
+            report["walked"].append(folder)
+        try:
+            with os.scandir(folder) as it:
+                entries = list(it)
+            # Ціль, що вже існувала, читається теж одним разом — замість перевірки кожного файлу
+            existing = set(os.listdir(dest)) if existing_dest else ()
+        except OSError as e:
+            report["errors"].append((folder, str(e)))
+            continue
+        files = []
+        for entry in entries:
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    sub = os.path.join(dest, entry.name)
+                    if entry.name not in existing:
+                        os.mkdir(sub)
+                        report["dirs"] += 1
+                    stack.append((entry.path, sub, entry.name in existing))
+                elif entry.is_file():
+                    files.append((entry, entry.stat()))
+            except OSError as e:
+                report["errors"].append((entry.path, str(e)))
+        for entry, st in files:
+            if on_found is not None:
+                on_found(st.st_size)
+            if not put((entry.path, os.path.join(dest, entry.name), st, entry.name in existing)):
+                return
+
+
+def remove_empty_dirs(report):
+    """Після переміщення: прибирає папки джерела, що лишились порожніми (від найглибших)."""
+    for folder in reversed(report["walked"]):
+        try:
+            os.rmdir(folder)
+        except OSError:
+            pass
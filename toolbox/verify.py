@@ -0,0 +1,69 @@
+"""
+Перевірка копій контрольними сумами і маніфести операцій.
+
+Хеш рахується над байтами, що проходять через цикл копіювання (copier.copy_file(hasher=...)),
+тож оригінал удруге не читається. Потім ціль скидається на диск і читається знову в обхід кешу
+сторінок (copier.hash_on_disk) — порівнюється те, що справді записано.
+
+    blake2b — hashlib, доступний завжди
+    xxh3    — пакет xxhash (pip install xxhash), у кілька разів швидший; не криптографічний
+
+Маніфест операції — рядки (ціль, розмір, mtime, хеш) у history.db поруч із записом історії
+(toolbox/history.py). verify_operation() перечитує лише цілі й порівнює з маніфестом.
+"""
+import hashlib
+
+from toolbox import copier
+from toolbox.engine import ToolBoxError, load_settings
+
+ALGORITHMS = ("blake2b", "xxh3")
+
+
+def new_hasher(algorithm):
+    """Новий об'єкт хешу для алгоритму з ALGORITHMS."""
+    if algorithm == "blake2b":
+        return hashlib.blake2b(digest_size=32)
+    if algorithm == "xxh3":
+        try:
+            import xxhash
+        except ImportError:
+            raise ToolBoxError("Для xxh3 потрібен пакет xxhash (pip install xxhash)") from None
+        return xxhash.xxh3_128()
+    raise ToolBoxError(f"Невідомий алгоритм контрольної суми: {algorithm}")
+
+
+def configured_algorithm(enabled=None):
+    """Алгоритм перевірки з settings.ini [verify] або None, якщо перевірку вимкнено (enabled — примусово)."""
+    settings = load_settings()
+    if enabled is None:
+        enabled = settings.getboolean("verify", "enabled")
+    if not enabled:
+        return None
+    algorithm = settings.get("verify", "algorithm")
+    new_hasher(algorithm)  # помилка конфігурації — до початку копіювання
+    return algorithm
+
+
+def verify_operation(op_id, control=None, progress=None):
+    """
+    Перевіряє, що цілі операції op_id і досі містять те, що записано в її маніфесті.
+    progress(n) — прочитані байти. Повертає {"algorithm", "ok", "changed", "missing"} — списки шляхів
+    (changed — інший вміст). ToolBoxError, якщо операції немає або вона без маніфесту.
+    """
+    from toolbox import history
+    entry = history.get(op_id)
+    if entry is None:
+        raise ToolBoxError(f"Операції #{op_id} немає в історії")
+    manifest = history.manifest(op_id)
+    if not manifest:
+        raise ToolBoxError(f"Операцію #{op_id} виконано без перевірки — маніфесту немає")
+    algorithm = entry.get("verified")
+    report = {"algorithm": algorithm, "ok": [], "changed": [], "missing": []}
+    for path, size, mtime_ns, digest in manifest:
+        try:
+            actual = copier.hash_on_disk(path, new_hasher(algorithm), control=control, progress=progress)
+        except FileNotFoundError:
+            report["missing"].append(path)
+            continue
+        report["ok" if actual.hexdigest() == digest else "changed"].append(path)
+    return report
@@ -0,0 +1,223 @@
+"""
+Режим стеження: профіль виконується сам, щойно в його папці src з'являються нові файли.
+
+Події беруться з inotify (toolbox/fswatch.py), і на кожну перевіряється лише названий у ній файл.
+Без inotify раз на poll_seconds порівнюється час зміни папки; папка перечитується лише тоді, коли він
+змінився, і в очікування потрапляють лише файли, змінені (mtime або ctime) після попереднього читання.
+Файл вважається дописаним, коли його закрито після запису (inotify; інакше — хвилина без змін),
+settle_seconds не було змін і розмір та mtime лишились тими самими. Дописані файли збираються в пакет — поки інші ще пишуться,
+але не довше batch_seconds — і передаються одним run_operation у режимі синхронізації: уже передані
+й незмінені файли пропускаються. Тому імена переданих файлів не запам'ятовуються. У пам'яті тримаються
+лише файли, що очікують (не більше max_pending); решта підхоплюється повторним читанням папки.
+
+Стежиться лише сама папка src, без підпапок; приховані й тимчасові файли (settings.ini [watch] ignore)
+пропускаються. Якщо папка зникла (відмонтовано мережевий диск), стеження чекає, поки вона з'явиться.
+"""
+import fnmatch, os, time
+
+from toolbox import fswatch
+from toolbox.engine import ProfileError, load_profiles, load_settings, profile_dests, run_operation
+
+TICK_SECONDS = 1.0  # як часто перевіряти файли, що очікують, і скасування
+MAX_BATCH = 1000    # більший пакет передається, не чекаючи файлів, що ще пишуться
+# Файл, не закритий після запису (або створений без запису — посилання), вважається дописаним,
+# якщо стільки секунд у нього нічого не змінювалось
+OPEN_SILENCE_SECONDS = 60
+
+# Створення, запис, закриття після запису, перенесення в папку; зникнення самої папки
+FILE_EVENTS = (fswatch.IN_CREATE | fswatch.IN_MODIFY | fswatch.IN_ATTRIB | fswatch.IN_CLOSE_WRITE |
+               fswatch.IN_MOVED_TO | fswatch.IN_DELETE_SELF | fswatch.IN_MOVE_SELF)
+
+
+class FolderWatcher:
+    """
+    Файли однієї папки, що з'являються чи змінюються. wait() повертає ті, що вже дописані
+    (кожен один раз, доки не зміниться знову). Використовує inotify, якщо він є, інакше — опитування.
+    """
+    def __init__(self, folder, settle_seconds=2, poll_seconds=5, max_pending=10000, ignore=()):
+        self.folder = folder
+        self.settle_seconds = settle_seconds
+        self.poll_seconds = poll_seconds
+        self.max_pending = max_pending
+        self.ignore = [p for p in ignore if p]
+        self._pending = {}      # ім'я -> [розмір, mtime_ns, коли змінився, чи відкритий на запис]
+        self._rescan = True     # прочитати папку (на старті, після переповнення, після повернення папки)
+        self._since = None      # час попереднього читання папки (ns); None — брати всі файли
+        self._recent = {}       # ім'я -> (розмір, mtime_ns, ctime_ns) виданих після _since — не брати вдруге
+        self._inotify = None
+        self._wd = None
+        self._dir_mtime = None
+        self._polled = 0.0
+        if fswatch.available():
+            try:
+                self._inotify = fswatch.Inotify()
+            except OSError:
+                self._inotify = None  # напр. вичерпано max_user_instances — опитуємо
+        self._add_watch()
+
+    @property
+    def busy(self):
+        """Чи є файли, які ще пишуться (або ще не відстоялись)."""
+        return bool(self._pending)
+
+    def wait(self, timeout=TICK_SECONDS):
+        """Чекає змін не довше timeout секунд. Повертає шляхи дописаних файлів."""
+        if self._inotify is not None and self._wd is not None:
+            for wd, mask, cookie, name in self._inotify.read(timeout):
+                if mask & fswatch.IN_Q_OVERFLOW:
+                    self._rescan = True
+                elif mask & (fswatch.IN_DELETE_SELF | fswatch.IN_MOVE_SELF | fswatch.IN_IGNORED):
+                    if self._wd is not None:
+                        self._inotify.remove_watch(self._wd)
+                        self._wd = None
+                elif name and not mask & fswatch.IN_ISDIR:
+                    if mask & (fswatch.IN_CLOSE_WRITE | fswatch.IN_MOVED_TO):
+                        opened = False
+                    elif mask & (fswatch.IN_CREATE | fswatch.IN_MODIFY):
+                        opened = True
+                    else:
+                        opened = None  # атрибути: стан запису не змінився
+                    self._note(name, opened=opened)
+        else:
+            time.sleep(timeout)
+            if self._wd is None and self._inotify is not None:
+                self._add_watch()
+            elif time.monotonic() - self._polled >= self.poll_seconds:
+                self._polled = time.monotonic()
+                try:
+                    mtime = os.stat(self.folder).st_mtime_ns
+                except OSError:
+                    mtime = None  # папка недоступна — чекаємо
+                if mtime is not None and mtime != self._dir_mtime:
+                    self._dir_mtime = mtime
+                    self._rescan = True
+        if self._rescan:
+            self._scan()
+        return self._settled()
+
+    def close(self):
+        if self._inotify is not None:
+            self._inotify.close()
+            self._inotify = None
+
+    def _add_watch(self):
+        if self._inotify is None:
+            return
+        try:
+            self._wd = self._inotify.add_watch(self.folder, FILE_EVENTS)
+        except OSError:
+            self._wd = None  # папки поки немає — спробуємо ще на наступному кроці
+        else:
+            self._rescan = True  # що з'явилось, поки спостереження не було
+
+    def _ignored(self, name):
+        return any(fnmatch.fnmatch(name, p) for p in self.ignore)
+
+    def _note(self, name, opened=False, st=None):
+        if self._ignored(name):
+            return
+        entry = self._pending.get(name)
+        if entry is None:
+            if len(self._pending) >= self.max_pending:
+                self._rescan = True  # решту підхопить читання папки, коли черга звільниться
+                return
+            self._pending[name] = entry = [-1, -1, 0.0, False]
+        if st is not None:
+            entry[0], entry[1] = st.st_size, st.st_mtime_ns
+        entry[2] = time.monotonic()
+        if opened is not None:
+            entry[3] = opened
+
+    def _scan(self):
+        if len(self._pending) >= self.max_pending:
+            return  # черга повна — прочитаємо, коли звільниться
+        self._rescan = False
+        started = time.time_ns()
+        try:
+            with os.scandir(self.folder) as entries:
+                for entry in entries:
+                    try:
+                        if not entry.is_file(follow_symlinks=False) or entry.name in self._pending:
+                            continue
+                        st = entry.stat(follow_symlinks=False)
+                    except OSError:
+                        continue
+                    if self._since is not None and max(st.st_mtime_ns, st.st_ctime_ns) < self._since:
+                        continue
+                    if self._recent.get(entry.name) != (st.st_size, st.st_mtime_ns, st.st_ctime_ns):
+                        self._note(entry.name, st=st)
+        except OSError:
+            self._rescan = True  # папка недоступна — повторимо
+            return
+        # Із запасом: час зміни на деяких ФС грубіший, а файл міг змінитись під час читання
+        self._since = started - 2 * 10**9
+        self._recent = {name: key for name, key in self._recent.items() if max(key[1:]) >= self._since}
+
+    def _settled(self):
+        now = time.monotonic()
+        ready = []
+        for name, entry in list(self._pending.items()):
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                del self._pending[name]  # видалили чи перенесли, не дочекавшись
+                continue
+            if (st.st_size, st.st_mtime_ns) != (entry[0], entry[1]):
+                entry[0], entry[1], entry[2] = st.st_size, st.st_mtime_ns, now
+            elif now - entry[2] >= (max(self.settle_seconds, OPEN_SILENCE_SECONDS) if entry[3]
+                                    else self.settle_seconds):
+                del self._pending[name]
+                ready.append(path)
+                if len(self._recent) >= self.max_pending:
+                    self._recent.clear()
+                self._recent[name] = (st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+        return ready
+
+
+def watch_profile(idx, control=None, profiles=None):
+    """
+    Генератор: стежить за папкою src профілю idx і після кожного переданого пакета видає результат
+    run_operation (синхронізація в усі папки dest; move, verify і ліміти — як у профілі) з додатковим
+    ключем files — шляхи пакета. Список files профілю не використовується: передається все нове в src.
+    Працює, доки control не скасовано (або генератор не закрито). Параметри — settings.ini [watch].
+    """
+    if profiles is None:
+        profiles = load_profiles()
+    p = profiles.get(idx)
+    if not p:
+        raise ProfileError(f"Профіль #{idx+1} порожній.")
+    if not p.get('src') or not profile_dests(p):
+        raise ProfileError("Для стеження в профілі мають бути папки src і dest.")
+    settings = load_settings()["watch"]
+    batch_seconds = settings.getfloat("batch_seconds")
+    watcher = FolderWatcher(p['src'], settle_seconds=settings.getfloat("settle_seconds"),
+                            poll_seconds=settings.getfloat("poll_seconds"),
+                            max_pending=settings.getint("max_pending"),
+                            ignore=[x.strip() for x in settings.get("ignore").split(";")])
+    dests = profile_dests(p)
+    batch = {}
+    first_ready = None
+    try:
+        while control is None or not control.cancelled:
+            for path in watcher.wait():
+                batch[path] = None
+                if first_ready is None:
+                    first_ready = time.monotonic()
+            if not batch:
+                continue
+            if watcher.busy and len(batch) < MAX_BATCH and time.monotonic() - first_ready < batch_seconds:
+                continue  # ще пишуться інші файли — передамо разом
+            files = [path for path in batch if os.path.isfile(path)]
+            batch = {}
+            first_ready = None
+            if not files:
+                continue
+            result = run_operation(files, dests if len(dests) > 1 else dests[0], src_folder=p['src'],
+                                   control=control, sync=True, compare=p.get('compare') or 'mtime',
+                                   move=p.get('move', False), verify=True if p.get('verify') else None,
+                                   limit_mbps=p.get('limit_mbps') or None, priority=p.get('priority') or None)
+            result["files"] = files
+            yield result
+    finally:
+        watcher.close()
@@ -0,0 +1,219 @@
+"""
+Віджети Tkinter для GUI ("Tool Box.py"). Ядро (engine, cli) цей модуль не імпортує.
+"""
+import tkinter as tk
+
+_SHIFT, _CONTROL = 0x0001, 0x0004  # біти event.state
+RESORT_DELAY_MS = 200  # під час завантаження порціями список пересортовується не частіше
+
+
+class VirtualListbox(tk.Frame):
+    """
+    Список на сотні тисяч рядків: у tk.Listbox лежать лише height видимих рядків,
+    усі елементи — у звичайному списку items. Елементи додаються порціями (extend) під час
+    фонового читання папки; фільтр і сортування працюють над уже завантаженим, без диска.
+
+    Індекси в curselection() / get() / item() — позиції в items (порядок додавання),
+    тож паралельні списки GUI (наприклад, повні шляхи) лишаються правильними за будь-якого сортування.
+    """
+    def __init__(self, master, label=str, height=20, selectmode=tk.BROWSE, **options):
+        super().__init__(master, bg=options.get("bg"))
+        self.label = label          # елемент -> текст рядка
+        self.height = height
+        self.selectmode = selectmode
+        self.items = []
+        self.view = []              # індекси items у порядку показу (після фільтра і сортування)
+        self.top = 0                # позиція view першого видимого рядка
+        self.selected = set()       # індекси items
+        self.removed = set()        # індекси items, прибрані remove_where (щоб інші індекси не зсувались)
+        self._keys = None           # ключі сортування для кожного елемента (рахуються один раз)
+        self._key = None
+        self._reverse = False
+        self._predicate = None
+        self._resort_pending = False
+        self._anchor = None
+        self._replace = False
+        self.listbox = tk.Listbox(self, height=height, selectmode=selectmode, exportselection=False, **options)
+        self.scrollbar = tk.Scrollbar(self, orient=tk.VERTICAL, command=self.yview)
+        self.listbox.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
+        self.scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.listbox.bind("<Button-1>", self._on_click)
+        self.listbox.bind("<<ListboxSelect>>", self._on_select)
+        self.listbox.bind("<MouseWheel>", lambda e: self._scroll(-1 if e.delta > 0 else 1, 3))
+        self.listbox.bind("<Button-4>", lambda e: self._scroll(-1, 3))
+        self.listbox.bind("<Button-5>", lambda e: self._scroll(1, 3))
+        self.listbox.bind("<Up>", lambda e: self._move(-1))
+        self.listbox.bind("<Down>", lambda e: self._move(1))
+        self.listbox.bind("<Prior>", lambda e: self._move(-self.height))
+        self.listbox.bind("<Next>", lambda e: self._move(self.height))
+
+    # --- Дані ---
+
+    def clear(self):
+        self.items = []
+        self.view = []
+        self.selected.clear()
+        self.removed.clear()
+        self.top = 0
+        self._anchor = None
+        if self._key is not None:
+            self._keys = []
+        self._render()
+
+    def extend(self, items):
+        """Додає порцію елементів (з урахуванням поточного фільтра і сортування)."""
+        start = len(self.items)
+        self.items.extend(items)
+        new = range(start, len(self.items))
+        if self._key is not None:
+            self._keys.extend(self._key(item) for item in items)
+        if self._predicate is not None:
+            new = [i for i in new if self._predicate(self.items[i])]
+        sort_now = not self.view  # первинний показ (або весь список з кешу) — сортуємо одразу
+        self.view.extend(new)
+        if self._key is not None and sort_now:
+            self.view.sort(key=self._keys.__getitem__, reverse=self._reverse)
+        elif self._key is not None and not self._resort_pending:
+            # Нові елементи поки в кінці; сортуємо відкладено, щоб не сортувати все на кожну порцію
+            self._resort_pending = True
+            self.after(RESORT_DELAY_MS, self._resort)
+        self._render()
+
+    def remove_where(self, predicate):
+        """Прибирає елементи, для яких predicate(елемент) істинний; повертає їхні індекси."""
+        gone = {i for i, item in enumerate(self.items) if i not in self.removed and predicate(item)}
+        if gone:
+            self.removed |= gone
+            self.selected -= gone
+            self.view = [i for i in self.view if i not in gone]
+            self._render()
+        return gone
+
+    def _resort(self):
+        self._resort_pending = False
+        if self._key is not None:
+            self.view.sort(key=self._keys.__getitem__, reverse=self._reverse)
+        self._render()
+
+    def sort(self, key=None, reverse=False):
+        """Сортує показ за key(елемент); None — порядок додавання."""
+        self._key, self._reverse = key, reverse
+        self._keys = [key(item) for item in self.items] if key is not None else None
+        self._rebuild()
+
+    def filter(self, predicate=None):
+        """Показує лише елементи, для яких predicate(елемент) істинний; None — усі."""
+        self._predicate = predicate
+        self._rebuild()
+
+    def _rebuild(self):
+        self.view = [i for i, item in enumerate(self.items)
+                     if i not in self.removed and (self._predicate is None or self._predicate(item))]
+        if self._key is not None:
+            self.view.sort(key=self._keys.__getitem__, reverse=self._reverse)
+        self.selected.intersection_update(self.view)
+        self.top = 0
+        self._anchor = None
+        self._render()
+
+    def size(self):
+        return len(self.items) - len(self.removed)
+
+    def item(self, index):
+        return self.items[index]
+
+    def get(self, index):
+        return self.label(self.items[index])
+
+    def curselection(self):
+        """Вибрані індекси items у порядку показу."""
+        if not self.selected:
+            return ()
+        return tuple(i for i in self.view if i in self.selected)
+
+    def bind(self, sequence=None, func=None, add=None):
+        # Події користувача (подвійний клік тощо) — на сам список
+        return self.listbox.bind(sequence, func, add)
+
+    # --- Показ ---
+
+    def refresh(self):
+        """Перемальовує видимі рядки (після зміни самих елементів)."""
+        self._render()
+
+    def _render(self):
+        total = len(self.view)
+        self.top = max(0, min(self.top, total - self.height))
+        visible = self.view[self.top:self.top + self.height]
+        self.listbox.delete(0, tk.END)
+        if visible:
+            self.listbox.insert(tk.END, *(self.label(self.items[i]) for i in visible))
+        for row, i in enumerate(visible):
+            if i in self.selected:
+                self.listbox.selection_set(row)
+        if total:
+            self.scrollbar.set(self.top / total, (self.top + len(visible)) / total)
+        else:
+            self.scrollbar.set(0.0, 1.0)
+
+    def yview(self, *args):
+        """Команда смуги прокрутки: ("moveto", частка) або ("scroll", n, "units"/"pages")."""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.top = int(float(args[1]) * len(self.view))
+            self._render()
+        elif args[0] == "scroll":
+            self._scroll(int(args[1]), self.height if args[2] == "pages" else 1)
+
+    def _scroll(self, direction, step):
+        self.top += direction * step
+        self._render()
+        return "break"
+
+    def see(self, pos):
+        """Прокручує так, щоб позиція pos у view була видима."""
+        if pos < self.top:
+            self.top = pos
+        elif pos >= self.top + self.height:
+            self.top = pos - self.height + 1
+        self._render()
+
+    # --- Виділення ---
+
+    def _on_click(self, event):
+        pos = self.top + self.listbox.nearest(event.y)
+        if pos >= len(self.view):
+            return None
+        if self.selectmode == tk.EXTENDED and event.state & _SHIFT and self._anchor is not None:
+            # Діапазон може виходити за видимі рядки — виділяємо самі
+            lo, hi = sorted((self._anchor, pos))
+            self.selected = set(self.view[lo:hi + 1])
+            self._render()
+            return "break"
+        self._replace = not (self.selectmode == tk.EXTENDED and event.state & _CONTROL)
+        self._anchor = pos
+        return None
+
+    def _on_select(self, event=None):
+        visible = self.view[self.top:self.top + self.height]
+        rows = set(self.listbox.curselection())
+        if self._replace:
+            self.selected.clear()
+            self._replace = False
+        for row, i in enumerate(visible):
+            if row in rows:
+                self.selected.add(i)
+            else:
+                self.selected.discard(i)
+
+    def _move(self, step):
+        if not self.view:
+            return "break"
+        pos = self._anchor if self._anchor is not None else self.top - (1 if step > 0 else 0)
+        pos = max(0, min(pos + step, len(self.view) - 1))
+        self._anchor = pos
+        self.selected = {self.view[pos]}
+        self.see(pos)
+        self.listbox.activate(pos - self.top)
+        return "break"
@@ -0,0 +1,179 @@
+"""
+Фоновий потік для передачі файлів, щоб вікно не зависало.
+
+GUI створює TransferWorker, запускає його і періодично (root.after) забирає події через poll():
+    ("progress", {"done", "total", "file", "rate", "eta"})
+    ("conflicts", [імена])  — усі конфлікти плану разом; відповідь через answer_conflicts()
+    ("done", результат)  /  ("cancelled", None)  /  ("error", виняток)
+
+StreamWorker так само віддає результат генератора порціями (читання великої папки):
+    ("chunk", порція) ... ("done", кількість порцій)  /  ("error", виняток)
+"""
+import queue, threading, time
+
+from toolbox.copier import TransferCancelled, TransferControl
+
+PROGRESS_INTERVAL = 0.1  # секунди між подіями progress (щоб не засипати чергу)
+STREAM_QUEUE_SIZE = 64   # порцій StreamWorker, що чекають на GUI (далі потік чекає)
+
+
+class TransferWorker:
+    """
+    Запускає func(*args, control=..., progress=..., **kwargs) у фоновому потоці.
+    Якщо ask_conflicts=True, додатково передається on_conflicts, який питає GUI через чергу
+    (один раз на операцію, до початку копіювання).
+    """
+    def __init__(self, func, *args, ask_conflicts=False, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.control = TransferControl()
+        self.events = queue.Queue()
+        self._answers = queue.Queue(maxsize=1)
+        self._started = 0.0
+        self._last_event = 0.0
+        self._thread = None
+        if ask_conflicts:
+            self.kwargs["on_conflicts"] = self._ask_conflicts
+
+    # --- Керування з GUI ---
+
+    def start(self):
+        self._started = time.monotonic()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def pause(self):
+        self.control.pause()
+
+    def resume(self):
+        self.control.resume()
+
+    def cancel(self):
+        self.control.cancel()
+        self._answer_nowait(None)
+
+    def answer_conflicts(self, choices):
+        """choices — рішення для кожного конфлікту (CONFLICT_CHOICES) або None — скасувати операцію."""
+        self._answer_nowait(choices)
+
+    def poll(self):
+        """Забирає всі накопичені події без блокування."""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    # --- Робочий потік ---
+
+    def _run(self):
+        try:
+            result = self.func(*self.args, control=self.control, progress=self._progress, **self.kwargs)
+        except TransferCancelled:
+            self.events.put(("cancelled", None))
+        except Exception as e:
+            self.events.put(("error", e))
+        else:
+            self.events.put(("done", result))
+
+    def _progress(self, done, total, name):
+        now = time.monotonic()
+        if now - self._last_event < PROGRESS_INTERVAL and done < total:
+            return
+        self._last_event = now
+        elapsed = now - self._started
+        rate = done / elapsed if elapsed > 0 else 0.0
+        eta = (total - done) / rate if rate > 0 else None
+        self.events.put(("progress", {"done": done, "total": total, "file": name,
+                                      "rate": rate, "eta": eta}))
+
+    def _ask_conflicts(self, names):
+        if self.control.cancelled:
+            return None
+        self.events.put(("conflicts", names))
+        return self._answers.get()
+
+    def _answer_nowait(self, answer):
+        try:
+            self._answers.put_nowait(answer)
+        except queue.Full:
+            pass
+
+
+class StreamWorker:
+    """
+    Перебирає генератор func(*args, **kwargs) у фоновому потоці; кожна видана порція стає подією
+    ("chunk", порція). Черга обмежена — якщо GUI не встигає, потік чекає, а не накопичує пам'ять.
+    Після cancel() потік зупиняється на наступній порції, а poll() більше нічого не повертає.
+    """
+    def __init__(self, func, *args, **kwargs):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.events = queue.Queue(maxsize=STREAM_QUEUE_SIZE)
+        self._cancelled = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def is_alive(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def cancel(self):
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def poll(self, limit=None):
+        """Забирає накопичені події (не більше limit) без блокування; після cancel() — нічого."""
+        events = []
+        while not self.cancelled and (limit is None or len(events) < limit):
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                break
+        return events
+
+    def _run(self):
+        count = 0
+        try:
+            for chunk in self.func(*self.args, **self.kwargs):
+                if not chunk:  # генератор лише дає змогу зупинитись, поки нічого не знайдено
+                    if self.cancelled:
+                        return
+                    continue
+                if not self._put(("chunk", chunk)):
+                    return
+                count += 1
+        except Exception as e:
+            self._put(("error", e))
+        else:
+            self._put(("done", count))
+
+    def _put(self, event):
+        while not self.cancelled:
+            try:
+                self.events.put(event, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+
+def format_progress(info):
+    """Текст для рядка стану: "12.5 / 40.0 МБ, 8.1 МБ/с, залишилось 0:03 — file.bin"."""
+    mb = 1024 * 1024
+    text = f"{info['done'] / mb:.1f} / {info['total'] / mb:.1f} МБ, {info['rate'] / mb:.1f} МБ/с"
+    if info.get("eta") is not None:
+        minutes, seconds = divmod(int(info["eta"]), 60)
+        text += f", залишилось {minutes}:{seconds:02d}"
+    return f"{text} — {info['file']}"